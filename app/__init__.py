@@ -1,6 +1,8 @@
 from flask import Flask
 from app import routes
 from app.models import db
+from app.services import db_profile, job_queue, jobs, survey_counters, instrumentation, llm_gateway, llm_ledger, response_export, response_import  # jobs registers the job handlers
+from app.services.log_setup import configure_logging
 from config import Config
 from flask_login import LoginManager
 from flask_migrate import Migrate
@@ -12,11 +14,21 @@ login_manager = LoginManager()
 def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
+    configure_logging(app)
 
     # Initialize extensions
+    db_profile.apply_engine_options(app)
     db.init_app(app)
+    db_profile.init_app(app)
     login_manager.init_app(app)
     migrate = Migrate(app, db)
+    job_queue.init_app(app)
+    survey_counters.init_app(app)
+    instrumentation.init_app(app)
+    llm_ledger.init_app(app)
+    llm_gateway.init_app(app)
+    response_export.init_app(app)
+    response_import.init_app(app)
 
     @login_manager.user_loader
     def load_user(user_id):
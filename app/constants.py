@@ -3,11 +3,99 @@ CLAUDE_MODEL = "claude-3-5-sonnet-20241022"
 
 # Survey Configuration
 MAX_QUESTIONS_PER_SURVEY = 5
+PENDING_QUESTION_WAIT_SECONDS = 10  # How long a page load waits on an in-flight pre-generation
+FIRST_QUESTION_VARIANTS = 1  # Opening questions per survey, assigned round-robin
+STREAM_QUESTIONS = True  # Stream follow-up questions to the page over server-sent events
 DEFAULT_QUESTION_MAX_TOKENS = 100
 DEFAULT_ANALYSIS_MAX_TOKENS = 1000
 DEFAULT_PROCESSING_MAX_TOKENS = 300
+DEFAULT_SHARD_SUMMARY_MAX_TOKENS = 800
 
 # Temperature Settings
 QUESTION_GENERATION_TEMPERATURE = 0.7
 ANALYSIS_TEMPERATURE = 0.5
-PROCESSING_TEMPERATURE = 0.3
\ No newline at end of file
+PROCESSING_TEMPERATURE = 0.3
+
+# Prompt Budgets (estimated input tokens)
+QUESTION_PROMPT_MAX_TOKENS = 3000
+INSIGHT_DIGEST_MAX_TOKENS = 600
+ANALYSIS_PROMPT_MAX_TOKENS = 100000
+MAX_ANSWER_CHARS = 2000  # Longer answers are truncated in prompts
+
+# Insight Generation Settings
+INSIGHT_CARRY_OVER_MAX = 10  # Useful insights kept when a new generation replaces the current one
+INSIGHT_FAILURE_BACKOFF = 60 * 60  # Seconds before a failed insight generation is queued again
+
+# Insight Map-Reduce Settings
+INSIGHT_SHARD_MAX_TOKENS = 20000  # Estimated input tokens per summarized shard
+INSIGHT_MAP_WORKERS = 4  # Shards summarized in parallel
+
+# Answer Clustering Settings
+INSIGHT_CLUSTERING = True  # Pre-aggregate large surveys into answer clusters for insight generation
+INSIGHT_CLUSTER_MIN_ANSWERS = 300  # Smaller surveys send every answer to Claude
+TEXT_FEATURE_DIM = 4096  # Hashed word and bigram features per answer
+ANSWER_CLUSTER_MAX_K = 8  # Clusters per question at most
+ANSWER_CLUSTER_MIN_ANSWERS = 20  # Questions with fewer answers are pooled with the other follow-ups
+ANSWER_CLUSTER_ITERATIONS = 15
+ANSWER_CLUSTER_QUOTES = 3  # Representative quotes per cluster
+ANSWER_CLUSTER_TERMS = 6  # Characteristic terms per cluster
+
+# Question Bank Settings
+QUESTION_BANK_ENABLED = True  # Reuse follow-ups generated for similar respondents instead of calling Claude
+QUESTION_BANK_SIMILARITY = 0.8  # Cosine similarity of Q&A trajectories needed to reuse a question
+QUESTION_BANK_MAX_AGE_HOURS = 24  # Older questions are regenerated, so they keep up with new insights
+QUESTION_BANK_MAX_REUSES = 200  # Times one question is reused before a fresh one is generated
+QUESTION_BANK_MAX_ENTRIES = 5000  # Newest entries kept in memory per survey and depth
+QUESTION_BANK_REFRESH_SECONDS = 5  # How often a process picks up entries added by other processes
+
+# Answer Processing Batches
+PROCESSING_BATCH_SIZE = 10  # Answers extracted per Claude request
+PROCESSING_BATCH_WINDOW = 0.5  # Seconds to wait for a batch to fill
+LOCAL_EXTRACTION = True  # Extract clear-cut answers locally and send only the rest to Claude
+LOCAL_EXTRACTION_MIN_CONFIDENCE = 0.7  # Local results below this confidence go to Claude
+
+# LLM Gateway Settings
+LLM_MAX_CONCURRENCY = 8  # Concurrent Claude requests per process
+LLM_MAX_RETRIES = 3
+LLM_RETRY_BASE_DELAY = 0.5  # Seconds
+LLM_RETRY_MAX_DELAY = 8.0  # Seconds
+LLM_TIMEOUT_SECONDS = 30.0
+
+# LLM Response Cache Settings
+# Call sites opt in by policy name; value is the TTL in seconds
+LLM_CACHE_POLICIES = {
+    # Batched extraction stores each answer under its single-answer key
+    'process_response': 7 * 24 * 3600,
+}
+LLM_CACHE_MEMORY_ENTRIES = 2000
+LLM_CACHE_DB_PATH = 'llm_cache.db'  # None keeps the cache in memory only
+LLM_CACHE_DB_ENTRIES = 100000
+
+# Background Job Settings
+JOB_POLL_INTERVAL = 1.0  # Seconds between polls when the queue is idle
+JOB_MAX_ATTEMPTS = 3
+JOB_RETRY_DELAY = 5.0  # Seconds, multiplied by the attempt number
+JOB_STALE_AFTER = 300  # Seconds before a 'running' job is assumed abandoned
+JOB_DONE_RETENTION_HOURS = 24  # Finished jobs are deleted after this
+JOB_FAILED_RETENTION_HOURS = 7 * 24  # Failed jobs are kept longer, for inspection
+
+# Import Settings
+IMPORT_CHUNK_ROWS = 1000  # Answer rows inserted and committed per transaction
+
+# Export Settings
+EXPORT_BATCH_ROWS = 5000  # Answers fetched, encoded and sent per chunk (one Parquet row group)
+
+# Instrumentation Settings
+REQUEST_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)  # Seconds
+LLM_LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60)  # Seconds
+SQL_QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 250)  # Statements per request
+SLOW_REQUEST_MAX_QUERIES = 50  # Statements kept for the slow-request log
+
+# LLM Call Ledger Settings
+LLM_LEDGER_FLUSH_SIZE = 100  # Buffered rows that trigger a bulk insert
+LLM_LEDGER_FLUSH_INTERVAL = 2.0  # Seconds between background flushes
+LLM_LEDGER_MAX_BUFFER = 10000  # Oldest rows are dropped beyond this if the database is unavailable
+# USD per million tokens, for cost estimates in usage reports
+LLM_PRICING = {
+    'claude-3-5-sonnet-20241022': {'input': 3.00, 'output': 15.00, 'cache_write': 3.75, 'cache_read': 0.30},
+}
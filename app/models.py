@@ -17,26 +17,61 @@ class Survey(db.Model):
     main_question = db.Column(db.Text, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     active = db.Column(db.Boolean, default=True)
+    # Denormalized counters, maintained by app/services/survey_counters.py
+    started_count = db.Column(db.Integer, default=0, nullable=False)
+    completed_count = db.Column(db.Integer, default=0, nullable=False)
+    answer_count = db.Column(db.Integer, default=0, nullable=False)
+    insight_count = db.Column(db.Integer, default=0, nullable=False)
+    # Cached digest of useful insights for question prompts; None = needs rebuilding
+    insights_digest = db.Column(db.Text)
+    # Latest insight generation; the only one whose insights are shown or used in prompts.
+    # use_alter breaks the survey <-> insight_generation foreign key cycle for create_all.
+    current_generation_id = db.Column(db.Integer, db.ForeignKey(
+        'insight_generation.id', name='fk_survey_current_generation_id_insight_generation', use_alter=True
+    ))
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     questions = db.relationship('Question', backref='survey', lazy='dynamic')
     responses = db.relationship('SurveyResponse', backref='survey', lazy='dynamic')
     insights = db.relationship('Insight', backref='survey', lazy='dynamic')
 
+    __table_args__ = (
+        db.Index('ix_survey_user_id', 'user_id'),
+    )
+
 class Question(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     text = db.Column(db.Text, nullable=False)
     question_type = db.Column(db.String(50), default='open_ended')
     order = db.Column(db.Integer, default=1)
+    # Opening questions are generated once per survey and shared by every respondent
+    is_opening = db.Column(db.Boolean, default=False, nullable=False)
     survey_id = db.Column(db.Integer, db.ForeignKey('survey.id'), nullable=False)
     answers = db.relationship('Answer', backref='question', lazy='dynamic')
 
+    __table_args__ = (
+        db.Index('ix_question_survey_opening', 'survey_id', 'is_opening'),
+    )
+
 class SurveyResponse(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     respondent_id = db.Column(db.String(64), nullable=False)
     survey_id = db.Column(db.Integer, db.ForeignKey('survey.id'), nullable=False)
     started_at = db.Column(db.DateTime, default=datetime.utcnow)
     completed_at = db.Column(db.DateTime)
+    # Next question to show, generated ahead of time and reused until answered.
+    # The foreign key is named as in its migration so create_all databases
+    # can be downgraded too.
+    pending_question_id = db.Column(
+        db.Integer, db.ForeignKey('question.id', name='fk_survey_response_pending_question_id_question')
+    )
     answers = db.relationship('Answer', backref='response', lazy='dynamic')
+    pending_question = db.relationship('Question', foreign_keys=[pending_question_id])
+
+    __table_args__ = (
+        # One response per respondent per survey; also serves the take_survey lookup
+        db.UniqueConstraint('survey_id', 'respondent_id', name='uq_survey_response_survey_respondent'),
+        db.Index('ix_survey_response_survey_completed', 'survey_id', 'completed_at'),
+    )
 
 class Answer(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -45,10 +80,33 @@ class Answer(db.Model):
     question_id = db.Column(db.Integer, db.ForeignKey('question.id'), nullable=False)
     response_id = db.Column(db.Integer, db.ForeignKey('survey_response.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Hashed term counts for clustering (app/services/text_vectors.py); None = not computed yet
+    text_features = db.deferred(db.Column(db.LargeBinary))
+
+    __table_args__ = (
+        db.Index('ix_answer_response_id', 'response_id', 'id'),
+        db.Index('ix_answer_question_id', 'question_id'),
+    )
+
+class InsightGeneration(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    survey_id = db.Column(db.Integer, db.ForeignKey('survey.id'), nullable=False)
+    responses_count = db.Column(db.Integer, default=0, nullable=False)  # Completed responses it was drawn from
+    insight_count = db.Column(db.Integer, default=0, nullable=False)  # Including useful insights carried over
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    archived_at = db.Column(db.DateTime)  # Set when a newer generation replaces it
+
+    __table_args__ = (
+        db.Index('ix_insight_generation_survey_created', 'survey_id', 'created_at'),
+    )
 
 class Insight(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     survey_id = db.Column(db.Integer, db.ForeignKey('survey.id'), nullable=False)
+    # Generation the insight belongs to; useful insights move to each new generation
+    generation_id = db.Column(
+        db.Integer, db.ForeignKey('insight_generation.id', name='fk_insight_generation_id_insight_generation')
+    )
     text = db.Column(db.Text, nullable=False)
     confidence = db.Column(db.Float, default=0.5)
     insight_type = db.Column(db.String(50), default='pattern')
@@ -59,4 +117,108 @@ class Insight(db.Model):
     # New fields for tracking usefulness and response context
     useful = db.Column(db.Boolean, default=None)  # None = not rated, True = useful, False = not useful
     marked_useful_at = db.Column(db.DateTime)
-    generated_from_responses_count = db.Column(db.Integer, default=0)  # How many responses existed when this was generated
\ No newline at end of file
+    generated_from_responses_count = db.Column(db.Integer, default=0)  # How many responses existed when this was generated
+
+    __table_args__ = (
+        db.Index('ix_insight_survey_useful', 'survey_id', 'useful'),
+        db.Index('ix_insight_survey_created', 'survey_id', 'created_at'),
+        db.Index('ix_insight_generation_id', 'generation_id'),
+    )
+
+class InsightShardSummary(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    survey_id = db.Column(db.Integer, db.ForeignKey('survey.id'), nullable=False)
+    shard_key = db.Column(db.String(64), nullable=False)  # SHA-256 of the covered response IDs
+    response_count = db.Column(db.Integer, nullable=False)
+    summary = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('survey_id', 'shard_key', name='uq_insight_shard_summary_survey_shard'),
+    )
+
+class Job(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.Text)  # JSON string of handler arguments
+    status = db.Column(db.String(20), default='pending', nullable=False)  # pending, running, done, failed
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    error = db.Column(db.Text)
+    worker = db.Column(db.String(100))  # host:pid:thread that claimed the job
+    dedupe_key = db.Column(db.String(100))  # At most one pending/running job per key
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    run_after = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.Index('ix_job_status_run_after', 'status', 'run_after'),
+        db.Index('ix_job_dedupe_key_status', 'dedupe_key', 'status'),
+        # Backs up enqueue's dedupe check against concurrent inserts
+        db.Index(
+            'uq_job_active_dedupe_key', 'dedupe_key', unique=True,
+            sqlite_where=db.text("status IN ('pending', 'running')"),
+            postgresql_where=db.text("status IN ('pending', 'running')")
+        ),
+    )
+
+class LLMCall(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    call_site = db.Column(db.String(50), nullable=False)
+    survey_id = db.Column(db.Integer, db.ForeignKey('survey.id'))
+    response_id = db.Column(db.Integer, db.ForeignKey('survey_response.id'))
+    model = db.Column(db.String(100))
+    input_tokens = db.Column(db.Integer, default=0, nullable=False)
+    output_tokens = db.Column(db.Integer, default=0, nullable=False)
+    cache_read_tokens = db.Column(db.Integer, default=0, nullable=False)  # Prompt cache reads
+    cache_creation_tokens = db.Column(db.Integer, default=0, nullable=False)  # Prompt cache writes
+    latency_ms = db.Column(db.Float, nullable=False)
+    outcome = db.Column(db.String(20), nullable=False)  # ok, parse_error, timeout, error
+    cache_hit = db.Column(db.Boolean, default=False, nullable=False)  # Served from the LLM response cache
+    # Part of the call this row accounts for; a batched call gets one row per answer it covered
+    share = db.Column(db.Float, default=1.0, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_llm_call_survey_created', 'survey_id', 'created_at'),
+        db.Index('ix_llm_call_created', 'created_at'),
+    )
+
+class QuestionBankEntry(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    survey_id = db.Column(db.Integer, db.ForeignKey('survey.id'), nullable=False)
+    question_id = db.Column(db.Integer, db.ForeignKey('question.id'), nullable=False)
+    depth = db.Column(db.Integer, nullable=False)  # Answers given before the question was asked
+    # Hashed term counts of the Q&A that led to the question (app/services/text_vectors.py)
+    trajectory_features = db.Column(db.LargeBinary, nullable=False)
+    hits = db.Column(db.Integer, default=0, nullable=False)  # Times reused instead of calling Claude
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_hit_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.Index('ix_question_bank_entry_survey_id', 'survey_id', 'id'),
+        db.Index('ix_question_bank_entry_question_id', 'question_id'),
+    )
+
+class ImportRun(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    survey_id = db.Column(db.Integer, db.ForeignKey('survey.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'))  # None when started from the CLI
+    source = db.Column(db.String(255))  # Original file name
+    path = db.Column(db.String(500), nullable=False)  # File the rows are read from, kept for resuming
+    import_format = db.Column(db.String(10), nullable=False)  # csv or jsonl
+    status = db.Column(db.String(20), default='pending', nullable=False)  # pending, running, done, failed
+    rows_total = db.Column(db.Integer)  # Answer rows in the file, counted when the run starts
+    rows_done = db.Column(db.Integer, default=0, nullable=False)  # Rows committed so far; a resumed run skips these
+    rows_skipped = db.Column(db.Integer, default=0, nullable=False)  # Invalid rows, included in rows_done
+    responses_created = db.Column(db.Integer, default=0, nullable=False)
+    questions_created = db.Column(db.Integer, default=0, nullable=False)
+    answers_created = db.Column(db.Integer, default=0, nullable=False)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.Index('ix_import_run_survey_created', 'survey_id', 'created_at'),
+    )
@@ -1,14 +1,26 @@
-from flask import Blueprint, render_template, request, jsonify, redirect, url_for, flash, session
-from app.models import db, User, Survey, Question, SurveyResponse, Answer, Insight
-from app.services.question_generator import generate_next_question
-from app.services.analysis_service import generate_insights
-from app.services.response_processor import process_response
-from app.constants import MAX_QUESTIONS_PER_SURVEY
+from flask import Blueprint, render_template, request, jsonify, redirect, url_for, flash, session, Response, stream_with_context, current_app
+from app.models import db, User, Survey, SurveyResponse, Answer, Insight, ImportRun
+from app.services.question_generator import generate_next_question, stream_next_question, next_question_job_key, opening_questions_job_key, assign_pending_question, wait_for_pending_question
+from app.services.analysis_service import insights_need_refresh, insights_job_key, current_insights, recent_insights_failure
+from app.services import job_queue, llm_cache, llm_gateway, llm_ledger, question_bank, response_export, response_import, response_processor, survey_counters
+from app.services.survey_counters import mark_response_completed
+from app.services.prompt_builder import refresh_insights_digest
+from app.services.instrumentation import has_metrics_token
+from app.services.data_access import response_answer_count
+from app.services.text_vectors import encode_features
+from app.constants import MAX_QUESTIONS_PER_SURVEY, STREAM_QUESTIONS
 from flask_login import login_user, logout_user, login_required, current_user
 from werkzeug.security import check_password_hash, generate_password_hash
-from datetime import datetime
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime, timedelta
+import json
+import logging
+import os
+import shutil
 import uuid
 
+logger = logging.getLogger(__name__)
+
 main_bp = Blueprint('main', __name__)
 api_bp = Blueprint('api', __name__)
 
@@ -80,7 +92,14 @@ def create_survey():
             user_id=current_user.id
         )
         db.session.add(survey)
-        db.session.commit()
+        db.session.flush()
+        
+        # Generate the opening question now so no respondent waits on it
+        job_queue.enqueue(
+            'generate_opening_questions',
+            {'survey_id': survey.id},
+            dedupe_key=opening_questions_job_key(survey.id)
+        )
         
         flash('Survey created successfully!')
         return redirect(url_for('main.dashboard'))
@@ -109,45 +128,91 @@ def take_survey(survey_id):
             respondent_id=respondent_id
         )
         db.session.add(response)
-        db.session.commit()
-    
-    # Get the next question
-    answered_questions = [a.question for a in response.answers.all()]
-    
-    if not answered_questions:
-        # Generate first question
-        question = generate_next_question(survey_id, response.id)
-        if not question:
-            # Fallback: create a simple first question
-            question = Question(
-                text=f"What are your initial thoughts about: {survey.main_question}",
-                order=1,
-                survey_id=survey_id
-            )
-            db.session.add(question)
+        try:
+            db.session.flush()
+            survey_counters.increment(survey_id, started_count=1)
             db.session.commit()
-    else:
-        # Check if we should generate another question
-        if len(answered_questions) < MAX_QUESTIONS_PER_SURVEY:
-            question = generate_next_question(survey_id, response.id)
-            if not question:
-                # End survey if no more questions can be generated
-                from datetime import datetime
-                response.completed_at = datetime.utcnow()
-                db.session.commit()
-                return render_template('survey_complete.html', survey=survey)
-        else:
-            question = None
+        except IntegrityError:
+            # A concurrent load of the same page created it first
+            db.session.rollback()
+            response = SurveyResponse.query.filter_by(
+                survey_id=survey_id,
+                respondent_id=respondent_id
+            ).one()
+    
+    if response.completed_at:
+        return render_template('survey_complete.html', survey=survey)
+    
+    # Reuse the question generated when the last answer was submitted
+    question = wait_for_pending_question(response)
+    
+    # Otherwise stream the follow-up into the page instead of blocking on it
+    if not question and STREAM_QUESTIONS and 0 < response_answer_count(response.id) < MAX_QUESTIONS_PER_SURVEY:
+        return render_template('take_survey.html', survey=survey, question=None, response=response,
+                               stream_url=url_for('main.question_stream', survey_id=survey_id))
+    
+    if not question:
+        question = _generate_question(survey, response)
+        if question:
+            question = assign_pending_question(response.id, question)
     
     if not question:
         # Survey complete
-        from datetime import datetime
-        response.completed_at = datetime.utcnow()
+        mark_response_completed(response)
         db.session.commit()
         return render_template('survey_complete.html', survey=survey)
     
     return render_template('take_survey.html', survey=survey, question=question, response=response)
 
+@main_bp.route('/survey/<int:survey_id>/question_stream')
+def question_stream(survey_id):
+    """Server-sent events carrying the respondent's next question as it is generated"""
+    response_id = SurveyResponse.query.filter_by(
+        survey_id=survey_id,
+        respondent_id=session.get('respondent_id')
+    ).first_or_404().id
+    
+    def sse(event, data):
+        return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+    
+    def generate():
+        # Reload inside the stream; the view's session is gone once it returns
+        response = db.session.get(SurveyResponse, response_id)
+        question = wait_for_pending_question(response)
+        if question:
+            yield sse('token', question.text)
+        elif response_answer_count(response.id) < MAX_QUESTIONS_PER_SURVEY:
+            for event, data in stream_next_question(survey_id, response.id):
+                if event == 'token':
+                    yield sse('token', data)
+                else:
+                    question = data
+        
+        if question:
+            yield sse('question', {'id': question.id, 'text': question.text})
+        else:
+            # Nothing more to ask; the page reloads onto the completion screen
+            mark_response_completed(response)
+            db.session.commit()
+            yield sse('complete', {})
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+def _generate_question(survey, response):
+    """
+    Generate the response's next question inline. Returns None when the
+    survey should end, either because enough questions have been answered or
+    because no more questions can be generated.
+    """
+    # Check if we should generate another question (the first one never calls Claude)
+    if response_answer_count(response.id) < MAX_QUESTIONS_PER_SURVEY:
+        return generate_next_question(survey.id, response.id)
+    return None
+
 @main_bp.route('/insights/<int:survey_id>')
 @login_required
 def view_insights(survey_id):
@@ -157,34 +222,91 @@ def view_insights(survey_id):
         flash('Access denied')
         return redirect(url_for('main.dashboard'))
     
-    # Get current response count
-    current_response_count = survey.responses.filter(SurveyResponse.completed_at.isnot(None)).count()
+    # Regenerate in the background; the page shows what we have meanwhile.
+    # After a failed generation wait out the backoff instead of retrying on every view.
+    failed_job = recent_insights_failure(survey_id)
+    if not failed_job and insights_need_refresh(survey_id):
+        logger.info('New responses detected, queueing insight generation')
+        job_queue.enqueue(
+            'generate_insights',
+            {'survey_id': survey_id},
+            dedupe_key=insights_job_key(survey_id)
+        )
     
-    # Get existing insights
-    insights = survey.insights.all()
+    insights = current_insights(survey)
+    refreshing = job_queue.find_active(insights_job_key(survey_id)) is not None
     
-    # Check if we need to generate new insights
-    needs_new_insights = False
-    if not insights:
-        needs_new_insights = True
-        print("No existing insights found")
-    else:
-        # Check if we have new responses since last insight generation
-        latest_insight = max(insights, key=lambda i: i.created_at)
-        if current_response_count > latest_insight.generated_from_responses_count:
-            needs_new_insights = True
-            print(f"New responses detected: {current_response_count} vs {latest_insight.generated_from_responses_count}")
-    
-    if needs_new_insights:
-        print("Generating new insights...")
-        insights_data = generate_insights(survey_id)
-        print(f"Generated insights data: {insights_data}")
-        # Refresh insights from database
-        insights = survey.insights.all()
+    return render_template(
+        'insights.html', survey=survey, insights=insights, refreshing=refreshing, failed_job=failed_job,
+        export_formats=response_export.available_formats()
+    )
+
+@main_bp.route('/insights/<int:survey_id>/status')
+@login_required
+def insights_status(survey_id):
+    survey = Survey.query.get_or_404(survey_id)
+    
+    if survey.user_id != current_user.id:
+        return jsonify({'error': 'Access denied'}), 403
+    
+    job = job_queue.find_latest(insights_job_key(survey_id))
+    if job and job.status in ('pending', 'running'):
+        status = 'refreshing'
+    elif job and job.status == 'failed':
+        status = 'failed'
     else:
-        print(f"Using existing insights: {len(insights)} total")
+        status = 'ready'
     
-    return render_template('insights.html', survey=survey, insights=insights)
+    return jsonify({
+        'status': status,
+        'insight_count': survey.insight_count,
+        'updated_at': job.finished_at.isoformat() if job and job.finished_at else None
+    })
+
+@main_bp.route('/insights/<int:survey_id>/usage')
+@login_required
+def survey_usage(survey_id):
+    survey = Survey.query.get_or_404(survey_id)
+    
+    if survey.user_id != current_user.id:
+        flash('Access denied')
+        return redirect(url_for('main.dashboard'))
+    
+    days = request.args.get('days', 30, type=int)
+    rows = llm_ledger.usage_by_call_site(survey_id, since=datetime.utcnow() - timedelta(days=days))
+    calls = llm_ledger.round_calls(sum(row['calls'] for row in rows))
+    totals = {
+        'calls': calls,
+        'tokens': sum(row['input_tokens'] + row['output_tokens'] + row['cache_creation_tokens'] for row in rows),
+        'avg_latency_ms': sum(row['avg_latency_ms'] * row['calls'] for row in rows) / calls if calls else 0,
+        'cost': sum(row['cost'] or 0 for row in rows),
+    }
+    
+    return render_template('survey_usage.html', survey=survey, rows=rows, totals=totals, days=days)
+
+@main_bp.route('/insights/<int:survey_id>/export')
+@login_required
+def export_responses(survey_id):
+    survey = Survey.query.get_or_404(survey_id)
+    
+    if survey.user_id != current_user.id:
+        flash('Access denied')
+        return redirect(url_for('main.dashboard'))
+    
+    export_format = request.args.get('format', 'csv')
+    if export_format not in response_export.available_formats():
+        return jsonify({'error': f'Unsupported export format: {export_format}'}), 400
+    
+    # Streamed a batch at a time, so memory stays flat however large the survey
+    mimetype, extension = response_export.FORMATS[export_format]
+    return Response(
+        stream_with_context(response_export.export_chunks(survey_id, export_format)),
+        mimetype=mimetype,
+        headers={
+            'Content-Disposition': f'attachment; filename="survey-{survey_id}-responses.{extension}"',
+            'X-Accel-Buffering': 'no'
+        }
+    )
 
 @main_bp.route('/get_survey_link/<int:survey_id>')
 @login_required
@@ -221,6 +343,7 @@ def rate_insight():
     insight.useful = useful
     if useful:
         insight.marked_useful_at = datetime.utcnow()
+    refresh_insights_digest(insight.survey)
     
     db.session.commit()
     
@@ -233,17 +356,117 @@ def submit_answer():
     answer_text = data.get('answer')
     response_id = data.get('response_id')
     
-    # Process the answer
-    processed_data = process_response(answer_text)
+    response = SurveyResponse.query.get_or_404(response_id)
     
-    # Save the answer
+    # Save the answer; structured extraction happens in the background
     answer = Answer(
         text=answer_text,
-        processed_data=processed_data,
         question_id=question_id,
         response_id=response_id
     )
     db.session.add(answer)
+    db.session.flush()
+    survey_counters.increment(response.survey_id, answer_count=1)
+    
+    # The pending question is answered; the next one is generated ahead of the reload
+    if response.pending_question_id == question_id:
+        response.pending_question_id = None
+    
+    # Clear-cut answers are extracted right away; only the rest wait for Claude
+    extracted, _ = response_processor.extract_locally([(answer.id, answer_text)])
+    if extracted:
+        answer.processed_data = extracted[answer.id]
+        answer.text_features = encode_features(answer_text)
+    else:
+        # Committed together with the answer so no answer is left unqueued
+        job_queue.enqueue('process_answer', {'answer_id': answer.id})
+    
+    if response_answer_count(response.id) < MAX_QUESTIONS_PER_SURVEY:
+        job_queue.enqueue(
+            'generate_next_question',
+            {'response_id': response.id},
+            dedupe_key=next_question_job_key(response.id)
+        )
     db.session.commit()
     
-    return jsonify({'success': True})
\ No newline at end of file
+    return jsonify({'success': True})
+
+@api_bp.route('/import_responses/<int:survey_id>', methods=['POST'])
+@login_required
+def import_responses(survey_id):
+    """
+    Queue a bulk import of pre-collected answers, sent as a `file` upload or
+    as the raw request body (see response_import.iter_rows for the formats)
+    """
+    survey = Survey.query.get_or_404(survey_id)
+    
+    if survey.user_id != current_user.id:
+        return jsonify({'error': 'Access denied'}), 403
+    
+    upload = request.files.get('file')
+    source = upload.filename if upload else None
+    import_format = request.values.get('format') or response_import.guess_format(source)
+    if not import_format:
+        import_format = {'text/csv': 'csv', 'application/x-ndjson': 'jsonl', 'application/jsonl': 'jsonl'}.get(request.mimetype)
+    if import_format not in response_import.FORMATS:
+        return jsonify({'error': 'Unknown import format; pass format=csv or format=jsonl'}), 400
+    
+    # Kept on disk so the import job can resume after a restart
+    import_dir = os.path.join(current_app.instance_path, 'imports')
+    os.makedirs(import_dir, exist_ok=True)
+    path = os.path.join(import_dir, f'{uuid.uuid4().hex}.{import_format}')
+    if upload:
+        upload.save(path)
+    else:
+        with open(path, 'wb') as f:
+            shutil.copyfileobj(request.stream, f)
+    
+    run = response_import.create_run(survey_id, path, import_format, source=source, user_id=current_user.id)
+    job_queue.enqueue('import_responses', {'import_id': run.id}, dedupe_key=f'import:{run.id}')
+    
+    return jsonify({
+        'import_id': run.id,
+        'status_url': url_for('api.import_status', import_id=run.id)
+    }), 202
+
+@api_bp.route('/import_status/<int:import_id>')
+@login_required
+def import_status(import_id):
+    run = ImportRun.query.get_or_404(import_id)
+    
+    if db.session.get(Survey, run.survey_id).user_id != current_user.id:
+        return jsonify({'error': 'Access denied'}), 403
+    
+    return jsonify(response_import.run_status(run))
+
+@api_bp.route('/question_bank_stats/<int:survey_id>')
+@login_required
+def question_bank_stats(survey_id):
+    survey = Survey.query.get_or_404(survey_id)
+    
+    if survey.user_id != current_user.id:
+        return jsonify({'error': 'Access denied'}), 403
+    
+    return jsonify(question_bank.survey_stats(survey_id))
+
+@api_bp.route('/queue_stats')
+def queue_stats():
+    # Queue-wide numbers for operators, behind the same token as /metrics
+    if not has_metrics_token():
+        return jsonify({'error': 'Access denied'}), 403
+    return jsonify(job_queue.queue_stats())
+
+@api_bp.route('/llm_cache_stats')
+def llm_cache_stats():
+    # Process-wide cache counters, behind the same token as /metrics
+    if not has_metrics_token():
+        return jsonify({'error': 'Access denied'}), 403
+    return jsonify(llm_cache.cache_stats())
+
+
+@api_bp.route('/llm_usage_stats')
+def llm_usage_stats():
+    # Token usage across every survey; owners see their own on the usage page
+    if not has_metrics_token():
+        return jsonify({'error': 'Access denied'}), 403
+    return jsonify(llm_gateway.usage_stats())
\ No newline at end of file
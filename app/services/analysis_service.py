@@ -1,55 +1,286 @@
+import hashlib
 import json
-import os
-import anthropic
-from app.models import db, Survey, Question, Answer, Insight, SurveyResponse
-from app.constants import CLAUDE_MODEL, DEFAULT_ANALYSIS_MAX_TOKENS, ANALYSIS_TEMPERATURE
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from app.models import db, Survey, Insight, InsightGeneration, InsightShardSummary
+from app.constants import (
+    CLAUDE_MODEL,
+    DEFAULT_ANALYSIS_MAX_TOKENS,
+    DEFAULT_SHARD_SUMMARY_MAX_TOKENS,
+    ANALYSIS_TEMPERATURE,
+    INSIGHT_SHARD_MAX_TOKENS,
+    INSIGHT_MAP_WORKERS,
+    INSIGHT_CLUSTERING,
+    INSIGHT_CLUSTER_MIN_ANSWERS,
+    INSIGHT_CARRY_OVER_MAX,
+    INSIGHT_FAILURE_BACKOFF,
+)
+from app.services import job_queue, llm_gateway
+from app.services.answer_clusters import cluster_survey_answers
+from app.services.data_access import completed_qa_data, completed_answer_count
+from app.services.prompt_builder import estimate_tokens, compact_qa_data, fit_items, cached_system, refresh_insights_digest
 
+logger = logging.getLogger(__name__)
 
-def generate_insights(survey_id):
+
+def insights_job_key(survey_id):
+    """Dedupe key that keeps insight generation single-flight per survey"""
+    return f'insights:{survey_id}'
+
+
+def insights_need_refresh(survey_id):
     """
-    Analyze survey responses and generate insights
+    Return True if completed responses have arrived since the current insight
+    generation was drawn (or if there is none yet)
     """
     survey = Survey.query.get(survey_id)
-    if not survey:
-        return []
+    current_response_count = survey.completed_count if survey else 0
+    if not current_response_count:
+        return False
+
+    if survey.current_generation_id is None:
+        return True
+    generation = db.session.get(InsightGeneration, survey.current_generation_id)
+    return current_response_count > generation.responses_count
+
+
+def recent_insights_failure(survey_id):
+    """
+    Return the survey's last insight generation job if it failed for good
+    less than INSIGHT_FAILURE_BACKOFF seconds ago, so callers don't queue
+    another one on every page view
+    """
+    job = job_queue.find_latest(insights_job_key(survey_id))
+    if job and job.status == 'failed' and job.finished_at \
+            and job.finished_at > datetime.utcnow() - timedelta(seconds=INSIGHT_FAILURE_BACKOFF):
+        return job
+    return None
 
-    # Get all completed responses
-    responses = SurveyResponse.query.filter(
-        SurveyResponse.survey_id == survey_id,
-        SurveyResponse.completed_at.isnot(None)
-    ).all()
 
-    if not responses:
+def current_insights(survey):
+    """The survey's current generation: its new insights and the useful ones carried over"""
+    if survey.current_generation_id is None:
         return []
+    return Insight.query.filter_by(generation_id=survey.current_generation_id).order_by(
+        Insight.created_at.desc(), Insight.id
+    ).all()
+
 
-    # Collect all Q&A pairs
-    all_qa_data = []
-    for response in responses:
-        answers = Answer.query.filter_by(response_id=response.id).all()
-        qa_pairs = [
+def _save_generation(survey, responses_count, insights):
+    """
+    Make insights the survey's current generation. Up to INSIGHT_CARRY_OVER_MAX
+    insights rated useful in the previous generation move into the new one, most
+    recently rated first; the previous generation is archived with the rest.
+    Commits.
+    """
+    generation = InsightGeneration(survey_id=survey.id, responses_count=responses_count)
+    db.session.add(generation)
+    db.session.flush()
+    for insight in insights:
+        insight.generation_id = generation.id
+        db.session.add(insight)
+
+    carried = 0
+    previous_id = survey.current_generation_id
+    if previous_id is not None:
+        useful_ids = [insight_id for (insight_id,) in db.session.query(Insight.id).filter(
+            Insight.generation_id == previous_id,
+            Insight.useful.is_(True)
+        ).order_by(Insight.marked_useful_at.desc()).limit(INSIGHT_CARRY_OVER_MAX)]
+        if useful_ids:
+            carried = db.session.execute(
+                db.update(Insight).where(Insight.id.in_(useful_ids)).values(generation_id=generation.id)
+            ).rowcount
+        db.session.execute(
+            db.update(InsightGeneration).where(InsightGeneration.id == previous_id).values(archived_at=datetime.utcnow())
+        )
+
+    generation.insight_count = len(insights) + carried
+    survey.current_generation_id = generation.id
+    survey.insight_count = generation.insight_count
+    # The question digest follows the new generation's useful insights
+    refresh_insights_digest(survey)
+    db.session.commit()
+    logger.info('Survey %s insight generation %s: %d new, %d carried over',
+                survey.id, generation.id, len(insights), carried)
+    return generation
+
+
+def _partition_shards(all_qa_data):
+    """
+    Split respondents into shards of at most INSIGHT_SHARD_MAX_TOKENS. Input
+    is in completion order, so new responses only ever change the last shard
+    and earlier shard summaries stay reusable.
+    """
+    shards = []
+    current = []
+    current_tokens = 0
+    for respondent in all_qa_data:
+        tokens = estimate_tokens(json.dumps(respondent))
+        if current and current_tokens + tokens > INSIGHT_SHARD_MAX_TOKENS:
+            shards.append(current)
+            current = []
+            current_tokens = 0
+        current.append(respondent)
+        current_tokens += tokens
+    if current:
+        shards.append(current)
+    return shards
+
+
+def _shard_key(shard):
+    """Identify a shard by the response IDs it covers"""
+    response_ids = ','.join(str(respondent['response_id']) for respondent in shard)
+    return hashlib.sha256(response_ids.encode('utf-8')).hexdigest()
+
+
+def _summarize_shard(survey_id, main_question, shard):
+    """Map step: condense one shard of responses into a summary for the reduce prompt"""
+    completion = llm_gateway.create_message(
+        call_site='insight_shard',
+        survey_id=survey_id,
+        model=CLAUDE_MODEL,
+        max_tokens=DEFAULT_SHARD_SUMMARY_MAX_TOKENS,
+        temperature=ANALYSIS_TEMPERATURE,
+        # Same instructions for every shard of the survey, so they form the cached prefix
+        system=cached_system(
+            f"""You are an expert survey data analyst. Summarize this subset of survey responses
+                for a later analysis of the main survey question: "{main_question}"
+
+                Describe the main themes, how common each is, the prevailing sentiment, any notable
+                disagreements, and include 3-5 short direct quotes that best represent the responses.
+                Be concise and factual; do not draw final conclusions."""
+        ),
+        messages=[
             {
-                "question": answer.question.text,
-                "answer": answer.text,
-                "processed_data": json.loads(answer.processed_data) if answer.processed_data else {}
+                "role": "user",
+                "content": f"Survey data ({len(shard)} respondents): {json.dumps(shard)}"
             }
-            for answer in answers
         ]
-        all_qa_data.append({
-            "respondent_id": response.respondent_id,
-            "qa_pairs": qa_pairs
-        })
+    )
+    return completion.content[0].text.strip()
+
+
+def _shard_summaries(survey, shards):
+    """
+    Return a summary per shard, reusing stored summaries for shards whose
+    responses haven't changed and summarizing the rest in parallel
+    """
+    keys = [_shard_key(shard) for shard in shards]
+    stored = {
+        summary.shard_key: summary
+        for summary in InsightShardSummary.query.filter_by(survey_id=survey.id)
+    }
+
+    missing = [(key, shard) for key, shard in zip(keys, shards) if key not in stored]
+    if missing:
+        logger.info('Summarizing %d of %d response shards', len(missing), len(shards))
+        main_question = survey.main_question
+        with ThreadPoolExecutor(max_workers=INSIGHT_MAP_WORKERS) as executor:
+            summaries = list(executor.map(lambda item: _summarize_shard(survey.id, main_question, item[1]), missing))
+
+        for (key, shard), summary_text in zip(missing, summaries):
+            stored[key] = InsightShardSummary(
+                survey_id=survey.id,
+                shard_key=key,
+                response_count=len(shard),
+                summary=summary_text
+            )
+            db.session.add(stored[key])
+
+    # Drop summaries of shards that no longer exist (e.g. a last shard that has since grown)
+    for key, summary in stored.items():
+        if key not in keys and summary.id is not None:
+            db.session.delete(summary)
+    db.session.commit()
+
+    return [
+        {"respondents": stored[key].response_count, "summary": stored[key].summary}
+        for key in keys
+    ]
+
+
+def _clustered_survey_data(survey):
+    """
+    Insight prompt data for a large survey: answer clusters per question with
+    their sizes, characteristic terms and representative quotes, instead of
+    every answer. None if there is nothing to cluster.
+    """
+    groups = cluster_survey_answers(survey.id)
+    if not groups:
+        return None
+    kept = fit_items(groups)
+    if len(kept) < len(groups):
+        logger.warning('Cluster prompt over budget: using %d of %d question groups', len(kept), len(groups))
+    return (
+        f"The {survey.completed_count} completed responses ({sum(group['answers'] for group in groups)} answers) "
+        f"were clustered by similarity, per question. Each cluster gives its number of answers, share of the "
+        f"question's answers, characteristic terms and the most typical answers verbatim; quote these in "
+        f"supporting_evidence. Clustered answers: {json.dumps(kept)}"
+    )
+
+
+def _raw_survey_data(survey):
+    """
+    Insight prompt data built from the answers themselves: all of them in one
+    prompt for a small survey, or shard summaries (map-reduce) for a larger one
+    """
+    # Collect all Q&A pairs of completed responses, in completion order so shards stay stable
+    all_qa_data = compact_qa_data(completed_qa_data(survey.id))
+    if not all_qa_data:
+        return None
+
+    shards = _partition_shards(all_qa_data)
+    if len(shards) == 1:
+        return f"Survey data: {json.dumps(all_qa_data)}"
+
+    # Hard cap on the reduce prompt; shards past the budget are left out
+    summaries = fit_items(_shard_summaries(survey, shards))
+    if len(summaries) < len(shards):
+        logger.warning('Reduce prompt over budget: using %d of %d shard summaries', len(summaries), len(shards))
+    return (
+        f"The {len(all_qa_data)} responses were analyzed in {len(shards)} groups. "
+        f"Summaries of each group: {json.dumps(summaries)}"
+    )
+
+
+def generate_insights(survey_id):
+    """
+    Analyze survey responses and generate insights.
+
+    Small surveys are analyzed in a single prompt. Surveys whose completed
+    responses hold at least INSIGHT_CLUSTER_MIN_ANSWERS answers are clustered
+    locally first, so the prompt carries clusters and quotes rather than
+    every answer. With INSIGHT_CLUSTERING off, larger surveys are split into
+    token-bounded shards that are summarized in parallel (map), and the
+    insights are drawn from the shard summaries (reduce).
+    """
+    survey = Survey.query.get(survey_id)
+    if not survey:
+        return []
+
+    current_response_count = survey.completed_count
 
     # Use Claude to generate insights
     try:
-        client = anthropic.Anthropic(api_key=os.getenv('ANTHROPIC_API_KEY'))
-        completion = client.messages.create(
+        # Only completed responses are analyzed, so abandoned ones don't count toward clustering
+        if INSIGHT_CLUSTERING and completed_answer_count(survey_id) >= INSIGHT_CLUSTER_MIN_ANSWERS:
+            survey_data = _clustered_survey_data(survey)
+        else:
+            survey_data = _raw_survey_data(survey)
+        if survey_data is None:
+            return []
+
+        completion = llm_gateway.create_message(
+            call_site='insights',
+            survey_id=survey_id,
+            expect_json=True,
             model=CLAUDE_MODEL,
             max_tokens=DEFAULT_ANALYSIS_MAX_TOKENS,
             temperature=ANALYSIS_TEMPERATURE,
-            messages=[
-                {
-                    "role": "user",
-                    "content": f"""You are an expert survey data analyst. Analyze the survey responses and generate 
+            system=cached_system(
+                f"""You are an expert survey data analyst. Analyze the survey responses and generate 
                     3-7 valuable insights related to the main survey question: "{survey.main_question}"
 
                     Return your analysis as a JSON array with this EXACT structure:
@@ -70,24 +301,26 @@ def generate_insights(survey_id):
                     - insight_type: categorize as trend, pattern, recommendation, concern, or opportunity
                     - tags: 2-4 relevant keywords for this insight
 
-                    Focus on insights that would be most valuable for improving the survey topic or understanding user needs.
-                    
-                    Survey data: {json.dumps(all_qa_data)}"""
+                    Focus on insights that would be most valuable for improving the survey topic or understanding user needs."""
+            ),
+            messages=[
+                {
+                    "role": "user",
+                    "content": survey_data
                 }
             ]
         )
 
         insights_text = completion.content[0].text
-        print(f'Insights text: {insights_text}')
+        logger.debug('Insights text: %s', insights_text)
 
         # Try to parse as JSON
         try:
             insights_data = json.loads(insights_text)
 
-            # Save insights to database
-            current_response_count = len(responses)
-            for insight_data in insights_data:
-                insight = Insight(
+            # Save insights to database as the survey's new current generation
+            _save_generation(survey, current_response_count, [
+                Insight(
                     survey_id=survey_id,
                     text=insight_data.get('insight_statement', ''),
                     supporting_evidence=insight_data.get('supporting_evidence', ''),
@@ -96,26 +329,24 @@ def generate_insights(survey_id):
                     tags=json.dumps(insight_data.get('tags', [])),
                     generated_from_responses_count=current_response_count
                 )
-                db.session.add(insight)
-
-            db.session.commit()
+                for insight_data in insights_data
+            ])
             return insights_data
 
         except json.JSONDecodeError:
-            print(f"Error parsing insights JSON: {insights_text}")
+            logger.error('Error parsing insights JSON: %s', insights_text)
 
             # Save as single insight if JSON parsing fails
-            current_response_count = len(responses)
-            insight = Insight(
-                survey_id=survey_id,
-                text=insights_text,
-                confidence=0.5,
-                generated_from_responses_count=current_response_count
-            )
-            db.session.add(insight)
-            db.session.commit()
+            _save_generation(survey, current_response_count, [
+                Insight(
+                    survey_id=survey_id,
+                    text=insights_text,
+                    confidence=0.5,
+                    generated_from_responses_count=current_response_count
+                )
+            ])
             return [{"text": insights_text}]
 
     except Exception as e:
-        print(f"Error generating insights: {e}")
+        logger.exception('Error generating insights: %s', e)
         return []
\ No newline at end of file
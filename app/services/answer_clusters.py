@@ -0,0 +1,182 @@
+import logging
+import math
+import zlib
+from collections import Counter
+import numpy as np
+from app.models import db, Answer, Question, SurveyResponse
+from app.constants import (
+    ANSWER_CLUSTER_MAX_K,
+    ANSWER_CLUSTER_MIN_ANSWERS,
+    ANSWER_CLUSTER_ITERATIONS,
+    ANSWER_CLUSTER_QUOTES,
+    ANSWER_CLUSTER_TERMS,
+)
+from app.services.data_access import QA_YIELD_PER
+from app.services.prompt_builder import truncate_text
+from app.services.text_vectors import SparseRows, decode_features, encode_features, term_index, tokenize
+
+logger = logging.getLogger(__name__)
+
+# Member answers scanned for a cluster's characteristic terms
+TERM_SAMPLE_SIZE = 40
+# Longest quote passed to the insight prompt
+QUOTE_MAX_CHARS = 300
+
+
+def cluster_survey_answers(survey_id):
+    """
+    Cluster the answers of a survey's completed responses by similarity.
+
+    Questions with at least ANSWER_CLUSTER_MIN_ANSWERS answers (typically the
+    shared opening questions) are clustered on their own; answers to the
+    rarer per-respondent follow-ups are pooled into one group. Returns one
+    dict per group, largest first:
+    {"question", "answers", "clusters": [{"answers", "share", "key_terms", "quotes"}], "unclustered"}
+    """
+    answer_ids, question_ids, features = _load_features(survey_id)
+    if not answer_ids:
+        return []
+
+    answers_per_question = Counter(question_ids)
+    positions = {}
+    for position, question_id in enumerate(question_ids):
+        key = question_id if answers_per_question[question_id] >= ANSWER_CLUSTER_MIN_ANSWERS else None
+        positions.setdefault(key, []).append(position)
+    question_texts = dict(
+        db.session.query(Question.id, Question.text).filter(Question.id.in_([key for key in positions if key]))
+    )
+
+    groups = []
+    for key, group_positions in positions.items():
+        clusters, unclustered = _cluster_group(
+            [answer_ids[position] for position in group_positions],
+            [features[position] for position in group_positions],
+            seed=key or 0
+        )
+        groups.append({
+            'question': question_texts[key] if key else 'Follow-up questions (each asked to few respondents)',
+            'answers': len(group_positions),
+            'clusters': clusters,
+            'unclustered': unclustered,
+        })
+    groups.sort(key=lambda group: group['answers'], reverse=True)
+    _fill_in_text(groups)
+    return groups
+
+
+def _load_features(survey_id):
+    """Answer ids, question ids and hashed features, computing and storing any that are missing"""
+    answer_ids, question_ids, features, stale = [], [], [], []
+    rows = db.session.query(Answer.id, Answer.question_id, Answer.text_features).join(
+        SurveyResponse, SurveyResponse.id == Answer.response_id
+    ).filter(
+        SurveyResponse.survey_id == survey_id,
+        SurveyResponse.completed_at.isnot(None)
+    ).order_by(Answer.id).yield_per(QA_YIELD_PER)
+
+    for answer_id, question_id, blob in rows:
+        decoded = decode_features(blob)
+        if decoded is None:
+            stale.append(len(answer_ids))
+        answer_ids.append(answer_id)
+        question_ids.append(question_id)
+        features.append(decoded)
+
+    for start in range(0, len(stale), QA_YIELD_PER):
+        chunk = stale[start:start + QA_YIELD_PER]
+        texts = dict(db.session.query(Answer.id, Answer.text).filter(Answer.id.in_([answer_ids[i] for i in chunk])))
+        updates = [{'id': answer_ids[i], 'text_features': encode_features(texts[answer_ids[i]])} for i in chunk]
+        db.session.execute(db.update(Answer), updates)
+        for i, update in zip(chunk, updates):
+            features[i] = decode_features(update['text_features'])
+    if stale:
+        db.session.commit()
+        logger.info('Computed text features for %d answers of survey %s', len(stale), survey_id)
+
+    return answer_ids, question_ids, features
+
+
+def _cluster_group(answer_ids, features, seed):
+    """Cluster one group's answers; returns (clusters with member ids to fill in, unclustered count)"""
+    rows = SparseRows(features).tfidf()
+    has_terms = np.diff(rows.indptr) > 0
+    clusterable = int(has_terms.sum())
+    if not clusterable:
+        return [], len(answer_ids)
+
+    k = min(ANSWER_CLUSTER_MAX_K, max(1, round(math.sqrt(clusterable / 2))))
+    labels, similarities, centroids = _spherical_kmeans(rows, k, seed)
+    labels[~has_terms] = -1
+
+    clusters = []
+    for cluster, centroid in enumerate(centroids):
+        members = np.flatnonzero(labels == cluster)
+        if not len(members):
+            continue
+        # Closest to the centroid first, so the quotes are the most typical answers
+        ranked = members[np.argsort(-similarities[members, cluster])]
+        clusters.append({
+            'answers': len(members),
+            'share': round(len(members) / len(answer_ids), 3),
+            '_centroid': centroid,
+            '_quote_ids': [answer_ids[i] for i in ranked[:ANSWER_CLUSTER_QUOTES]],
+            '_sample_ids': [answer_ids[i] for i in ranked[:TERM_SAMPLE_SIZE]],
+        })
+    clusters.sort(key=lambda cluster: cluster['answers'], reverse=True)
+    return clusters, int((~has_terms).sum())
+
+
+def _spherical_kmeans(rows, k, seed):
+    """
+    k-means on unit vectors with cosine similarity, seeded k-means++ style.
+    Returns (labels, row-to-centroid similarities, centroids).
+    """
+    rng = np.random.default_rng(zlib.crc32(str(seed).encode('utf-8')))
+    count = len(rows)
+    centroids = [rows.dense_row(int(rng.integers(count)))]
+    closest = rows.dot(np.array(centroids))[:, 0]
+    while len(centroids) < k:
+        distance = np.clip(1 - closest, 0, None)
+        if distance.sum() <= 0:
+            break
+        chosen = rows.dense_row(int(rng.choice(count, p=distance / distance.sum())))
+        centroids.append(chosen)
+        closest = np.maximum(closest, rows.dot(chosen[None, :])[:, 0])
+    centroids = np.array(centroids)
+
+    labels = None
+    for _ in range(ANSWER_CLUSTER_ITERATIONS):
+        similarities = rows.dot(centroids)
+        new_labels = similarities.argmax(axis=1)
+        if labels is not None and np.array_equal(labels, new_labels):
+            break
+        labels = new_labels
+        sums = rows.sum_rows_by(labels, len(centroids))
+        norms = np.linalg.norm(sums, axis=1)
+        # A centroid that lost all its members is dropped
+        centroids = sums[norms > 0] / norms[norms > 0, None]
+
+    similarities = rows.dot(centroids)
+    return similarities.argmax(axis=1), similarities, centroids
+
+
+def _fill_in_text(groups):
+    """Replace each cluster's member ids with its quotes and characteristic terms, in one query"""
+    wanted = {
+        answer_id
+        for group in groups for cluster in group['clusters']
+        for answer_id in cluster['_sample_ids']
+    }
+    texts = {}
+    wanted = list(wanted)
+    for start in range(0, len(wanted), QA_YIELD_PER):
+        texts.update(db.session.query(Answer.id, Answer.text).filter(Answer.id.in_(wanted[start:start + QA_YIELD_PER])))
+
+    for group in groups:
+        for cluster in group['clusters']:
+            centroid = cluster.pop('_centroid')
+            sample = [texts[answer_id] for answer_id in cluster.pop('_sample_ids')]
+            terms = Counter(term for text in sample for term in set(tokenize(text)))
+            scored = sorted(terms, key=lambda term: (centroid[term_index(term)] * terms[term], term), reverse=True)
+            cluster['key_terms'] = scored[:ANSWER_CLUSTER_TERMS]
+            cluster['quotes'] = [truncate_text(texts[answer_id], QUOTE_MAX_CHARS) for answer_id in cluster.pop('_quote_ids')]
@@ -0,0 +1,118 @@
+import json
+from app.models import db, Question, Answer, SurveyResponse
+
+# Rows fetched per round-trip when streaming a survey's answers
+QA_YIELD_PER = 1000
+
+# Columns of iter_survey_answers rows, in order
+ANSWER_EXPORT_COLUMNS = (
+    'response_id', 'respondent_id', 'started_at', 'completed_at',
+    'question_id', 'question_order', 'question_type', 'question_text',
+    'answer_id', 'answer_text', 'answered_at', 'processed_data',
+)
+
+
+def response_qa_pairs(response_id):
+    """A response's question/answer pairs in answer order, in one joined query"""
+    rows = db.session.query(Question.text, Answer.text).join(
+        Answer, Answer.question_id == Question.id
+    ).filter(
+        Answer.response_id == response_id
+    ).order_by(Answer.id)
+
+    return [{"question": question_text, "answer": answer_text} for question_text, answer_text in rows]
+
+
+def response_answer_count(response_id):
+    """Number of questions a response has answered"""
+    return db.session.query(db.func.count(Answer.id)).filter(
+        Answer.response_id == response_id
+    ).scalar()
+
+
+def completed_answer_count(survey_id):
+    """Number of answers in a survey's completed responses"""
+    return db.session.query(db.func.count(Answer.id)).join(
+        SurveyResponse, SurveyResponse.id == Answer.response_id
+    ).filter(
+        SurveyResponse.survey_id == survey_id,
+        SurveyResponse.completed_at.isnot(None)
+    ).scalar()
+
+
+def iter_completed_qa(survey_id):
+    """
+    Stream every answer of a survey's completed responses, joined with its
+    question and response, in completion order. Rows are fetched in chunks
+    of QA_YIELD_PER so memory stays flat for large surveys.
+    """
+    return db.session.query(
+        SurveyResponse.id,
+        SurveyResponse.respondent_id,
+        Question.text,
+        Answer.text,
+        Answer.processed_data
+    ).join(
+        Answer, Answer.response_id == SurveyResponse.id
+    ).join(
+        Question, Question.id == Answer.question_id
+    ).filter(
+        SurveyResponse.survey_id == survey_id,
+        SurveyResponse.completed_at.isnot(None)
+    ).order_by(
+        SurveyResponse.completed_at, SurveyResponse.id, Answer.id
+    ).yield_per(QA_YIELD_PER)
+
+
+def completed_qa_data(survey_id):
+    """
+    Q&A for every completed response of a survey, grouped per respondent:
+    [{"response_id", "respondent_id", "qa_pairs": [...]}], in one query
+    """
+    all_qa_data = []
+    current = None
+    for response_id, respondent_id, question_text, answer_text, processed_data in iter_completed_qa(survey_id):
+        if current is None or current["response_id"] != response_id:
+            current = {
+                "response_id": response_id,
+                "respondent_id": respondent_id,
+                "qa_pairs": []
+            }
+            all_qa_data.append(current)
+        current["qa_pairs"].append({
+            "question": question_text,
+            "answer": answer_text,
+            "processed_data": json.loads(processed_data) if processed_data else {}
+        })
+    return all_qa_data
+
+
+def iter_survey_answers(survey_id, yield_per=QA_YIELD_PER):
+    """
+    Stream every answer of a survey, completed or not, with its response and
+    question, as plain tuples in ANSWER_EXPORT_COLUMNS order. Rows arrive in
+    chunks of yield_per (a server-side cursor where the backend has one), so
+    memory stays flat however large the survey is.
+    """
+    return db.session.query(
+        SurveyResponse.id,
+        SurveyResponse.respondent_id,
+        SurveyResponse.started_at,
+        SurveyResponse.completed_at,
+        Question.id,
+        Question.order,
+        Question.question_type,
+        Question.text,
+        Answer.id,
+        Answer.text,
+        Answer.created_at,
+        Answer.processed_data
+    ).join(
+        Answer, Answer.response_id == SurveyResponse.id
+    ).join(
+        Question, Question.id == Answer.question_id
+    ).filter(
+        SurveyResponse.survey_id == survey_id
+    ).order_by(
+        SurveyResponse.id, Answer.id
+    ).yield_per(yield_per)
@@ -0,0 +1,67 @@
+import logging
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from app.models import db
+
+logger = logging.getLogger(__name__)
+
+
+def apply_engine_options(app):
+    """
+    Fill in SQLALCHEMY_ENGINE_OPTIONS for the configured backend; call before
+    db.init_app. Options already set in the config are kept.
+
+    SQLite uses SQLAlchemy's defaults and is tuned per connection by init_app.
+    Other backends get a pool of DB_POOL_SIZE connections (plus
+    DB_MAX_OVERFLOW) per process, checked with a ping before use and
+    replaced after DB_POOL_RECYCLE seconds.
+    """
+    url = make_url(app.config['SQLALCHEMY_DATABASE_URI'])
+    if url.get_backend_name() == 'sqlite':
+        return
+
+    options = app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+    options.setdefault('pool_size', app.config.get('DB_POOL_SIZE', 10))
+    options.setdefault('max_overflow', app.config.get('DB_MAX_OVERFLOW', 20))
+    options.setdefault('pool_timeout', app.config.get('DB_POOL_TIMEOUT', 30))
+    options.setdefault('pool_recycle', app.config.get('DB_POOL_RECYCLE', 1800))
+    options.setdefault('pool_pre_ping', True)
+
+
+def init_app(app):
+    """
+    Apply the SQLite pragmas to every new connection; call after db.init_app.
+
+    WAL lets readers carry on while one process writes, busy_timeout makes
+    a writer wait for the lock instead of failing with "database is locked",
+    and synchronous=NORMAL skips the fsync on every commit (still safe
+    against corruption in WAL mode; a power cut can lose the last commits).
+    An empty SQLITE_JOURNAL_MODE or SQLITE_SYNCHRONOUS, or a zero
+    SQLITE_BUSY_TIMEOUT_MS, leaves that setting at SQLite's default.
+    """
+    with app.app_context():
+        engine = db.engine
+    if engine.dialect.name != 'sqlite':
+        return
+
+    # busy_timeout first, so switching the journal mode also waits for the lock
+    pragmas = []
+    if app.config.get('SQLITE_BUSY_TIMEOUT_MS'):
+        pragmas.append(f"PRAGMA busy_timeout={int(app.config['SQLITE_BUSY_TIMEOUT_MS'])}")
+    if app.config.get('SQLITE_JOURNAL_MODE'):
+        pragmas.append(f"PRAGMA journal_mode={app.config['SQLITE_JOURNAL_MODE']}")
+    if app.config.get('SQLITE_SYNCHRONOUS'):
+        pragmas.append(f"PRAGMA synchronous={app.config['SQLITE_SYNCHRONOUS']}")
+    if not pragmas:
+        return
+
+    @event.listens_for(engine, 'connect')
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+    logger.debug('SQLite connections will run: %s', '; '.join(pragmas))
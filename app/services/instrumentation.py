@@ -0,0 +1,159 @@
+import hmac
+import logging
+import time
+from flask import Response, abort, current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from app.services import metrics, llm_cache, llm_gateway, job_queue
+from app.constants import REQUEST_LATENCY_BUCKETS, SQL_QUERY_COUNT_BUCKETS, SLOW_REQUEST_MAX_QUERIES
+
+logger = logging.getLogger(__name__)
+
+REQUEST_DURATION = metrics.histogram(
+    'http_request_duration_seconds', 'Request latency by endpoint, including streamed bodies',
+    REQUEST_LATENCY_BUCKETS
+)
+REQUEST_QUERIES = metrics.histogram(
+    'http_request_db_queries', 'SQL statements per request by endpoint', SQL_QUERY_COUNT_BUCKETS
+)
+REQUEST_DB_TIME = metrics.histogram(
+    'http_request_db_seconds', 'Time spent in SQL per request by endpoint', REQUEST_LATENCY_BUCKETS
+)
+DB_QUERIES = metrics.counter('db_queries_total', 'SQL statements executed, by request or background context')
+DB_TIME = metrics.counter('db_query_seconds_total', 'Seconds spent in SQL, by request or background context')
+
+_sql_hooks_installed = False
+
+
+def init_app(app):
+    """
+    Time every request, count its SQL, and serve everything at /metrics.
+
+    Metrics are per process: with several gunicorn workers each scrape sees
+    the worker that answered it, so scrape each worker or run one per host.
+    """
+    _install_sql_hooks()
+    slow_after = app.config.get('SLOW_REQUEST_SECONDS') or 0
+
+    @app.before_request
+    def _start_request_metrics():
+        g.request_started = time.perf_counter()
+        g.query_count = 0
+        g.query_seconds = 0.0
+        # The statement list is only kept when someone will read it
+        g.query_log = [] if slow_after else None
+
+    @app.after_request
+    def _remember_status(response):
+        g.response_status = response.status_code
+        return response
+
+    # Runs after a streamed body has finished, so SSE requests are timed in full
+    @app.teardown_request
+    def _record_request_metrics(error=None):
+        started = g.pop('request_started', None)
+        if started is None:
+            return
+        duration = time.perf_counter() - started
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        status = 500 if error else g.get('response_status', 200)
+
+        REQUEST_DURATION.observe(duration, endpoint=endpoint, method=request.method, status=status)
+        REQUEST_QUERIES.observe(g.query_count, endpoint=endpoint)
+        REQUEST_DB_TIME.observe(g.query_seconds, endpoint=endpoint)
+
+        if slow_after and duration >= slow_after:
+            logger.warning(
+                'Slow request %s %s took %.3fs with %d queries (%.3fs in SQL)',
+                request.method, request.path, duration, g.query_count, g.query_seconds,
+                extra={'queries': [f'{seconds * 1000:.1f}ms {statement}' for seconds, statement in g.query_log]}
+            )
+
+    @app.route('/metrics')
+    def metrics_endpoint():
+        if app.config.get('METRICS_TOKEN') and not has_metrics_token():
+            abort(401)
+        return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+def has_metrics_token():
+    """Whether the request carries the METRICS_TOKEN bearer token; always False if none is set"""
+    token = current_app.config.get('METRICS_TOKEN')
+    return bool(token) and hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')
+
+
+def _install_sql_hooks():
+    """Listen on every engine once per process"""
+    global _sql_hooks_installed
+
+    if _sql_hooks_installed:
+        return
+    event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+    event.listen(Engine, 'handle_error', _handle_error)
+    _sql_hooks_installed = True
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_started'].pop()
+    in_request = has_request_context() and 'query_count' in g
+    source = 'request' if in_request else 'background'
+    DB_QUERIES.inc(context=source)
+    DB_TIME.inc(elapsed, context=source)
+
+    if in_request:
+        g.query_count += 1
+        g.query_seconds += elapsed
+        if g.query_log is not None and len(g.query_log) < SLOW_REQUEST_MAX_QUERIES:
+            g.query_log.append((elapsed, statement))
+
+
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute
+    connection = exception_context.connection
+    if connection is not None and connection.info.get('query_started'):
+        connection.info['query_started'].pop()
+
+
+@metrics.collector
+def _llm_cache_metrics():
+    stats = llm_cache.cache_stats()
+    return metrics.gauge_lines(
+        'llm_cache_requests_total', 'LLM response cache lookups by policy and result',
+        [
+            ({'policy': policy, 'result': result}, counts[key])
+            for policy, counts in stats.items()
+            for result, key in (('hit', 'hits'), ('miss', 'misses'))
+        ],
+        type='counter'
+    )
+
+
+@metrics.collector
+def _llm_usage_metrics():
+    usage = llm_gateway.usage_stats()
+    return metrics.gauge_lines(
+        'llm_tokens_total', 'Tokens reported by Claude by call site and kind',
+        [
+            ({'call_site': call_site, 'type': field}, totals[field])
+            for call_site, totals in usage.items()
+            for field in llm_gateway.USAGE_FIELDS
+        ],
+        type='counter'
+    )
+
+
+@metrics.collector
+def _job_queue_metrics():
+    if not has_request_context():
+        return []
+    stats = job_queue.queue_stats()
+    lines = []
+    for name in ('pending', 'running', 'failed', 'lag_seconds', 'workers'):
+        lines.extend(metrics.gauge_lines(f'job_queue_{name}', f'Background job queue: {name.replace("_", " ")}',
+                                         [({}, stats[name])]))
+    return lines
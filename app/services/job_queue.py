@@ -0,0 +1,366 @@
+import click
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+from sqlalchemy.exc import IntegrityError
+from app.models import db, Job
+from app.constants import (
+    JOB_POLL_INTERVAL,
+    JOB_MAX_ATTEMPTS,
+    JOB_RETRY_DELAY,
+    JOB_STALE_AFTER,
+    JOB_DONE_RETENTION_HOURS,
+    JOB_FAILED_RETENTION_HOURS,
+)
+
+logger = logging.getLogger(__name__)
+
+# Job kind -> handler function taking the decoded payload
+HANDLERS = {}
+# Job kind -> (max batch size, seconds to wait for a batch to fill)
+BATCH_SETTINGS = {}
+
+_workers = []
+_workers_pid = None
+_start_lock = threading.Lock()
+_wakeup = threading.Event()
+
+
+def job_handler(kind, batch_size=None, batch_window=0):
+    """
+    Register a function as the handler for jobs of the given kind.
+
+    With a batch_size, the handler instead receives a list of up to batch_size
+    payloads: a worker that claims one such job waits up to batch_window
+    seconds for more of the same kind before running them together.
+    """
+    def decorator(func):
+        HANDLERS[kind] = func
+        if batch_size:
+            BATCH_SETTINGS[kind] = (batch_size, batch_window)
+        return func
+    return decorator
+
+
+def init_app(app):
+    """
+    Attach the queue to an app. Worker threads are started lazily on the first
+    request so that each forked gunicorn worker runs its own pool, and so that
+    scripts like init_db.py never start workers.
+    """
+    @app.before_request
+    def _ensure_job_workers():
+        if _workers_pid != os.getpid():
+            start_workers(app)
+
+    @app.cli.command('run-jobs')
+    def run_jobs_command():
+        """Run all due background jobs in the foreground, then exit."""
+        _requeue_stale_jobs()
+        ran = run_pending()
+        click.echo(f"Ran {ran} job(s)")
+
+    @app.cli.command('purge-jobs')
+    def purge_jobs_command():
+        """Delete finished and failed jobs past their retention period."""
+        click.echo(f"Deleted {purge_finished_jobs()} job(s)")
+
+
+def start_workers(app, count=None):
+    """Start the worker pool for this process (idempotent per process)"""
+    global _workers, _workers_pid
+
+    if count is None:
+        count = app.config.get('JOB_WORKER_THREADS', 0)
+
+    with _start_lock:
+        if _workers_pid == os.getpid():
+            return
+        _workers = []
+        _workers_pid = os.getpid()
+        for i in range(count):
+            thread = threading.Thread(
+                target=_worker_loop,
+                args=(app,),
+                name=f'job-worker-{i}',
+                daemon=True
+            )
+            thread.start()
+            _workers.append(thread)
+
+
+def enqueue(kind, payload=None, delay=0, dedupe_key=None):
+    """
+    Add a job to the queue and return it. The job is committed with the
+    current session so it survives a restart even if no worker picks it up.
+
+    With a dedupe_key, an already pending or running job with the same key is
+    returned instead of queueing a duplicate, and workers never run two jobs
+    with the same key at once. A unique index on active keys catches two
+    callers racing past the check; the caller's own changes are committed
+    first so that losing the race only rolls back the job.
+    """
+    if dedupe_key:
+        existing = find_active(dedupe_key)
+        db.session.commit()
+        if existing:
+            return existing
+
+    job = Job(
+        kind=kind,
+        payload=json.dumps(payload or {}),
+        run_after=datetime.utcnow() + timedelta(seconds=delay),
+        dedupe_key=dedupe_key
+    )
+    db.session.add(job)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        if not dedupe_key:
+            raise
+        # A concurrent enqueue of the same key got there first
+        db.session.rollback()
+        existing = find_active(dedupe_key)
+        db.session.commit()
+        if existing:
+            return existing
+        # ...and it already finished; queue ours after all
+        return enqueue(kind, payload, delay, dedupe_key)
+    _wakeup.set()
+    return job
+
+
+def enqueue_many(kind, payloads):
+    """
+    Add one job per payload with a single bulk insert and return how many.
+    Unlike enqueue this doesn't commit: the jobs join the caller's
+    transaction, so they commit or roll back with the rows they refer to.
+    """
+    if not payloads:
+        return 0
+    db.session.execute(db.insert(Job), [{'kind': kind, 'payload': json.dumps(payload)} for payload in payloads])
+    _wakeup.set()
+    return len(payloads)
+
+
+def find_active(dedupe_key):
+    """Return the pending or running job for a dedupe key, if any"""
+    return Job.query.filter(
+        Job.dedupe_key == dedupe_key,
+        Job.status.in_(['pending', 'running'])
+    ).order_by(Job.id).first()
+
+
+def take_over(job_id):
+    """
+    Mark a pending job done without running it, for a caller about to do the
+    same work itself. Returns False if a worker has already claimed the job.
+    """
+    result = db.session.execute(
+        db.update(Job)
+        .where(Job.id == job_id, Job.status == 'pending')
+        .values(status='done', finished_at=datetime.utcnow())
+    )
+    db.session.commit()
+    return result.rowcount == 1
+
+
+def find_latest(dedupe_key):
+    """Return the most recently queued job for a dedupe key, if any"""
+    return Job.query.filter_by(dedupe_key=dedupe_key).order_by(Job.id.desc()).first()
+
+
+def queue_stats():
+    """Return queue depth, in-flight count, failures and lag of the oldest pending job"""
+    now = datetime.utcnow()
+    pending = Job.query.filter_by(status='pending')
+    oldest = pending.with_entities(db.func.min(Job.created_at)).scalar()
+
+    return {
+        'pending': pending.count(),
+        'running': Job.query.filter_by(status='running').count(),
+        'failed': Job.query.filter_by(status='failed').count(),
+        'lag_seconds': (now - oldest).total_seconds() if oldest else 0.0,
+        'workers': sum(1 for thread in _workers if thread.is_alive()) if _workers_pid == os.getpid() else 0,
+    }
+
+
+def run_pending(limit=None):
+    """Run due jobs in the calling thread until the queue is empty; returns how many ran"""
+    ran = 0
+    while limit is None or ran < limit:
+        job = _claim_next()
+        if job is None:
+            break
+        jobs = _fill_batch(job)
+        _run_jobs(jobs)
+        ran += len(jobs)
+    return ran
+
+
+def _worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}:{threading.current_thread().name}'
+
+
+def _requeue_stale_jobs():
+    """Return jobs left 'running' by a crashed or restarted worker to the queue"""
+    cutoff = datetime.utcnow() - timedelta(seconds=JOB_STALE_AFTER)
+    result = db.session.execute(
+        db.update(Job)
+        .where(Job.status == 'running', Job.started_at < cutoff)
+        .values(status='pending', worker=None)
+    )
+    db.session.commit()
+    return result.rowcount
+
+
+def purge_finished_jobs():
+    """
+    Delete jobs done more than JOB_DONE_RETENTION_HOURS ago and jobs failed
+    more than JOB_FAILED_RETENTION_HOURS ago; returns how many
+    """
+    now = datetime.utcnow()
+    result = db.session.execute(
+        db.delete(Job).where(db.or_(
+            db.and_(Job.status == 'done', Job.finished_at < now - timedelta(hours=JOB_DONE_RETENTION_HOURS)),
+            db.and_(Job.status == 'failed', Job.finished_at < now - timedelta(hours=JOB_FAILED_RETENTION_HOURS)),
+        ))
+    )
+    db.session.commit()
+    return result.rowcount
+
+
+def _claim_next():
+    """
+    Claim the oldest due job. The conditional UPDATE makes the claim atomic,
+    so several threads or processes can poll the same table safely.
+    """
+    now = datetime.utcnow()
+    running = db.aliased(Job)
+    key_in_flight = db.session.query(running.id).filter(
+        running.dedupe_key == Job.dedupe_key,
+        running.status == 'running'
+    ).exists()
+
+    while True:
+        job_id = db.session.query(Job.id).filter(
+            Job.status == 'pending',
+            Job.run_after <= now,
+            ~key_in_flight
+        ).order_by(Job.id).limit(1).scalar()
+
+        if job_id is None:
+            db.session.commit()
+            return None
+
+        job = _claim(job_id)
+        if job is not None:
+            return job
+        # Another worker got there first; try the next one
+
+
+def _claim(job_id):
+    """Mark a pending job as running by this worker; None if someone else has it"""
+    result = db.session.execute(
+        db.update(Job)
+        .where(Job.id == job_id, Job.status == 'pending')
+        .values(
+            status='running',
+            started_at=datetime.utcnow(),
+            attempts=Job.attempts + 1,
+            worker=_worker_name()
+        )
+    )
+    db.session.commit()
+
+    if result.rowcount == 1:
+        return db.session.get(Job, job_id)
+    return None
+
+
+def _fill_batch(job):
+    """
+    Claim more pending jobs of a batched kind to run alongside job, waiting up
+    to the kind's batch window for the batch to fill
+    """
+    if job.kind not in BATCH_SETTINGS:
+        return [job]
+
+    batch_size, batch_window = BATCH_SETTINGS[job.kind]
+    deadline = time.monotonic() + batch_window
+    jobs = [job]
+    while len(jobs) < batch_size:
+        job_ids = db.session.query(Job.id).filter(
+            Job.kind == job.kind,
+            Job.status == 'pending',
+            Job.run_after <= datetime.utcnow()
+        ).order_by(Job.id).limit(batch_size - len(jobs)).all()
+        db.session.commit()
+
+        for (job_id,) in job_ids:
+            claimed = _claim(job_id)
+            if claimed is not None:
+                jobs.append(claimed)
+
+        if len(jobs) >= batch_size or time.monotonic() >= deadline:
+            break
+        time.sleep(min(0.05, max(0, deadline - time.monotonic())))
+    return jobs
+
+
+def _run_jobs(jobs):
+    """Run a claimed job, or a claimed batch of same-kind jobs, and record the outcome"""
+    kind = jobs[0].kind
+    job_ids = [job.id for job in jobs]
+    handler = HANDLERS.get(kind)
+    payloads = [json.loads(job.payload) if job.payload else {} for job in jobs]
+    try:
+        if handler is None:
+            raise LookupError(f'No handler registered for job kind {kind!r}')
+        handler(payloads if kind in BATCH_SETTINGS else payloads[0])
+        for job in jobs:
+            job.status = 'done'
+            job.error = None
+            job.finished_at = datetime.utcnow()
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.warning('Error running job(s) %s (%s): %s', job_ids, kind, e)
+        error = traceback.format_exc()
+        for job in Job.query.filter(Job.id.in_(job_ids)):
+            job.error = error
+            if job.attempts < JOB_MAX_ATTEMPTS:
+                job.status = 'pending'
+                job.run_after = datetime.utcnow() + timedelta(seconds=JOB_RETRY_DELAY * job.attempts)
+            else:
+                job.status = 'failed'
+                job.finished_at = datetime.utcnow()
+        db.session.commit()
+
+
+def _worker_loop(app):
+    last_stale_check = None
+    while True:
+        job = None
+        try:
+            with app.app_context():
+                now = datetime.utcnow()
+                if last_stale_check is None or (now - last_stale_check).total_seconds() > JOB_STALE_AFTER:
+                    _requeue_stale_jobs()
+                    purge_finished_jobs()
+                    last_stale_check = now
+
+                job = _claim_next()
+                if job is not None:
+                    _run_jobs(_fill_batch(job))
+        except Exception as e:
+            logger.exception('Job worker error: %s', e)
+
+        if job is None:
+            _wakeup.wait(JOB_POLL_INTERVAL)
+            _wakeup.clear()
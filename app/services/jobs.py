@@ -0,0 +1,85 @@
+import os
+from app.models import db, Answer, SurveyResponse
+from app.constants import MAX_QUESTIONS_PER_SURVEY, PROCESSING_BATCH_SIZE, PROCESSING_BATCH_WINDOW
+from app.services.job_queue import job_handler
+from app.services.data_access import response_answer_count
+from app.services.analysis_service import generate_insights, insights_need_refresh
+from app.services.question_generator import generate_next_question, generate_opening_questions, assign_pending_question
+from app.services.response_processor import process_responses_batch
+from app.services.response_import import run_import
+from app.services.text_vectors import encode_features
+
+
+@job_handler('process_answer', batch_size=PROCESSING_BATCH_SIZE, batch_window=PROCESSING_BATCH_WINDOW)
+def process_answer_job(payloads):
+    """Fill in processed_data for a batch of answers saved by /api/submit_answer"""
+    process_answers([payload['answer_id'] for payload in payloads])
+
+
+@job_handler('process_answers')
+def process_answers_job(payload):
+    """Fill in processed_data for answers queued as one batch, e.g. by a bulk import"""
+    process_answers(payload['answer_ids'])
+
+
+@job_handler('import_responses')
+def import_responses_job(payload):
+    """Run (or resume) an uploaded bulk import, then delete the upload"""
+    run = run_import(payload['import_id'])
+    if run is not None and run.status == 'done' and os.path.exists(run.path):
+        os.remove(run.path)
+
+
+def process_answers(answer_ids):
+    """
+    Extract structured data for the given answers, skipping any already done.
+    Answers the local extractor can't settle go to Claude in one request.
+    """
+    rows = db.session.query(Answer, SurveyResponse.survey_id).join(
+        SurveyResponse, Answer.response_id == SurveyResponse.id
+    ).filter(
+        Answer.id.in_(answer_ids),
+        Answer.processed_data.is_(None)
+    ).all()
+    if not rows:
+        return
+
+    answers = [answer for answer, _ in rows]
+    results = process_responses_batch(
+        [(answer.id, answer.text) for answer in answers],
+        attribution={answer.id: (survey_id, answer.response_id) for answer, survey_id in rows}
+    )
+    for answer in answers:
+        answer.processed_data = results[answer.id]
+        # Kept up to date here so clustering only has to vectorize older answers
+        answer.text_features = encode_features(answer.text)
+    db.session.commit()
+
+
+@job_handler('generate_insights')
+def generate_insights_job(payload):
+    """Regenerate a survey's insights, unless another run already caught up"""
+    survey_id = payload['survey_id']
+    if insights_need_refresh(survey_id) and not generate_insights(survey_id):
+        # Raise so the queue retries and eventually reports the failure
+        raise RuntimeError(f'Insight generation produced nothing for survey {survey_id}')
+
+
+@job_handler('generate_next_question')
+def generate_next_question_job(payload):
+    """Pre-generate the next question right after an answer is submitted"""
+    response = db.session.get(SurveyResponse, payload['response_id'])
+    if not response or response.completed_at or response.pending_question_id:
+        return
+    if response_answer_count(response.id) >= MAX_QUESTIONS_PER_SURVEY:
+        return
+
+    question = generate_next_question(response.survey_id, response.id)
+    if question:
+        assign_pending_question(response.id, question)
+
+
+@job_handler('generate_opening_questions')
+def generate_opening_questions_job(payload):
+    """Generate a new survey's shared opening question(s)"""
+    generate_opening_questions(payload['survey_id'])
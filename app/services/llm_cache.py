@@ -0,0 +1,206 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from app.constants import (
+    LLM_CACHE_POLICIES,
+    LLM_CACHE_MEMORY_ENTRIES,
+    LLM_CACHE_DB_PATH,
+    LLM_CACHE_DB_ENTRIES,
+)
+
+
+def cache_key(request):
+    """Content hash of everything that determines a Messages API response"""
+    material = {
+        'model': request.get('model'),
+        'temperature': request.get('temperature'),
+        'max_tokens': request.get('max_tokens'),
+        'system': request.get('system'),
+        'messages': request.get('messages'),
+    }
+    encoded = json.dumps(material, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+class MemoryCache:
+    """In-process LRU cache with per-entry expiry"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (value, time.time() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteCache:
+    """
+    On-disk cache shared by every process on the host. Expired entries are
+    dropped on read; once over max_entries the least recently used are evicted.
+    """
+
+    def __init__(self, path, max_entries):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._connection = None
+        self._pid = None
+        self._writes = 0
+        with self._lock:
+            self._connect().execute(
+                'CREATE TABLE IF NOT EXISTS llm_cache ('
+                'key TEXT PRIMARY KEY, value TEXT NOT NULL, '
+                'expires_at REAL NOT NULL, accessed_at REAL NOT NULL)'
+            )
+
+    def _connect(self):
+        # One connection per process, used under self._lock. Per-thread
+        # connections would mean one per greenlet under gevent workers.
+        if self._connection is None or self._pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            self._connection = connection
+            self._pid = os.getpid()
+        return self._connection
+
+    def get(self, key):
+        with self._lock:
+            connection = self._connect()
+            row = connection.execute(
+                'SELECT value, expires_at FROM llm_cache WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, expires_at = row
+            now = time.time()
+            if expires_at < now:
+                connection.execute('DELETE FROM llm_cache WHERE key = ?', (key,))
+                return None
+            connection.execute('UPDATE llm_cache SET accessed_at = ? WHERE key = ?', (now, key))
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            now = time.time()
+            self._connect().execute(
+                'INSERT OR REPLACE INTO llm_cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)',
+                (key, value, now + ttl, now)
+            )
+            self._writes += 1
+            if self._writes % 100 == 0:
+                self._evict()
+
+    def evict(self):
+        """Drop expired entries, then the least recently used beyond max_entries"""
+        with self._lock:
+            self._evict()
+
+    def _evict(self):
+        connection = self._connect()
+        connection.execute('DELETE FROM llm_cache WHERE expires_at < ?', (time.time(),))
+        connection.execute(
+            'DELETE FROM llm_cache WHERE key IN ('
+            'SELECT key FROM llm_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)',
+            (self.max_entries,)
+        )
+
+    def __len__(self):
+        with self._lock:
+            return self._connect().execute('SELECT COUNT(*) FROM llm_cache').fetchone()[0]
+
+
+class TieredCache:
+    """Checks each backend in order; a hit in a slower tier refills the faster ones"""
+
+    # Seconds a refilled entry stays in a faster tier
+    refill_ttl = 300
+
+    def __init__(self, *backends):
+        self.backends = backends
+
+    def get(self, key):
+        for i, backend in enumerate(self.backends):
+            value = backend.get(key)
+            if value is not None:
+                for faster in self.backends[:i]:
+                    faster.set(key, value, self.refill_ttl)
+                return value
+        return None
+
+    def set(self, key, value, ttl):
+        for backend in self.backends:
+            backend.set(key, value, ttl)
+
+    def __len__(self):
+        return len(self.backends[-1])
+
+
+_cache = None
+_cache_lock = threading.Lock()
+_stats_lock = threading.Lock()
+# Policy name -> {'hits': n, 'misses': n}
+_stats = {}
+
+
+def get_cache():
+    """Return the process-wide cache, building the configured backends on first use"""
+    global _cache
+
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                memory = MemoryCache(LLM_CACHE_MEMORY_ENTRIES)
+                if LLM_CACHE_DB_PATH:
+                    _cache = TieredCache(memory, SQLiteCache(LLM_CACHE_DB_PATH, LLM_CACHE_DB_ENTRIES))
+                else:
+                    _cache = memory
+    return _cache
+
+
+def set_cache(cache):
+    """Swap in a different backend (anything with get/set)"""
+    global _cache
+    _cache = cache
+
+
+def policy_ttl(policy):
+    """TTL in seconds for a call site's cache policy, or None if it isn't cached"""
+    if not policy:
+        return None
+    return LLM_CACHE_POLICIES.get(policy)
+
+
+def record(policy, hit):
+    with _stats_lock:
+        counts = _stats.setdefault(policy, {'hits': 0, 'misses': 0})
+        counts['hits' if hit else 'misses'] += 1
+
+
+def cache_stats():
+    """Hit/miss counters per cache policy for this process"""
+    with _stats_lock:
+        return {policy: dict(counts) for policy, counts in _stats.items()}
@@ -0,0 +1,288 @@
+import json
+import logging
+import os
+import random
+import threading
+import time
+import anthropic
+from anthropic.types import Message
+from app.services import llm_cache, llm_ledger, metrics
+from app.constants import (
+    LLM_MAX_CONCURRENCY,
+    LLM_MAX_RETRIES,
+    LLM_RETRY_BASE_DELAY,
+    LLM_RETRY_MAX_DELAY,
+    LLM_TIMEOUT_SECONDS,
+    LLM_LATENCY_BUCKETS,
+)
+
+logger = logging.getLogger(__name__)
+
+LLM_DURATION = metrics.histogram(
+    'llm_request_duration_seconds', 'Claude request latency by call site and outcome, per attempt',
+    LLM_LATENCY_BUCKETS
+)
+LLM_FIRST_TOKEN = metrics.histogram(
+    'llm_stream_first_token_seconds', 'Time to the first streamed text chunk by call site',
+    LLM_LATENCY_BUCKETS
+)
+
+# Status codes worth another attempt: timeouts, conflicts, rate limits and overload
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504, 529}
+
+_lock = threading.Lock()
+_client = None
+_client_pid = None
+_max_concurrency = LLM_MAX_CONCURRENCY
+_semaphore = threading.BoundedSemaphore(LLM_MAX_CONCURRENCY)
+
+# Usage fields summed per call site
+USAGE_FIELDS = ('input_tokens', 'output_tokens', 'cache_creation_input_tokens', 'cache_read_input_tokens')
+_usage_lock = threading.Lock()
+# Call site -> {'calls': n, <usage field>: total tokens}
+_usage = {}
+
+
+def init_app(app):
+    """
+    Apply the app's LLM_MAX_CONCURRENCY, e.g. a higher limit for gevent
+    workers that hold many more requests open than threads would
+    """
+    global _max_concurrency, _semaphore
+
+    _max_concurrency = app.config.get('LLM_MAX_CONCURRENCY') or LLM_MAX_CONCURRENCY
+    with _lock:
+        _semaphore = threading.BoundedSemaphore(_max_concurrency)
+
+
+def get_client():
+    """
+    Return the process-wide Anthropic client, building it on first use.
+
+    The client owns an HTTP connection pool, so it is shared by every call in
+    the process. It is rebuilt after a fork (e.g. gunicorn workers) because
+    pooled sockets must never be shared between processes.
+    """
+    global _client, _client_pid, _semaphore
+
+    pid = os.getpid()
+    if _client is not None and _client_pid == pid:
+        return _client
+
+    with _lock:
+        if _client is None or _client_pid != pid:
+            _client = anthropic.Anthropic(
+                api_key=os.getenv('ANTHROPIC_API_KEY'),
+                timeout=LLM_TIMEOUT_SECONDS,
+                # Retries are handled here so they respect the concurrency limit
+                max_retries=0,
+            )
+            _client_pid = pid
+            _semaphore = threading.BoundedSemaphore(_max_concurrency)
+    return _client
+
+
+def reset_client():
+    """Drop the cached client so the next call builds a fresh one"""
+    global _client, _client_pid
+
+    with _lock:
+        if _client is not None and _client_pid == os.getpid():
+            _client.close()
+        _client = None
+        _client_pid = None
+
+
+def _is_retryable(error):
+    if isinstance(error, anthropic.APIConnectionError):
+        # Includes APITimeoutError
+        return True
+    if isinstance(error, anthropic.APIStatusError):
+        return error.status_code in RETRYABLE_STATUS_CODES
+    return False
+
+
+def _backoff_delay(attempt):
+    """Full-jitter exponential backoff"""
+    ceiling = min(LLM_RETRY_MAX_DELAY, LLM_RETRY_BASE_DELAY * (2 ** attempt))
+    return random.uniform(0, ceiling)
+
+
+def record_usage(call_site, usage):
+    """Add one response's token usage, including prompt cache reads/writes, to the call site's totals"""
+    with _usage_lock:
+        totals = _usage.setdefault(call_site or 'other', dict.fromkeys(('calls',) + USAGE_FIELDS, 0))
+        totals['calls'] += 1
+        for field in USAGE_FIELDS:
+            totals[field] += getattr(usage, field, None) or 0
+
+
+def usage_stats():
+    """Token usage per call site for this process"""
+    with _usage_lock:
+        return {call_site: dict(totals) for call_site, totals in _usage.items()}
+
+
+def create_message(timeout=None, cache=None, call_site=None, survey_id=None, response_id=None,
+                   covers=None, expect_json=False, **kwargs):
+    """
+    Send a Messages API request through the shared client.
+
+    At most LLM_MAX_CONCURRENCY requests (or the app's override) run at once
+    per process; retryable failures are retried up to LLM_MAX_RETRIES times
+    with jittered backoff.
+    Any other error, or the last retryable one, is raised to the caller.
+
+    cache names the call site's policy in LLM_CACHE_POLICIES. Cached calls
+    return a stored response for an identical request without calling Claude.
+
+    call_site, survey_id and response_id label the call in usage_stats and
+    the LLM call ledger; a batched call passes covers, the (survey_id,
+    response_id) of each item, to split it over them in the ledger. With
+    expect_json, a reply that isn't valid JSON is recorded with a
+    parse_error outcome.
+    """
+    started = time.perf_counter()
+    ledger = dict(call_site=call_site, model=kwargs.get('model'), survey_id=survey_id, response_id=response_id,
+                  covers=covers)
+
+    ttl = llm_cache.policy_ttl(cache)
+    key = None
+    if ttl is not None:
+        key = llm_cache.cache_key(kwargs)
+        try:
+            cached = llm_cache.get_cache().get(key)
+        except Exception as e:
+            # A broken cache must never take the call down with it
+            logger.warning('LLM cache read failed: %s', e)
+            cached = None
+        llm_cache.record(cache, hit=cached is not None)
+        if cached is not None:
+            message = Message.model_validate_json(cached)
+            llm_ledger.record(latency=time.perf_counter() - started, outcome=_outcome(message, expect_json),
+                              cache_hit=True, **ledger)
+            return message
+
+    try:
+        message = _send(timeout, call_site, **kwargs)
+    except Exception as e:
+        llm_ledger.record(latency=time.perf_counter() - started, outcome=_error_outcome(e), **ledger)
+        raise
+    llm_ledger.record(latency=time.perf_counter() - started, outcome=_outcome(message, expect_json),
+                      usage=message.usage, **ledger)
+
+    if key is not None:
+        try:
+            llm_cache.get_cache().set(key, message.model_dump_json(), ttl)
+        except Exception as e:
+            logger.warning('LLM cache write failed: %s', e)
+    return message
+
+
+def is_cached(cache, **kwargs):
+    """Whether create_message(cache=cache, **kwargs) would be answered from the cache"""
+    if llm_cache.policy_ttl(cache) is None:
+        return False
+    try:
+        return llm_cache.get_cache().get(llm_cache.cache_key(kwargs)) is not None
+    except Exception as e:
+        logger.warning('LLM cache read failed: %s', e)
+        return False
+
+
+def cache_text(cache, text, **kwargs):
+    """
+    Store text as the reply to a request that was answered some other way,
+    e.g. as one item of a batched request, so an identical create_message
+    call is served from the cache
+    """
+    ttl = llm_cache.policy_ttl(cache)
+    if ttl is None:
+        return
+    message = Message.model_validate({
+        'id': 'cached', 'type': 'message', 'role': 'assistant', 'model': kwargs.get('model'),
+        'content': [{'type': 'text', 'text': text}], 'stop_reason': 'end_turn', 'stop_sequence': None,
+        'usage': {'input_tokens': 0, 'output_tokens': 0},
+    })
+    try:
+        llm_cache.get_cache().set(llm_cache.cache_key(kwargs), message.model_dump_json(), ttl)
+    except Exception as e:
+        logger.warning('LLM cache write failed: %s', e)
+
+
+def _outcome(message, expect_json):
+    if expect_json:
+        try:
+            json.loads(message.content[0].text)
+        except (ValueError, IndexError, AttributeError):
+            return 'parse_error'
+    return 'ok'
+
+
+def _error_outcome(error):
+    return 'timeout' if isinstance(error, anthropic.APITimeoutError) else 'error'
+
+
+def _send(timeout, call_site, **kwargs):
+    client = get_client()
+    request_timeout = timeout if timeout is not None else LLM_TIMEOUT_SECONDS
+
+    attempt = 0
+    while True:
+        with _semaphore:
+            started = time.perf_counter()
+            try:
+                message = client.messages.create(timeout=request_timeout, **kwargs)
+            except Exception as e:
+                LLM_DURATION.observe(time.perf_counter() - started, call_site=call_site or 'other', outcome='error')
+                if attempt >= LLM_MAX_RETRIES or not _is_retryable(e):
+                    raise
+                logger.warning('Retrying LLM call after error: %s', e, extra={'call_site': call_site, 'attempt': attempt + 1})
+            else:
+                LLM_DURATION.observe(time.perf_counter() - started, call_site=call_site or 'other', outcome='ok')
+                record_usage(call_site, message.usage)
+                return message
+
+        # Sleep outside the semaphore so waiting retries don't block other calls
+        time.sleep(_backoff_delay(attempt))
+        attempt += 1
+
+
+def stream_text(timeout=None, call_site=None, survey_id=None, response_id=None, **kwargs):
+    """
+    Stream a Messages API response through the shared client, yielding text
+    chunks as they arrive. The concurrency slot is held until the stream ends.
+    Failures before the first chunk are retried like create_message; once
+    text has been yielded, errors are raised to the caller.
+    """
+    client = get_client()
+    request_timeout = timeout if timeout is not None else LLM_TIMEOUT_SECONDS
+    call_started = time.perf_counter()
+    ledger = dict(call_site=call_site, model=kwargs.get('model'), survey_id=survey_id, response_id=response_id)
+
+    attempt = 0
+    while True:
+        started = False
+        with _semaphore:
+            began = time.perf_counter()
+            try:
+                with client.messages.stream(timeout=request_timeout, **kwargs) as stream:
+                    for text in stream.text_stream:
+                        if not started:
+                            LLM_FIRST_TOKEN.observe(time.perf_counter() - began, call_site=call_site or 'other')
+                        started = True
+                        yield text
+                    usage = stream.get_final_message().usage
+                    record_usage(call_site, usage)
+                LLM_DURATION.observe(time.perf_counter() - began, call_site=call_site or 'other', outcome='ok')
+                llm_ledger.record(latency=time.perf_counter() - call_started, outcome='ok', usage=usage, **ledger)
+                return
+            except Exception as e:
+                LLM_DURATION.observe(time.perf_counter() - began, call_site=call_site or 'other', outcome='error')
+                if started or attempt >= LLM_MAX_RETRIES or not _is_retryable(e):
+                    llm_ledger.record(latency=time.perf_counter() - call_started, outcome=_error_outcome(e), **ledger)
+                    raise
+                logger.warning('Retrying LLM stream after error: %s', e, extra={'call_site': call_site, 'attempt': attempt + 1})
+
+        time.sleep(_backoff_delay(attempt))
+        attempt += 1
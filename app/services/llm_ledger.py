@@ -0,0 +1,231 @@
+import atexit
+import click
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+from app.models import db, LLMCall, Survey
+from app.constants import (
+    LLM_LEDGER_FLUSH_SIZE,
+    LLM_LEDGER_FLUSH_INTERVAL,
+    LLM_LEDGER_MAX_BUFFER,
+    LLM_PRICING,
+)
+
+logger = logging.getLogger(__name__)
+
+# Token columns split across the rows of a batched call
+TOKEN_FIELDS = ('input_tokens', 'output_tokens', 'cache_read_tokens', 'cache_creation_tokens')
+
+_app = None
+_buffer = []
+_lock = threading.Lock()
+_flush_requested = threading.Event()
+_flusher_pid = None
+
+
+def init_app(app):
+    """
+    Let the ledger write rows for this app and register `flask llm-report`.
+    Calls made before init_app (e.g. from standalone tools) aren't recorded.
+    """
+    global _app
+
+    if _app is None:
+        atexit.register(flush)
+    _app = app
+
+    @app.cli.command('llm-report')
+    @click.option('--days', default=7, show_default=True, help='Only include calls from the last N days.')
+    @click.option('--top', default=10, show_default=True, help='Surveys to list.')
+    def llm_report_command(days, top):
+        """Print Claude calls, tokens, latency and cost per call site and top surveys."""
+        flush()
+        since = datetime.utcnow() - timedelta(days=days)
+        click.echo(f"Claude usage over the last {days} day(s)\n")
+        print_table(usage_by_call_site(since=since), 'call_site')
+        click.echo()
+        print_table(top_surveys(since=since, limit=top), 'survey')
+
+
+def record(call_site, model, latency, outcome, survey_id=None, response_id=None, cache_hit=False, usage=None,
+           covers=None):
+    """
+    Buffer one call's ledger row; rows are bulk inserted by a background flusher.
+
+    covers lists the (survey_id, response_id) of each answer a batched call
+    served. The call is then recorded as one row per answer, each with an
+    equal share of the call and of its tokens, so per-survey and per-response
+    costs still add up.
+    """
+    if _app is None:
+        return
+
+    row = {
+        'call_site': call_site or 'other',
+        'survey_id': survey_id,
+        'response_id': response_id,
+        'model': model,
+        'input_tokens': getattr(usage, 'input_tokens', None) or 0,
+        'output_tokens': getattr(usage, 'output_tokens', None) or 0,
+        'cache_read_tokens': getattr(usage, 'cache_read_input_tokens', None) or 0,
+        'cache_creation_tokens': getattr(usage, 'cache_creation_input_tokens', None) or 0,
+        'latency_ms': latency * 1000,
+        'outcome': outcome,
+        'cache_hit': cache_hit,
+        'share': 1.0,
+        'created_at': datetime.utcnow(),
+    }
+    rows = [row]
+    if covers:
+        rows = [
+            dict(row, survey_id=item_survey_id, response_id=item_response_id, share=1 / len(covers), **{
+                field: row[field] // len(covers) + (i < row[field] % len(covers)) for field in TOKEN_FIELDS
+            })
+            for i, (item_survey_id, item_response_id) in enumerate(covers)
+        ]
+    with _lock:
+        _buffer.extend(rows)
+        full = len(_buffer) >= LLM_LEDGER_FLUSH_SIZE
+
+    _ensure_flusher()
+    if full:
+        _flush_requested.set()
+
+
+def flush():
+    """Insert every buffered row in one statement; returns how many were written"""
+    with _lock:
+        rows = _buffer[:]
+        del _buffer[:]
+    if not rows or _app is None:
+        return 0
+
+    try:
+        # A separate connection, so the flush never joins a caller's transaction
+        with _app.app_context(), db.engine.begin() as connection:
+            connection.execute(db.insert(LLMCall), rows)
+    except Exception as e:
+        logger.warning('Failed to write %d LLM ledger rows, will retry: %s', len(rows), e)
+        with _lock:
+            _buffer[:0] = rows
+            del _buffer[:max(len(_buffer) - LLM_LEDGER_MAX_BUFFER, 0)]
+        return 0
+    return len(rows)
+
+
+def _ensure_flusher():
+    """Start this process's flusher thread (again after a fork)"""
+    global _flusher_pid
+
+    if _flusher_pid == os.getpid():
+        return
+    with _lock:
+        if _flusher_pid == os.getpid():
+            return
+        _flusher_pid = os.getpid()
+        threading.Thread(target=_flush_loop, name='llm-ledger-flusher', daemon=True).start()
+
+
+def _flush_loop():
+    while True:
+        _flush_requested.wait(LLM_LEDGER_FLUSH_INTERVAL)
+        _flush_requested.clear()
+        flush()
+
+
+def estimate_cost(model, input_tokens, output_tokens, cache_read_tokens, cache_creation_tokens):
+    """Estimated USD cost from LLM_PRICING, or None for an unpriced model"""
+    prices = LLM_PRICING.get(model)
+    if not prices:
+        return None
+    return (
+        input_tokens * prices['input']
+        + output_tokens * prices['output']
+        + cache_read_tokens * prices['cache_read']
+        + cache_creation_tokens * prices['cache_write']
+    ) / 1_000_000
+
+
+def _summarize(group_columns, filters, order_by=None, limit=None):
+    """Aggregate ledger rows into one dict per group"""
+    # Rows of a batched call each count as their share of one call
+    columns = [
+        db.func.sum(LLMCall.share).label('calls'),
+        db.func.sum(db.case((LLMCall.cache_hit, LLMCall.share), else_=0)).label('cache_hits'),
+        db.func.sum(db.case((LLMCall.outcome != 'ok', LLMCall.share), else_=0)).label('failures'),
+        db.func.sum(db.case((LLMCall.outcome == 'parse_error', LLMCall.share), else_=0)).label('parse_errors'),
+        (db.func.sum(LLMCall.latency_ms * LLMCall.share) / db.func.sum(LLMCall.share)).label('avg_latency_ms'),
+        db.func.max(LLMCall.latency_ms).label('max_latency_ms'),
+        db.func.sum(LLMCall.input_tokens).label('input_tokens'),
+        db.func.sum(LLMCall.output_tokens).label('output_tokens'),
+        db.func.sum(LLMCall.cache_read_tokens).label('cache_read_tokens'),
+        db.func.sum(LLMCall.cache_creation_tokens).label('cache_creation_tokens'),
+        db.func.max(LLMCall.output_tokens / LLMCall.share).label('max_output_tokens'),
+    ]
+    query = db.session.query(*group_columns, LLMCall.model, *columns).filter(*filters)
+    query = query.group_by(*group_columns, LLMCall.model)
+    if order_by is not None:
+        query = query.order_by(order_by)
+    if limit:
+        query = query.limit(limit)
+
+    rows = []
+    for row in query:
+        row = row._asdict()
+        for key in ('calls', 'cache_hits', 'failures', 'parse_errors'):
+            row[key] = round_calls(row[key])
+        row['max_output_tokens'] = round(row['max_output_tokens'] or 0)
+        uncached_calls = row['calls'] - row['cache_hits']
+        row['avg_input_tokens'] = row['input_tokens'] / uncached_calls if uncached_calls else 0
+        row['avg_output_tokens'] = row['output_tokens'] / uncached_calls if uncached_calls else 0
+        row['cost'] = estimate_cost(
+            row['model'], row['input_tokens'], row['output_tokens'],
+            row['cache_read_tokens'], row['cache_creation_tokens']
+        )
+        rows.append(row)
+    return rows
+
+
+def round_calls(value):
+    """A call count, which batched calls can make fractional, rounded for display"""
+    value = round(value or 0, 2)
+    return int(value) if value == int(value) else value
+
+
+def usage_by_call_site(survey_id=None, since=None):
+    """Per call site (and model) totals, optionally for one survey and/or since a time"""
+    filters = []
+    if survey_id is not None:
+        filters.append(LLMCall.survey_id == survey_id)
+    if since is not None:
+        filters.append(LLMCall.created_at >= since)
+    return _summarize([LLMCall.call_site], filters, order_by=LLMCall.call_site)
+
+
+def top_surveys(since=None, limit=10):
+    """Surveys ranked by tokens spent on them"""
+    filters = [LLMCall.survey_id.isnot(None)]
+    if since is not None:
+        filters.append(LLMCall.created_at >= since)
+    total_tokens = db.func.sum(LLMCall.input_tokens + LLMCall.output_tokens + LLMCall.cache_creation_tokens)
+    rows = _summarize([LLMCall.survey_id], filters, order_by=total_tokens.desc(), limit=limit)
+
+    titles = dict(
+        db.session.query(Survey.id, Survey.title).filter(Survey.id.in_([row['survey_id'] for row in rows]))
+    )
+    for row in rows:
+        row['survey'] = f"{row['survey_id']}: {titles.get(row['survey_id'], '?')}"
+    return rows
+
+
+def print_table(rows, label):
+    header = (f"{label:<32} {'calls':>6} {'hits':>5} {'fail':>5} {'avg ms':>8} {'max ms':>8} "
+              f"{'avg in':>8} {'avg out':>8} {'max out':>8} {'cache rd':>9} {'cost $':>8}")
+    click.echo(header)
+    click.echo('-' * len(header))
+    for row in rows:
+        cost = f"{row['cost']:.4f}" if row['cost'] is not None else '-'
+        click.echo(f"{str(row[label])[:32]:<32} {row['calls']:>6} {row['cache_hits']:>5} {row['failures']:>5} "
+              f"{row['avg_latency_ms']:>8.0f} {row['max_latency_ms']:>8.0f} {row['avg_input_tokens']:>8.0f} "
+              f"{row['avg_output_tokens']:>8.0f} {row['max_output_tokens']:>8} {row['cache_read_tokens']:>9} {cost:>8}")
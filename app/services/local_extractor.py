@@ -0,0 +1,169 @@
+import re
+import numpy as np
+from app.services.text_vectors import STOPWORDS
+
+_WORD_PATTERN = re.compile(r"[a-z]+(?:'[a-z]+)?")
+_CLAUSE_SPLIT = re.compile(r'[,;:.!?()]+')
+_SENTENCE_SPLIT = re.compile(r'(?<=[.!?])\s+')
+_ENTITY_PATTERN = re.compile(r"\b(?:[A-Z][a-z0-9]+[A-Z]\w*|[A-Z]{2,}[a-z]?|[A-Z][a-z0-9]+)\b")
+
+# Word -> sentiment weight; a few strong words count double
+SENTIMENT_WEIGHTS = {
+    **dict.fromkeys("""
+        good great love loved loving like liked nice easy easier helpful useful fast quick quickly friendly
+        amazing awesome excellent fantastic perfect happy glad smooth simple intuitive reliable clean
+        best better enjoy enjoyed recommend recommended impressed solid fine works worth responsive
+        efficient convenient clear pleased satisfied saves saved stable polished beautiful improved
+    """.split(), 1),
+    **dict.fromkeys('love loved amazing awesome excellent fantastic perfect best'.split(), 2),
+    **dict.fromkeys("""
+        bad poor hate hated slow slower expensive pricey overpriced confusing confused hard difficult
+        annoying annoyed frustrating frustrated broken buggy bug bugs crash crashes crashed crashing
+        freezes freezing lag laggy clunky complicated useless disappointed disappointing worse missing
+        lacking unclear unreliable unstable painful fail fails failed failing error errors problem
+        problems issue issues complaint slowly expensive outdated cluttered ugly tedious waste
+    """.split(), -1),
+    **dict.fromkeys('hate hated terrible awful horrible worst useless unusable'.split(), -2),
+}
+# Flip the sentiment of the next NEGATION_SCOPE words in the same clause
+NEGATIONS = frozenset("""
+    not no never nothing neither nor don't doesn't didn't isn't wasn't aren't weren't can't cannot
+    couldn't won't wouldn't shouldn't hardly barely without
+""".split())
+NEGATION_SCOPE = 3
+# Short replies that carry no sentiment of their own but are fully understood
+AFFIRMATIONS = frozenset("""
+    yes yeah yep yup ok okay sure maybe perhaps no nope nah unsure idk sometimes often always rarely
+    daily weekly monthly usually occasionally definitely absolutely probably
+""".split())
+# Words that often mean something else ("app", "team", "load") are left out,
+# so an answer using them counts as not fully understood and goes to Claude
+TOPIC_KEYWORDS = {
+    'pricing': 'price prices pricing cost costs costly expensive pricey overpriced cheap cheaper cheapest afford '
+               'affordable subscription plan plans fee fees paying pay paid money budget dollars value',
+    'support': 'support help helpdesk ticket tickets agent agents service customer staff response responded',
+    'performance': 'slow slower fast faster speed lag laggy loading performance quick quickly '
+                   'responsive freezes freezing',
+    'reliability': 'crash crashes crashed crashing bug bugs buggy broken error errors outage outages downtime '
+                   'unstable stable reliable unreliable fails failed',
+    'usability': 'easy easier hard difficult confusing confused intuitive interface ui ux design navigation '
+                 'clunky simple complicated cluttered layout',
+    'onboarding': 'onboarding setup signup tutorial learning curve wizard install installation',
+    'mobile': 'mobile phone iphone android ios tablet',
+    'reporting': 'report reports reporting dashboard dashboards export exports exporting analytics chart charts csv',
+    'integrations': 'integration integrations integrate api sync slack zapier salesforce plugin plugins',
+    'features': 'feature features functionality option options missing customization customize',
+    'documentation': 'docs documentation guide guides manual instructions',
+}
+
+_TOPICS = list(TOPIC_KEYWORDS)
+_TOPIC_OF = {word: i for i, topic in enumerate(_TOPICS) for word in TOPIC_KEYWORDS[topic].split()}
+
+# Numbers with what they count; ratings also feed the sentiment
+_RATING_PATTERN = re.compile(
+    r'\b(\d+(?:\.\d+)?)\s*(?:/|out of)\s*(\d+)\b|\b(\d(?:\.\d)?)\s*stars?\b', re.IGNORECASE
+)
+_QUANTITY_PATTERN = re.compile(
+    r'\b\d+(?:\.\d+)?\s*(?:/|out of)\s*\d+\b'
+    r'|[$€£]\s?\d[\d,]*(?:\.\d+)?k?(?:\s?(?:per|a|/)\s?(?:month|year|user|seat|week|day)\b)?'
+    r'|\b\d[\d,]*(?:\.\d+)?\s?(?:%|percent\b|(?:dollars?|euros?|pounds?|usd|eur|gbp|'
+    r'seconds?|secs?|minutes?|mins?|hours?|hrs?|days?|weeks?|months?|years?|'
+    r'people|users?|seats?|employees|times|stars?|clicks?|steps?)\b)'
+    r'|\b\d[\d,]*(?:\.\d+)?\b',
+    re.IGNORECASE
+)
+_NUMBER_WORDS = frozenset("""
+    percent dollars dollar euros euro pounds pound usd eur gbp seconds second secs sec minutes minute mins min
+    hours hour hrs hr days day weeks week months month years year people users user seats seat employees
+    times stars star clicks click steps step out of per
+""".split())
+
+
+def extract(texts):
+    """
+    Topics, sentiment, entities and quantitative data for a batch of answers
+    without calling Claude, in the same JSON shape as Claude's extraction,
+    plus a 0-1 confidence. Word scoring is done for the whole batch at once.
+    """
+    clauses = [
+        [_WORD_PATTERN.findall(clause) for clause in _CLAUSE_SPLIT.split(text.lower())] for text in texts
+    ]
+    clause_lengths = [len(words) for row in clauses for words in row]
+    flat = [word for row in clauses for words in row for word in words]
+    rows = np.repeat(np.arange(len(texts)), [sum(len(words) for words in row) for row in clauses])
+    clause_of = np.repeat(np.arange(len(clause_lengths)), clause_lengths)
+    count = len(texts)
+
+    sentiment = np.fromiter((SENTIMENT_WEIGHTS.get(word, 0) for word in flat), dtype=np.float64, count=len(flat))
+    negation = np.fromiter((word in NEGATIONS for word in flat), dtype=bool, count=len(flat))
+    topic = np.fromiter((_TOPIC_OF.get(word, -1) for word in flat), dtype=np.int64, count=len(flat))
+    known = np.fromiter(
+        (word in AFFIRMATIONS or word in _NUMBER_WORDS for word in flat), dtype=bool, count=len(flat)
+    )
+    content = np.fromiter((word not in STOPWORDS for word in flat), dtype=bool, count=len(flat))
+
+    # A negation flips scored words up to NEGATION_SCOPE words later in the same clause
+    negated = np.zeros(len(flat), dtype=bool)
+    for offset in range(1, NEGATION_SCOPE + 1):
+        negated[offset:] |= negation[:-offset] & (clause_of[offset:] == clause_of[:-offset])
+    sentiment[negated] *= -1
+
+    score = np.bincount(rows, weights=sentiment, minlength=count)
+    positive = np.bincount(rows, weights=sentiment > 0, minlength=count)
+    negative = np.bincount(rows, weights=sentiment < 0, minlength=count)
+    explained = (sentiment != 0) | negation | (topic >= 0) | known
+    content_words = np.bincount(rows, weights=content, minlength=count)
+    known_words = np.bincount(rows, weights=known | negation, minlength=count)
+    explained_words = np.bincount(rows, weights=content & explained, minlength=count)
+    topic_hits = np.bincount(
+        rows[topic >= 0] * len(_TOPICS) + topic[topic >= 0], minlength=count * len(_TOPICS)
+    ).reshape(count, len(_TOPICS))
+
+    results = []
+    for i, text in enumerate(texts):
+        quantities, rating = _quantities(text)
+        row_score = score[i] + (rating or 0)
+        if content_words[i]:
+            confidence = explained_words[i] / content_words[i]
+        elif known_words[i] or quantities:
+            confidence = 1.0
+        else:
+            # Empty, punctuation or filler words only: nothing to go on
+            confidence = 0.0
+        if positive[i] and negative[i]:
+            # Mixed feelings are where Claude's reading is worth paying for
+            confidence *= 0.6
+        results.append({
+            'topics': [_TOPICS[t] for t in np.flatnonzero(topic_hits[i])],
+            'sentiment': 'positive' if row_score > 0 else 'negative' if row_score < 0 else 'neutral',
+            'entities': _entities(text),
+            'quantitative_data': quantities,
+            'confidence': round(float(confidence), 2),
+            'extractor': 'local',
+        })
+    return results
+
+
+def _quantities(text):
+    """(numbers with their units as written, rating sentiment of +2/-2/0 or None)"""
+    rating = None
+    for match in _RATING_PATTERN.finditer(text):
+        value, scale, stars = match.groups()
+        value, scale = float(value or stars), float(scale or 5)
+        if 0 < scale and value <= scale:
+            share = value / scale
+            rating = 2 if share >= 0.7 else -2 if share <= 0.4 else 0
+    return [match.group(0).strip() for match in _QUANTITY_PATTERN.finditer(text)], rating
+
+
+def _entities(text):
+    """Capitalized names and acronyms that don't just start a sentence"""
+    entities = []
+    for sentence in _SENTENCE_SPLIT.split(text.strip()):
+        for match in _ENTITY_PATTERN.finditer(sentence):
+            name = match.group(0)
+            if match.start() == 0 and not name.isupper() or name == 'I' or name.lower() in STOPWORDS:
+                continue
+            if name not in entities:
+                entities.append(name)
+    return entities
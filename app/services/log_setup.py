@@ -0,0 +1,61 @@
+import json
+import logging
+from datetime import datetime, timezone
+
+# Attributes every LogRecord has; anything else was passed in extra=
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+def _extra_fields(record):
+    return {key: value for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES}
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line, including any extra= fields"""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        entry.update(_extra_fields(record))
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Human-readable lines with extra= fields appended as key=value"""
+
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    def format(self, record):
+        line = super().format(record)
+        extra = _extra_fields(record)
+        if extra:
+            line += ' ' + ' '.join(f'{key}={json.dumps(value, default=str)}' for key, value in extra.items())
+        return line
+
+
+def configure_logging(app):
+    """
+    Send the app's loggers (everything under "app") to stderr at LOG_LEVEL.
+    Disabled levels cost a single isEnabledFor check, so call sites pass
+    %-style arguments rather than pre-formatted strings.
+    """
+    logger = logging.getLogger('app')
+    logger.setLevel(app.config.get('LOG_LEVEL', 'INFO'))
+
+    # create_app may run more than once per process; keep a single handler
+    for handler in list(logger.handlers):
+        if getattr(handler, '_app_handler', False):
+            logger.removeHandler(handler)
+
+    handler = logging.StreamHandler()
+    handler._app_handler = True
+    handler.setFormatter(JSONFormatter() if app.config.get('LOG_FORMAT') == 'json' else TextFormatter())
+    logger.addHandler(handler)
+    logger.propagate = False
@@ -0,0 +1,113 @@
+import threading
+
+# Metric name -> Counter or Histogram, in registration order
+REGISTRY = {}
+# Functions returning extra exposition lines, called on every render
+COLLECTORS = []
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _label_text(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+class Counter:
+    """Monotonic per-process counter with labels"""
+
+    type = 'counter'
+
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [f'{self.name}{_label_text(key)} {value}' for key, value in self._values.items()]
+
+
+class Histogram:
+    """Cumulative-bucket histogram with labels, as Prometheus expects"""
+
+    type = 'histogram'
+
+    def __init__(self, name, help, buckets):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        # Label key -> [count per bucket..., sum, count]
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[i] += 1
+                    break
+            entry[-2] += value
+            entry[-1] += 1
+
+    def samples(self):
+        lines = []
+        with self._lock:
+            for key, entry in self._values.items():
+                cumulative = 0
+                for bound, count in zip(self.buckets, entry):
+                    cumulative += count
+                    lines.append(f'{self.name}_bucket{_label_text(key + (("le", bound),))} {cumulative}')
+                lines.append(f'{self.name}_bucket{_label_text(key + (("le", "+Inf"),))} {entry[-1]}')
+                lines.append(f'{self.name}_sum{_label_text(key)} {entry[-2]}')
+                lines.append(f'{self.name}_count{_label_text(key)} {entry[-1]}')
+        return lines
+
+
+def counter(name, help):
+    """Register (or return the already registered) counter called name"""
+    return REGISTRY.setdefault(name, Counter(name, help))
+
+
+def histogram(name, help, buckets):
+    """Register (or return the already registered) histogram called name"""
+    return REGISTRY.setdefault(name, Histogram(name, help, buckets))
+
+
+def collector(func):
+    """Register a function that returns extra exposition lines, e.g. gauges read at scrape time"""
+    COLLECTORS.append(func)
+    return func
+
+
+def render():
+    """All metrics for this process in the Prometheus text exposition format"""
+    lines = []
+    for metric in REGISTRY.values():
+        lines.append(f'# HELP {metric.name} {metric.help}')
+        lines.append(f'# TYPE {metric.name} {metric.type}')
+        lines.extend(metric.samples())
+    for func in COLLECTORS:
+        lines.extend(func())
+    return '\n'.join(lines) + '\n'
+
+
+def gauge_lines(name, help, samples, type='gauge'):
+    """Exposition lines for a metric computed at scrape time from (labels dict, value) pairs"""
+    lines = [f'# HELP {name} {help}', f'# TYPE {name} {type}']
+    for labels, value in samples:
+        lines.append(f'{name}{_label_text(tuple(sorted(labels.items())))} {value}')
+    return lines
@@ -0,0 +1,138 @@
+import json
+from app.models import db, Insight
+from app.constants import (
+    QUESTION_PROMPT_MAX_TOKENS,
+    INSIGHT_DIGEST_MAX_TOKENS,
+    ANALYSIS_PROMPT_MAX_TOKENS,
+    MAX_ANSWER_CHARS,
+)
+
+
+def estimate_tokens(text):
+    """Rough token count (~4 characters per token) for sizing prompts"""
+    return len(text) // 4 + 1
+
+
+def truncate_text(text, max_chars):
+    if text is None or len(text) <= max_chars:
+        return text
+    return text[:max_chars].rstrip() + '...'
+
+
+def truncate_to_tokens(text, max_tokens):
+    return truncate_text(text, max_tokens * 4)
+
+
+def rank_insights(insights):
+    """Most recently rated useful first, then by confidence"""
+    return sorted(
+        insights,
+        key=lambda insight: (insight.marked_useful_at is not None, insight.marked_useful_at, insight.confidence or 0),
+        reverse=True
+    )
+
+
+def build_insights_digest(insights, max_tokens=INSIGHT_DIGEST_MAX_TOKENS):
+    """
+    Compact, ranked one-line-per-insight digest that fits in max_tokens.
+    Lower-ranked insights are dropped once the budget is spent.
+    """
+    lines = []
+    used = 0
+    for insight in rank_insights(insights):
+        line = f"- [{insight.insight_type or 'pattern'}] {insight.text}"
+        if insight.supporting_evidence:
+            line += f" (evidence: {truncate_text(insight.supporting_evidence, 160)})"
+        tokens = estimate_tokens(line)
+        if used + tokens > max_tokens:
+            break
+        lines.append(line)
+        used += tokens
+    return '\n'.join(lines)
+
+
+def get_insights_digest(survey):
+    """
+    The digest of the useful insights in the survey's current generation, as
+    stored on the survey row by refresh_insights_digest. A survey without one
+    yet gets it computed but not stored: writing it from this read path could
+    overwrite a newer digest from a concurrent rating with a stale one.
+    """
+    if survey.insights_digest is not None:
+        return survey.insights_digest
+    return _compute_insights_digest(survey)
+
+
+def refresh_insights_digest(survey):
+    """Call when an insight's usefulness or the current generation changes; the caller commits"""
+    survey.insights_digest = _compute_insights_digest(survey)
+
+
+def _compute_insights_digest(survey):
+    if not survey.current_generation_id:
+        return build_insights_digest([])
+    return build_insights_digest(
+        Insight.query.filter_by(generation_id=survey.current_generation_id, useful=True).all()
+    )
+
+
+def cached_system(text):
+    """
+    System blocks for a prompt prefix that repeats across calls. The
+    cache_control breakpoint lets Anthropic serve it from the prompt cache, so
+    keep everything that varies per call out of it and in the messages.
+    """
+    return [{"type": "text", "text": text, "cache_control": {"type": "ephemeral"}}]
+
+
+def fit_qa_pairs(qa_pairs, max_tokens):
+    """
+    Keep as many of the most recent Q&A pairs as fit in max_tokens, with
+    long answers truncated. Returned in their original order.
+    """
+    kept = []
+    used = 0
+    for pair in reversed(qa_pairs):
+        pair = dict(pair, answer=truncate_text(pair['answer'], MAX_ANSWER_CHARS))
+        tokens = estimate_tokens(json.dumps(pair))
+        if kept and used + tokens > max_tokens:
+            break
+        kept.append(pair)
+        used += tokens
+    kept.reverse()
+    return kept
+
+
+def question_prompt_parts(main_question, insights_digest, previous_qa_pairs, max_tokens=QUESTION_PROMPT_MAX_TOKENS):
+    """
+    Split the question prompt budget between the insights digest and the
+    respondent's Q&A. The Q&A gets whatever the fixed text and digest leave.
+    """
+    digest = truncate_to_tokens(insights_digest or '', INSIGHT_DIGEST_MAX_TOKENS)
+    remaining = max_tokens - estimate_tokens(main_question) - estimate_tokens(digest) - 200
+    qa_pairs = fit_qa_pairs(previous_qa_pairs, max(remaining, 0))
+    return digest, qa_pairs
+
+
+def compact_qa_data(all_qa_data):
+    """Truncate long answers in survey-wide Q&A data before it goes into analysis prompts"""
+    return [
+        dict(respondent, qa_pairs=[
+            dict(pair, answer=truncate_text(pair['answer'], MAX_ANSWER_CHARS))
+            for pair in respondent['qa_pairs']
+        ])
+        for respondent in all_qa_data
+    ]
+
+
+def fit_items(items, max_tokens=ANALYSIS_PROMPT_MAX_TOKENS):
+    """Keep the leading items whose JSON fits in max_tokens"""
+    kept = []
+    used = 0
+    for item in items:
+        tokens = estimate_tokens(json.dumps(item))
+        if kept and used + tokens > max_tokens:
+            break
+        kept.append(item)
+        used += tokens
+    return kept
@@ -0,0 +1,232 @@
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from app.models import db, Question, QuestionBankEntry
+from app.constants import (
+    QUESTION_BANK_ENABLED,
+    QUESTION_BANK_SIMILARITY,
+    QUESTION_BANK_MAX_AGE_HOURS,
+    QUESTION_BANK_MAX_REUSES,
+    QUESTION_BANK_MAX_ENTRIES,
+    QUESTION_BANK_REFRESH_SECONDS,
+)
+from app.services import metrics
+from app.services.text_vectors import SparseRows, decode_features, encode_counts, trajectory_features
+
+logger = logging.getLogger(__name__)
+
+LOOKUPS = metrics.counter('question_bank_lookups_total', 'Follow-up question bank lookups by result')
+LOOKUP_SECONDS = metrics.histogram(
+    'question_bank_lookup_seconds', 'In-memory question bank search time',
+    (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.05)
+)
+
+_lock = threading.Lock()
+# Survey id -> _SurveyBank, this process's copy of the survey's recent entries
+_banks = {}
+
+
+class _DepthIndex:
+    """A survey's bank entries for one trajectory depth, searchable by cosine similarity"""
+
+    def __init__(self):
+        self.entry_ids = []
+        self.question_ids = []
+        self.created_at = []
+        self.features = []
+        self._rows = None
+
+    def add(self, entry_id, question_id, created_at, features):
+        self.entry_ids.append(entry_id)
+        self.question_ids.append(question_id)
+        self.created_at.append(created_at)
+        self.features.append(features)
+        if len(self.entry_ids) > QUESTION_BANK_MAX_ENTRIES:
+            self.keep(range(len(self.entry_ids) - QUESTION_BANK_MAX_ENTRIES, len(self.entry_ids)))
+        self._rows = None
+
+    def keep(self, positions):
+        positions = list(positions)
+        for name in ('entry_ids', 'question_ids', 'created_at', 'features'):
+            values = getattr(self, name)
+            setattr(self, name, [values[i] for i in positions])
+        self._rows = None
+
+    def best_match(self, query):
+        """(entry id, question id) of the closest entry at or above QUESTION_BANK_SIMILARITY, or None"""
+        if not self.entry_ids:
+            return None
+        if self._rows is None:
+            self._rows = SparseRows(self.features).unit()
+        similarities = self._rows.dot(query[None, :])[:, 0]
+        best = int(similarities.argmax())
+        if similarities[best] < QUESTION_BANK_SIMILARITY:
+            return None
+        return self.entry_ids[best], self.question_ids[best]
+
+
+class _SurveyBank:
+    def __init__(self):
+        self.depths = {}
+        self.known = set()
+        self.last_entry_id = 0
+        self.refreshed_at = None
+
+    def add(self, entry_id, question_id, depth, created_at, features):
+        if entry_id in self.known:
+            return
+        self.known.add(entry_id)
+        self.depths.setdefault(depth, _DepthIndex()).add(entry_id, question_id, created_at, features)
+
+    def retire(self, entry_id):
+        for index in self.depths.values():
+            if entry_id in index.entry_ids:
+                index.keep(i for i, known in enumerate(index.entry_ids) if known != entry_id)
+
+    def expire(self, cutoff):
+        for index in self.depths.values():
+            if index.created_at and index.created_at[0] < cutoff:
+                index.keep(i for i, created_at in enumerate(index.created_at) if created_at >= cutoff)
+        self.known = {entry_id for index in self.depths.values() for entry_id in index.entry_ids}
+
+
+def _survey_bank(survey_id):
+    """
+    This process's bank for a survey, topped up every QUESTION_BANK_REFRESH_SECONDS
+    with entries other processes added, and with expired or used-up entries dropped
+    """
+    now = time.monotonic()
+    with _lock:
+        bank = _banks.setdefault(survey_id, _SurveyBank())
+        due = bank.refreshed_at is None or now - bank.refreshed_at >= QUESTION_BANK_REFRESH_SECONDS
+        if due:
+            bank.refreshed_at = now
+            last_entry_id = bank.last_entry_id
+    if not due:
+        return bank
+
+    cutoff = datetime.utcnow() - timedelta(hours=QUESTION_BANK_MAX_AGE_HOURS)
+    rows = db.session.query(
+        QuestionBankEntry.id, QuestionBankEntry.question_id, QuestionBankEntry.depth,
+        QuestionBankEntry.created_at, QuestionBankEntry.trajectory_features
+    ).filter(
+        QuestionBankEntry.survey_id == survey_id,
+        QuestionBankEntry.id > last_entry_id,
+        QuestionBankEntry.created_at >= cutoff,
+        QuestionBankEntry.hits < QUESTION_BANK_MAX_REUSES
+    ).order_by(QuestionBankEntry.id).all()
+
+    with _lock:
+        bank.expire(cutoff)
+        for entry_id, question_id, depth, created_at, blob in rows:
+            features = decode_features(blob)
+            if features is not None:
+                bank.add(entry_id, question_id, depth, created_at, features)
+            bank.last_entry_id = max(bank.last_entry_id, entry_id)
+    return bank
+
+
+def find_question(survey_id, qa_pairs):
+    """
+    A question already generated for a respondent whose questions and answers
+    so far are similar enough to qa_pairs, or None if Claude should be asked.
+    Each reuse is counted on the entry, up to QUESTION_BANK_MAX_REUSES.
+    """
+    if not QUESTION_BANK_ENABLED or not qa_pairs:
+        return None
+
+    bank = _survey_bank(survey_id)
+    query = SparseRows([trajectory_features(qa_pairs)]).unit().dense_row(0)
+    while True:
+        started = time.perf_counter()
+        with _lock:
+            index = bank.depths.get(len(qa_pairs))
+            match = index.best_match(query) if index else None
+        LOOKUP_SECONDS.observe(time.perf_counter() - started)
+        if match is None:
+            LOOKUPS.inc(result='miss')
+            return None
+
+        entry_id, question_id = match
+        claimed = db.session.execute(
+            db.update(QuestionBankEntry)
+            .where(QuestionBankEntry.id == entry_id, QuestionBankEntry.hits < QUESTION_BANK_MAX_REUSES)
+            .values(hits=QuestionBankEntry.hits + 1, last_hit_at=datetime.utcnow())
+        )
+        if claimed.rowcount == 1:
+            db.session.commit()
+            LOOKUPS.inc(result='hit')
+            return db.session.get(Question, question_id)
+
+        # Used up, possibly by another process; try the next closest entry
+        db.session.rollback()
+        with _lock:
+            bank.retire(entry_id)
+
+
+def add_question(survey_id, qa_pairs, question):
+    """Bank a question Claude generated after qa_pairs, so similar respondents can reuse it"""
+    if not QUESTION_BANK_ENABLED or not qa_pairs:
+        return
+
+    features = trajectory_features(qa_pairs)
+    try:
+        entry = QuestionBankEntry(
+            survey_id=survey_id,
+            question_id=question.id,
+            depth=len(qa_pairs),
+            trajectory_features=encode_counts(*features),
+            created_at=datetime.utcnow()
+        )
+        db.session.add(entry)
+        db.session.flush()
+        entry_id, created_at = entry.id, entry.created_at
+        db.session.commit()
+    except Exception as e:
+        # The question itself is already saved; it just won't be reused
+        db.session.rollback()
+        logger.warning('Could not bank question %s: %s', question.id, e)
+        return
+
+    with _lock:
+        bank = _banks.get(survey_id)
+        if bank is not None:
+            bank.add(entry_id, question.id, len(qa_pairs), created_at, features)
+
+
+def discard_unused(question):
+    """
+    Remove a question's bank entries that no respondent has reused yet, e.g.
+    because it lost the race for a pending slot. Returns True if nothing else
+    uses the question through the bank, so it can be deleted; the caller commits.
+    """
+    removed = [entry_id for (entry_id,) in db.session.execute(
+        db.delete(QuestionBankEntry)
+        .where(QuestionBankEntry.question_id == question.id, QuestionBankEntry.hits == 0)
+        .returning(QuestionBankEntry.id)
+    )]
+    with _lock:
+        bank = _banks.get(question.survey_id)
+        if bank is not None:
+            for entry_id in removed:
+                bank.retire(entry_id)
+
+    return not db.session.query(
+        db.exists().where(QuestionBankEntry.question_id == question.id)
+    ).scalar()
+
+
+def survey_stats(survey_id):
+    """A survey's banked questions and how often follow-ups were served from the bank"""
+    entries, hits = db.session.query(
+        db.func.count(QuestionBankEntry.id), db.func.coalesce(db.func.sum(QuestionBankEntry.hits), 0)
+    ).filter(QuestionBankEntry.survey_id == survey_id).one()
+    # Every miss generates and banks a new question, so entries count the misses
+    lookups = entries + hits
+    return {
+        'entries': entries,
+        'hits': int(hits),
+        'misses': entries,
+        'hit_rate': round(hits / lookups, 3) if lookups else None,
+    }
@@ -1,112 +1,303 @@
 import json
+import logging
 import os
-import anthropic
-from app.models import db, Survey, Question, Answer, SurveyResponse
-from app.constants import CLAUDE_MODEL, DEFAULT_QUESTION_MAX_TOKENS, QUESTION_GENERATION_TEMPERATURE
+import time
+from app.models import db, Survey, Question, SurveyResponse
+from app.constants import CLAUDE_MODEL, DEFAULT_QUESTION_MAX_TOKENS, QUESTION_GENERATION_TEMPERATURE, PENDING_QUESTION_WAIT_SECONDS, FIRST_QUESTION_VARIANTS
+from app.services import llm_gateway, job_queue, question_bank
+from app.services.data_access import response_qa_pairs
+from app.services.prompt_builder import get_insights_digest, question_prompt_parts, cached_system
 
+logger = logging.getLogger(__name__)
 
-def generate_next_question(survey_id, response_id):
+
+def next_question_job_key(response_id):
+    """Dedupe key for pre-generating a response's next question"""
+    return f'next_question:{response_id}'
+
+
+def opening_questions_job_key(survey_id):
+    """Dedupe key for generating a survey's shared opening questions"""
+    return f'opening_questions:{survey_id}'
+
+
+def assign_pending_question(response_id, question):
     """
-    Generate the next question based on previous answers using LLM
+    Store question as the response's pending question unless another request
+    or job got there first, in which case ours is discarded and theirs returned
     """
-    survey = Survey.query.get(survey_id)
-    response = SurveyResponse.query.get(response_id)
+    result = db.session.execute(
+        db.update(SurveyResponse)
+        .where(SurveyResponse.id == response_id, SurveyResponse.pending_question_id.is_(None))
+        .values(pending_question_id=question.id)
+    )
+    if result.rowcount == 1:
+        db.session.commit()
+        return question
+
+    # Opening questions and banked ones other respondents reused are shared;
+    # anything else was generated for this response alone and is discarded
+    if not question.is_opening and question_bank.discard_unused(question):
+        db.session.delete(question)
+    db.session.commit()
+    response = db.session.get(SurveyResponse, response_id)
+    return response.pending_question
+
 
+def wait_for_pending_question(response):
+    """
+    Return the response's pending question. If a worker is generating it right
+    now, wait briefly for it rather than starting a duplicate LLM call. If the
+    job is still queued, take it over so the caller can generate the question
+    without a worker doing it again.
+    """
+    deadline = time.monotonic() + PENDING_QUESTION_WAIT_SECONDS
+    while not response.pending_question_id and time.monotonic() < deadline:
+        job = job_queue.find_active(next_question_job_key(response.id))
+        if not job:
+            break
+        if job.status == 'pending' and job_queue.take_over(job.id):
+            break
+        # Running, or a worker claimed it just now
+        time.sleep(0.25)
+        db.session.refresh(response)
+
+    return response.pending_question
+
+
+def _question_context(survey, response_id):
+    """Collect this respondent's previous Q&A and the survey's useful-insights digest"""
     # Get all previous answers for this response
-    previous_answers = Answer.query.filter_by(response_id=response_id).all()
-    previous_questions = [answer.question for answer in previous_answers]
-    previous_qa_pairs = [
-        {
-            "question": answer.question.text,
-            "answer": answer.text
-        }
-        for answer in previous_answers
-    ]
-
-    # Get useful insights from this survey to inform question generation
-    useful_insights = survey.insights.filter_by(useful=True).all()
-    useful_insights_text = [
-        {
-            "insight": insight.text,
-            "type": insight.insight_type,
-            "evidence": insight.supporting_evidence
-        }
-        for insight in useful_insights
-    ]
-
-    # If there are no previous questions, generate the first question
-    if not previous_questions:
-        return generate_first_question(survey)
+    previous_qa_pairs = response_qa_pairs(response_id)
 
-    # Use Claude API to generate the next question
-    try:
-        client = anthropic.Anthropic(api_key=os.getenv('ANTHROPIC_API_KEY'))
-        # Build context for learning-focused question generation
-        context = f"""You are an adaptive survey assistant. Your primary goal is to help answer this overarching question:
+    # Digest of useful insights from this survey to inform question generation
+    insights_digest = get_insights_digest(survey)
+
+    return previous_qa_pairs, insights_digest
+
+
+def _next_question_request(survey, previous_qa_pairs, insights_digest):
+    """Build the Messages API arguments for a follow-up question, within the prompt token budget"""
+    insights_digest, previous_qa_pairs = question_prompt_parts(
+        survey.main_question, insights_digest, previous_qa_pairs
+    )
+
+    # Stable per-survey prefix: identical for every respondent, so it's cached
+    context = f"""You are an adaptive survey assistant. Your primary goal is to help answer this overarching question:
         
         MAIN QUESTION: "{survey.main_question}"
         
         Based on what you've learned so far, generate the next most valuable question to get closer to answering the main question."""
-        
-        if useful_insights_text:
-            context += f"""
+    
+    if insights_digest:
+        context += f"""
             
         WHAT YOU'VE LEARNED FROM OTHER RESPONSES:
-        {json.dumps(useful_insights_text)}"""
-        
-        context += f"""
-        
-        THIS RESPONDENT'S PREVIOUS ANSWERS:
+        {insights_digest}"""
+
+    # Variable suffix: this respondent's answers
+    respondent_context = f"""THIS RESPONDENT'S PREVIOUS ANSWERS:
         {json.dumps(previous_qa_pairs)}
         
         Generate a natural follow-up question that uses this learning context to get the most valuable information toward answering the main question.
         Return ONLY the question text."""
 
-        response = client.messages.create(
-            model=CLAUDE_MODEL,
-            max_tokens=DEFAULT_QUESTION_MAX_TOKENS,
-            temperature=QUESTION_GENERATION_TEMPERATURE,
-            messages=[
-                {
-                    "role": "user", 
-                    "content": context
-                }
-            ]
+    return dict(
+        model=CLAUDE_MODEL,
+        max_tokens=DEFAULT_QUESTION_MAX_TOKENS,
+        temperature=QUESTION_GENERATION_TEMPERATURE,
+        system=cached_system(context),
+        messages=[
+            {
+                "role": "user", 
+                "content": respondent_context
+            }
+        ]
+    )
+
+
+def _banked_question(survey_id, previous_qa_pairs):
+    """A follow-up already generated for a similar respondent, or None"""
+    try:
+        return question_bank.find_question(survey_id, previous_qa_pairs)
+    except Exception as e:
+        # A broken bank must never stop a question from being generated
+        db.session.rollback()
+        logger.warning('Question bank lookup failed: %s', e)
+        return None
+
+
+def _save_question(survey_id, question_text, previous_qa_pairs):
+    new_question = Question(
+        text=question_text,
+        question_type='open_ended',
+        order=len(previous_qa_pairs) + 1,
+        survey_id=survey_id
+    )
+    db.session.add(new_question)
+    db.session.commit()
+    question_bank.add_question(survey_id, previous_qa_pairs, new_question)
+    return new_question
+
+
+def generate_next_question(survey_id, response_id):
+    """
+    Generate the next question based on previous answers using LLM
+    """
+    survey = Survey.query.get(survey_id)
+    previous_qa_pairs, insights_digest = _question_context(survey, response_id)
+
+    # If there are no previous questions, use the survey's shared opening question
+    if not previous_qa_pairs:
+        return opening_question(survey, response_id)
+
+    # Respondents who answered alike get the question Claude wrote for the first of them
+    question = _banked_question(survey_id, previous_qa_pairs)
+    if question:
+        return question
+
+    # Use Claude API to generate the next question
+    try:
+        response = llm_gateway.create_message(
+            call_site='next_question',
+            survey_id=survey_id,
+            response_id=response_id,
+            **_next_question_request(survey, previous_qa_pairs, insights_digest)
         )
 
         question_text = response.content[0].text.strip()
-        print(f'Question text: {question_text}')
+        logger.debug('Question text: %s', question_text)
 
         # Create and save the new question
-        new_question = Question(
-            text=question_text,
-            question_type='open_ended',
-            order=len(previous_questions) + 1,
-            survey_id=survey_id
-        )
-        db.session.add(new_question)
-        db.session.commit()
-
-        return new_question
+        return _save_question(survey_id, question_text, previous_qa_pairs)
 
     except Exception as e:
-        print(f"Error generating question: {e}")
+        logger.warning('Error generating question: %s', e)
         return None
 
 
+def stream_next_question(survey_id, response_id):
+    """
+    Generate the next question like generate_next_question, but stream it.
+    Yields ('token', text) for each chunk as Claude produces it, then a single
+    ('question', Question) once the full text is saved and assigned as the
+    response's pending question. The Question is None if generation failed.
+    """
+    survey = Survey.query.get(survey_id)
+    previous_qa_pairs, insights_digest = _question_context(survey, response_id)
+
+    if not previous_qa_pairs:
+        question = assign_pending_question(response_id, opening_question(survey, response_id))
+        yield 'token', question.text
+        yield 'question', question
+        return
+
+    question = _banked_question(survey_id, previous_qa_pairs)
+    if question:
+        question = assign_pending_question(response_id, question)
+        yield 'token', question.text
+        yield 'question', question
+        return
+
+    chunks = []
+    try:
+        request = _next_question_request(survey, previous_qa_pairs, insights_digest)
+        for text in llm_gateway.stream_text(
+            call_site='next_question', survey_id=survey_id, response_id=response_id, **request
+        ):
+            chunks.append(text)
+            yield 'token', text
+    except Exception as e:
+        logger.warning('Error streaming question: %s', e)
+        yield 'question', None
+        return
+
+    question_text = ''.join(chunks).strip()
+    logger.debug('Streamed question text: %s', question_text)
+    if not question_text:
+        yield 'question', None
+        return
+
+    question = _save_question(survey_id, question_text, previous_qa_pairs)
+    yield 'question', assign_pending_question(response_id, question)
+
+
+def _fallback_opening_text(survey):
+    return f"What are your initial thoughts about: {survey.main_question}"
+
+
+def opening_question(survey, response_id):
+    """
+    Return the opening question for a new response without calling Claude.
+    Responses are spread round-robin over the survey's opening variants. If
+    none exist yet, their generation is queued and a generic question, shared
+    like the variants, is used meanwhile.
+    """
+    fallback_text = _fallback_opening_text(survey)
+    variants = Question.query.filter_by(
+        survey_id=survey.id,
+        is_opening=True
+    ).order_by(Question.id).all()
+    generated = [question for question in variants if question.text != fallback_text]
+    if generated:
+        return generated[response_id % len(generated)]
+
+    job_queue.enqueue(
+        'generate_opening_questions',
+        {'survey_id': survey.id},
+        dedupe_key=opening_questions_job_key(survey.id)
+    )
+
+    # Fallback: one generic first question per survey until variants exist
+    if variants:
+        return variants[0]
+    question = Question(
+        text=fallback_text,
+        order=1,
+        is_opening=True,
+        survey_id=survey.id
+    )
+    db.session.add(question)
+    db.session.commit()
+    return question
+
+
+def generate_opening_questions(survey_id):
+    """
+    Top the survey's pool of shared opening questions up to FIRST_QUESTION_VARIANTS.
+    Raises if one can't be generated, so the queue retries with backoff.
+    """
+    survey = Survey.query.get(survey_id)
+    if not survey:
+        return []
+
+    existing = Question.query.filter(
+        Question.survey_id == survey_id,
+        Question.is_opening.is_(True),
+        Question.text != _fallback_opening_text(survey)
+    ).count()
+    generated = []
+    for _ in range(FIRST_QUESTION_VARIANTS - existing):
+        question = generate_first_question(survey)
+        if not question:
+            raise RuntimeError(f'Could not generate an opening question for survey {survey_id}')
+        generated.append(question)
+    return generated
+
+
 def generate_first_question(survey):
-    """Generate the first question for a survey"""
+    """Generate a shared opening question for a survey"""
     api_key = os.getenv('ANTHROPIC_API_KEY')
-    print(f"Generating first question for survey: {survey.main_question}")
-    print(f"API key available: {bool(api_key)}")
+    logger.debug('Generating first question for survey %s (API key available: %s)', survey.id, bool(api_key))
     
     if not api_key:
-        print("No ANTHROPIC_API_KEY found in environment")
+        logger.warning('No ANTHROPIC_API_KEY found in environment')
         return None
         
     try:
-        client = anthropic.Anthropic(api_key=api_key)
-        response = client.messages.create(
+        response = llm_gateway.create_message(
+            call_site='first_question',
+            survey_id=survey.id,
             model=CLAUDE_MODEL,
             max_tokens=DEFAULT_QUESTION_MAX_TOKENS,
             temperature=QUESTION_GENERATION_TEMPERATURE,
@@ -123,12 +314,13 @@ def generate_first_question(survey):
         )
 
         question_text = response.content[0].text.strip()
-        print(f'First Question text: {question_text}')
+        logger.debug('First question text: %s', question_text)
         
         # Create and save the new question
         new_question = Question(
             text=question_text,
             order=1,
+            is_opening=True,
             survey_id=survey.id
         )
         db.session.add(new_question)
@@ -137,5 +329,5 @@ def generate_first_question(survey):
         return new_question
 
     except Exception as e:
-        print(f"Error generating first question: {e}")
+        logger.warning('Error generating first question: %s', e)
         return None
\ No newline at end of file
@@ -0,0 +1,172 @@
+import click
+import csv
+import io
+import json
+import logging
+import time
+from app.models import db, Survey
+from app.constants import EXPORT_BATCH_ROWS
+from app.services.data_access import iter_survey_answers, ANSWER_EXPORT_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+# Export format -> (mimetype, file extension)
+FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'jsonl': ('application/x-ndjson', 'jsonl'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+
+
+def init_app(app):
+    @app.cli.command('export-responses')
+    @click.argument('survey_id', type=int)
+    @click.option('--format', 'export_format', type=click.Choice(list(FORMATS)), default='csv', show_default=True)
+    @click.option('--output', '-o', default='-', show_default=True, help='File to write; - for stdout.')
+    def export_responses_command(survey_id, export_format, output):
+        """Stream every answer of a survey, with its response and question, to a file."""
+        if db.session.get(Survey, survey_id) is None:
+            raise click.ClickException(f"Survey {survey_id} not found")
+        if export_format not in available_formats():
+            raise click.ClickException("Parquet export needs pyarrow: pip install pyarrow")
+
+        started = time.perf_counter()
+        written = 0
+        with click.open_file(output, 'wb') as stream:
+            for chunk in export_chunks(survey_id, export_format):
+                stream.write(chunk)
+                written += len(chunk)
+        click.echo(f"Exported survey {survey_id} as {export_format}: {written} bytes "
+                   f"in {time.perf_counter() - started:.1f}s", err=True)
+
+
+def available_formats():
+    """Formats this install can produce; Parquet needs pyarrow"""
+    return [name for name in FORMATS if name != 'parquet' or _pyarrow() is not None]
+
+
+def export_chunks(survey_id, export_format, batch_rows=EXPORT_BATCH_ROWS):
+    """
+    Yield a survey's answers encoded as export_format, as one bytes chunk
+    per batch_rows answers. Only one batch is held in memory at a time, so
+    the result can be streamed straight into a response or a file.
+    """
+    if export_format not in available_formats():
+        raise ValueError(f"Unsupported export format: {export_format}")
+    encoder = {'csv': _csv_chunks, 'jsonl': _jsonl_chunks, 'parquet': _parquet_chunks}[export_format]
+    return encoder(_batches(survey_id, batch_rows))
+
+
+def _batches(survey_id, batch_rows):
+    batch = []
+    for row in iter_survey_answers(survey_id, yield_per=batch_rows):
+        batch.append(row)
+        if len(batch) >= batch_rows:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _csv_chunks(batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(ANSWER_EXPORT_COLUMNS)
+    yield buffer.getvalue().encode()
+    for batch in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(batch)
+        yield buffer.getvalue().encode()
+
+
+def _jsonl_chunks(batches):
+    for batch in batches:
+        lines = []
+        for row in batch:
+            record = dict(zip(ANSWER_EXPORT_COLUMNS, row))
+            record['processed_data'] = _parse_processed_data(record['processed_data'])
+            lines.append(json.dumps(record, default=_isoformat))
+        yield ('\n'.join(lines) + '\n').encode()
+
+
+def _parse_processed_data(text):
+    if not text:
+        return None
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+
+def _isoformat(value):
+    return value.isoformat()
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return None
+    return pyarrow
+
+
+class _ChunkSink:
+    """Write-only file that hands back whatever was written since the last drain"""
+
+    closed = False
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _parquet_chunks(batches):
+    """One row group per batch; processed_data stays a JSON string column"""
+    pa = _pyarrow()
+    schema = pa.schema([
+        ('response_id', pa.int64()),
+        ('respondent_id', pa.string()),
+        ('started_at', pa.timestamp('us')),
+        ('completed_at', pa.timestamp('us')),
+        ('question_id', pa.int64()),
+        ('question_order', pa.int32()),
+        ('question_type', pa.string()),
+        ('question_text', pa.string()),
+        ('answer_id', pa.int64()),
+        ('answer_text', pa.string()),
+        ('answered_at', pa.timestamp('us')),
+        ('processed_data', pa.string()),
+    ])
+    sink = _ChunkSink()
+    writer = pa.parquet.ParquetWriter(pa.PythonFile(sink, mode='w'), schema)
+    try:
+        for batch in batches:
+            columns = zip(*batch)
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(values, type=field.type) for values, field in zip(columns, schema)], schema=schema
+            ))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
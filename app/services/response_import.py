@@ -0,0 +1,284 @@
+import click
+import csv
+import itertools
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from app.models import db, ImportRun, Survey, SurveyResponse, Question, Answer
+from app.constants import IMPORT_CHUNK_ROWS, PROCESSING_BATCH_SIZE
+from app.services import job_queue, response_processor, survey_counters
+from app.services.text_vectors import encode_features
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ('csv', 'jsonl')
+RESPONDENT_ID_MAX_LENGTH = SurveyResponse.__table__.c.respondent_id.type.length
+
+
+def init_app(app):
+    @app.cli.command('import-responses')
+    @click.argument('survey_id', type=int)
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--format', 'import_format', type=click.Choice(FORMATS), help='Defaults to the file extension.')
+    def import_responses_command(survey_id, path, import_format):
+        """Import respondents' answers from a CSV or JSONL file in chunked transactions."""
+        if db.session.get(Survey, survey_id) is None:
+            raise click.ClickException(f"Survey {survey_id} not found")
+        import_format = import_format or guess_format(path)
+        if import_format is None:
+            raise click.ClickException("Can't tell the format from the file name; pass --format csv or jsonl")
+
+        run = create_run(survey_id, os.path.abspath(path), import_format, source=os.path.basename(path))
+        db.session.commit()
+        click.echo(f"Import {run.id} started; if interrupted, continue it with `flask resume-import {run.id}`",
+                   err=True)
+        _run_from_cli(run.id)
+
+    @app.cli.command('resume-import')
+    @click.argument('import_id', type=int)
+    def resume_import_command(import_id):
+        """Continue an interrupted or failed import after its last committed chunk."""
+        run = db.session.get(ImportRun, import_id)
+        if run is None:
+            raise click.ClickException(f"Import {import_id} not found")
+        if run.status == 'done':
+            click.echo(f"Import {import_id} already finished")
+            return
+        _run_from_cli(import_id)
+
+
+def _run_from_cli(import_id):
+    started = time.perf_counter()
+
+    def report(run):
+        click.echo(f"\r{run.rows_done}/{run.rows_total} rows, {run.answers_created} answers", nl=False, err=True)
+
+    try:
+        run = run_import(import_id, progress=report)
+    except Exception as e:
+        raise click.ClickException(f"Import {import_id} failed: {e}; fix the cause and run "
+                                   f"`flask resume-import {import_id}`")
+    click.echo(err=True)
+    click.echo(f"Import {run.id} {run.status} in {time.perf_counter() - started:.1f}s: "
+               f"{run.responses_created} responses, {run.questions_created} questions and "
+               f"{run.answers_created} answers created, {run.rows_skipped} invalid row(s) skipped")
+
+
+def guess_format(filename):
+    """csv or jsonl from a file name's extension, or None"""
+    extension = os.path.splitext(filename or '')[1].lower()
+    return {'.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl'}.get(extension)
+
+
+def create_run(survey_id, path, import_format, source=None, user_id=None):
+    """Record a pending import of the file at path; the caller commits"""
+    run = ImportRun(survey_id=survey_id, user_id=user_id, source=source, path=path, import_format=import_format)
+    db.session.add(run)
+    db.session.flush()
+    return run
+
+
+def run_status(run):
+    return {
+        'id': run.id,
+        'survey_id': run.survey_id,
+        'source': run.source,
+        'status': run.status,
+        'rows_total': run.rows_total,
+        'rows_done': run.rows_done,
+        'rows_skipped': run.rows_skipped,
+        'responses_created': run.responses_created,
+        'questions_created': run.questions_created,
+        'answers_created': run.answers_created,
+        'error': run.error,
+        'created_at': run.created_at.isoformat() if run.created_at else None,
+        'finished_at': run.finished_at.isoformat() if run.finished_at else None,
+    }
+
+
+def iter_rows(path, import_format):
+    """
+    Every answer row of an import file, as a dict, or None for a line that
+    can't be read. CSV files have a header with respondent_id, question,
+    answer and optionally answered_at. JSONL lines hold either one such row
+    or a respondent with all their answers:
+    {"respondent_id": ..., "answers": [{"question": ..., "answer": ...}, ...]}
+    """
+    if import_format == 'csv':
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            yield from csv.DictReader(f)
+        return
+
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                yield None
+                continue
+            if not isinstance(record, dict):
+                yield None
+            elif isinstance(record.get('answers'), list):
+                for item in record['answers']:
+                    yield {'respondent_id': record.get('respondent_id'), **item} if isinstance(item, dict) else None
+            else:
+                yield record
+
+
+def _clean(row):
+    """(respondent_id, question, answer, answered_at) for a valid row, else None"""
+    if not row:
+        return None
+    respondent_id, question, answer = (str(row.get(key) or '').strip() for key in ('respondent_id', 'question', 'answer'))
+    if not respondent_id or not question or not answer or len(respondent_id) > RESPONDENT_ID_MAX_LENGTH:
+        return None
+    answered_at = None
+    if row.get('answered_at'):
+        try:
+            answered_at = datetime.fromisoformat(str(row['answered_at']))
+        except ValueError:
+            return None
+    return respondent_id, question, answer, answered_at
+
+
+def run_import(import_id, progress=None):
+    """
+    Import a run's file from where it left off, IMPORT_CHUNK_ROWS rows per
+    transaction. Each chunk's responses, questions, answers, counter updates
+    and extraction jobs commit together with the run's progress, so a
+    crashed or failed run resumes without duplicating anything. If another
+    runner advances the same import first, this one stops.
+    """
+    run = db.session.get(ImportRun, import_id)
+    if run is None or run.status == 'done':
+        return run
+
+    run.status = 'running'
+    run.error = None
+    if run.rows_total is None:
+        run.rows_total = sum(1 for _ in iter_rows(run.path, run.import_format))
+    db.session.commit()
+
+    rows_done = run.rows_done
+    question_ids = {}
+    try:
+        rows = itertools.islice(iter_rows(run.path, run.import_format), rows_done, None)
+        while True:
+            chunk = list(itertools.islice(rows, IMPORT_CHUNK_ROWS))
+            if not chunk:
+                break
+            if not _import_chunk(run, chunk, rows_done, question_ids):
+                return run
+            rows_done += len(chunk)
+            if progress:
+                progress(run)
+    except Exception as e:
+        db.session.rollback()
+        logger.exception('Import %s failed after %d rows', import_id, rows_done)
+        run.status = 'failed'
+        run.error = str(e)
+        db.session.commit()
+        raise
+
+    run.status = 'done'
+    run.finished_at = datetime.utcnow()
+    db.session.commit()
+    logger.info('Import %s done: %d answers in %d rows', import_id, run.answers_created, run.rows_done)
+    return run
+
+
+def _import_chunk(run, chunk, rows_done, question_ids):
+    """Insert one chunk and advance the run; False if another runner got there first"""
+    survey_id = run.survey_id
+    now = datetime.utcnow()
+    rows = [row for row in map(_clean, chunk) if row]
+
+    # Respondents already imported (e.g. in an earlier chunk) keep their response
+    respondent_ids = list(dict.fromkeys(row[0] for row in rows))
+    response_ids = dict(db.session.query(SurveyResponse.respondent_id, SurveyResponse.id).filter(
+        SurveyResponse.survey_id == survey_id,
+        SurveyResponse.respondent_id.in_(respondent_ids)
+    ).all()) if respondent_ids else {}
+    new_respondents = [respondent_id for respondent_id in respondent_ids if respondent_id not in response_ids]
+    if new_respondents:
+        answered = {}
+        for respondent_id, _, _, answered_at in rows:
+            answered.setdefault(respondent_id, []).append(answered_at or now)
+        created = db.session.execute(
+            db.insert(SurveyResponse).returning(SurveyResponse.respondent_id, SurveyResponse.id),
+            [{
+                'survey_id': survey_id,
+                'respondent_id': respondent_id,
+                'started_at': min(answered[respondent_id]),
+                'completed_at': max(answered[respondent_id]),
+            } for respondent_id in new_respondents]
+        )
+        response_ids.update(created.all())
+
+    # Questions are matched on their text within the survey
+    missing = [text for text in dict.fromkeys(row[1] for row in rows) if text not in question_ids]
+    if missing:
+        question_ids.update(db.session.query(Question.text, Question.id).filter(
+            Question.survey_id == survey_id,
+            Question.text.in_(missing)
+        ).all())
+    new_questions = [text for text in missing if text not in question_ids]
+    if new_questions:
+        created = db.session.execute(
+            db.insert(Question).returning(Question.text, Question.id),
+            [{'survey_id': survey_id, 'text': text, 'question_type': 'open_ended'} for text in new_questions]
+        )
+        question_ids.update(created.all())
+
+    answer_ids = []
+    if rows:
+        # Clear-cut answers are extracted locally now; only the rest are queued for Claude
+        extracted, _ = response_processor.extract_locally(list(enumerate(row[2] for row in rows)))
+        created = db.session.execute(
+            db.insert(Answer).returning(Answer.id, sort_by_parameter_order=True),
+            [{
+                'text': answer,
+                'question_id': question_ids[question],
+                'response_id': response_ids[respondent_id],
+                'created_at': answered_at or now,
+                'processed_data': extracted.get(i),
+                'text_features': encode_features(answer) if i in extracted else None,
+            } for i, (respondent_id, question, answer, answered_at) in enumerate(rows)]
+        )
+        answer_ids = [answer_id for (answer_id,) in created]
+        unprocessed = [answer_id for i, answer_id in enumerate(answer_ids) if i not in extracted]
+
+        survey_counters.increment(
+            survey_id,
+            started_count=len(new_respondents),
+            completed_count=len(new_respondents),
+            answer_count=len(answer_ids)
+        )
+        # Extraction is queued in Claude-request-sized batches, not per answer
+        job_queue.enqueue_many('process_answers', [
+            {'answer_ids': unprocessed[i:i + PROCESSING_BATCH_SIZE]}
+            for i in range(0, len(unprocessed), PROCESSING_BATCH_SIZE)
+        ])
+
+    advanced = db.session.execute(
+        db.update(ImportRun)
+        .where(ImportRun.id == run.id, ImportRun.rows_done == rows_done)
+        .values(
+            rows_done=rows_done + len(chunk),
+            rows_skipped=ImportRun.rows_skipped + len(chunk) - len(rows),
+            responses_created=ImportRun.responses_created + len(new_respondents),
+            questions_created=ImportRun.questions_created + len(new_questions),
+            answers_created=ImportRun.answers_created + len(answer_ids),
+            updated_at=now
+        )
+    )
+    if advanced.rowcount != 1:
+        db.session.rollback()
+        logger.warning('Import %s was advanced by another runner; stopping', run.id)
+        return False
+    db.session.commit()
+    return True
@@ -1,23 +1,60 @@
 import json
-import os
-import anthropic
-from app.constants import CLAUDE_MODEL, DEFAULT_PROCESSING_MAX_TOKENS, PROCESSING_TEMPERATURE
+import logging
+from app.constants import (
+    CLAUDE_MODEL,
+    DEFAULT_PROCESSING_MAX_TOKENS,
+    PROCESSING_TEMPERATURE,
+    LOCAL_EXTRACTION,
+    LOCAL_EXTRACTION_MIN_CONFIDENCE,
+)
+from app.services import llm_gateway, local_extractor, metrics
 
+logger = logging.getLogger(__name__)
 
-def process_response(response_text):
+EXTRACTIONS = metrics.counter('answer_extractions_total', 'Answers extracted, by extractor (local or claude)')
+
+
+def extract_locally(responses):
     """
-    Process a natural language response to extract structured data
+    Split (id, response_text) pairs into {id: processed_data} for the answers
+    the local extractor is confident about, and the pairs left for Claude
     """
-    try:
-        client = anthropic.Anthropic(api_key=os.getenv('ANTHROPIC_API_KEY'))
-        completion = client.messages.create(
-            model=CLAUDE_MODEL,
-            max_tokens=DEFAULT_PROCESSING_MAX_TOKENS,
-            temperature=PROCESSING_TEMPERATURE,
-            messages=[
-                {
-                    "role": "user",
-                    "content": f"""Extract key information from this survey response. 
+    if not LOCAL_EXTRACTION or not responses:
+        return {}, list(responses)
+
+    results, remaining = {}, []
+    for (response_id, response_text), extracted in zip(
+        responses, local_extractor.extract([response_text for _, response_text in responses])
+    ):
+        if extracted['confidence'] >= LOCAL_EXTRACTION_MIN_CONFIDENCE:
+            results[response_id] = json.dumps(extracted)
+        else:
+            remaining.append((response_id, response_text))
+    EXTRACTIONS.inc(len(results), extractor='local')
+    return results, remaining
+
+
+def process_response(response_text, survey_id=None):
+    """
+    Process a natural language response to extract structured data, locally
+    when the answer is simple enough, otherwise with Claude
+    """
+    results, remaining = extract_locally([(None, response_text)])
+    if not remaining:
+        return results[None]
+    return _claude_process_response(response_text, survey_id)
+
+
+def _process_response_request(response_text):
+    """Messages API arguments for extracting one answer; batches cache each answer under these"""
+    return dict(
+        model=CLAUDE_MODEL,
+        max_tokens=DEFAULT_PROCESSING_MAX_TOKENS,
+        temperature=PROCESSING_TEMPERATURE,
+        messages=[
+            {
+                "role": "user",
+                "content": f"""Extract key information from this survey response. 
                     Identify:
                     1. Main topics mentioned
                     2. Sentiment (positive, negative, neutral)
@@ -27,12 +64,25 @@ def process_response(response_text):
                     Format the output as JSON.
                     
                     Survey response: {response_text}"""
-                }
-            ]
+            }
+        ]
+    )
+
+
+def _claude_process_response(response_text, survey_id=None, response_id=None):
+    EXTRACTIONS.inc(extractor='claude')
+    try:
+        completion = llm_gateway.create_message(
+            cache='process_response',
+            call_site='process_response',
+            survey_id=survey_id,
+            response_id=response_id,
+            expect_json=True,
+            **_process_response_request(response_text)
         )
 
         processed_data = completion.content[0].text
-        print(f'Processed response: {processed_data}')
+        logger.debug('Processed response: %s', processed_data)
         # Try to parse as JSON, if it fails, return as text
         try:
             parsed_json = json.loads(processed_data)
@@ -44,7 +94,86 @@ def process_response(response_text):
             })
 
     except Exception as e:
-        print(f"Error processing response: {e}")
+        logger.warning('Error processing response: %s', e)
         return json.dumps({
             "error": str(e)
         })
+
+
+def process_responses_batch(responses, attribution=None):
+    """
+    Process several responses in one request. Takes (id, response_text) pairs
+    and returns {id: processed_data}. Answers the local extractor is
+    confident about never reach Claude, and answers in the process_response
+    cache are served from it; the rest go in one request, and each result is
+    cached under its single-answer request. Any response missing from the
+    batch result (or all of them, if the batch output can't be parsed) is
+    sent to Claude on its own. attribution maps ids to the (survey_id,
+    response_id) each Claude call is charged to in the LLM call ledger; a
+    batched call is split evenly over its answers.
+    """
+    attribution = attribution or {}
+    results, responses = extract_locally(responses)
+    # Answers extracted before, alone or in another batch, come from the cache
+    remaining = []
+    for response_id, response_text in responses:
+        if llm_gateway.is_cached('process_response', **_process_response_request(response_text)):
+            results[response_id] = _claude_process_response(response_text, *attribution.get(response_id, ()))
+        else:
+            remaining.append((response_id, response_text))
+    responses = remaining
+    if not responses:
+        return results
+    if len(responses) == 1:
+        response_id, response_text = responses[0]
+        results[response_id] = _claude_process_response(response_text, *attribution.get(response_id, ()))
+        return results
+
+    try:
+        completion = llm_gateway.create_message(
+            call_site='process_responses_batch',
+            covers=[attribution.get(response_id, (None, None)) for response_id, _ in responses],
+            expect_json=True,
+            model=CLAUDE_MODEL,
+            max_tokens=DEFAULT_PROCESSING_MAX_TOKENS * len(responses),
+            temperature=PROCESSING_TEMPERATURE,
+            messages=[
+                {
+                    "role": "user",
+                    "content": f"""Extract key information from each of these survey responses.
+                    For each response identify:
+                    1. Main topics mentioned
+                    2. Sentiment (positive, negative, neutral)
+                    3. Key entities mentioned
+                    4. Any quantitative data provided
+
+                    Return ONLY a JSON object that maps each response id (as a string) to the
+                    extracted information for that response, also formatted as JSON.
+
+                    Survey responses: {json.dumps([{"id": response_id, "response": response_text} for response_id, response_text in responses])}"""
+                }
+            ]
+        )
+
+        batch_text = completion.content[0].text
+        logger.debug('Processed batch of %d responses', len(responses))
+        batch_data = json.loads(batch_text)
+        if isinstance(batch_data, dict):
+            for response_id, response_text in responses:
+                item = batch_data.get(str(response_id))
+                if isinstance(item, dict):
+                    results[response_id] = json.dumps(item)
+                    EXTRACTIONS.inc(extractor='claude')
+                    llm_gateway.cache_text(
+                        'process_response', results[response_id], **_process_response_request(response_text)
+                    )
+
+    except Exception as e:
+        logger.warning('Error processing response batch, falling back to single requests: %s', e)
+
+    # Per-item fallback for anything the batch didn't cover
+    for response_id, response_text in responses:
+        if response_id not in results:
+            results[response_id] = _claude_process_response(response_text, *attribution.get(response_id, ()))
+
+    return results
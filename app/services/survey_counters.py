@@ -0,0 +1,79 @@
+import click
+from datetime import datetime
+from app.models import db, Survey, SurveyResponse, Answer, Insight
+
+COUNTERS = ('started_count', 'completed_count', 'answer_count', 'insight_count')
+
+
+def init_app(app):
+    @app.cli.command('repair-counters')
+    def repair_counters_command():
+        """Recompute every survey's denormalized counters from the source tables."""
+        repaired = repair_counters()
+        db.session.commit()
+        click.echo(f"Repaired counters on {repaired} survey(s)")
+
+
+def increment(survey_id, **deltas):
+    """
+    Atomically adjust a survey's counters, e.g. increment(1, answer_count=1).
+    Runs in the caller's transaction, so the counter commits with the rows it counts.
+    """
+    values = {name: getattr(Survey, name) + delta for name, delta in deltas.items()}
+    db.session.execute(db.update(Survey).where(Survey.id == survey_id).values(**values))
+
+
+def mark_response_completed(response):
+    """Set completed_at once and count the completion; the caller commits"""
+    result = db.session.execute(
+        db.update(SurveyResponse)
+        .where(SurveyResponse.id == response.id, SurveyResponse.completed_at.is_(None))
+        .values(completed_at=datetime.utcnow())
+    )
+    if result.rowcount == 1:
+        increment(response.survey_id, completed_count=1)
+    db.session.refresh(response)
+
+
+def repair_counters(survey_id=None):
+    """
+    Recompute counters from the responses, answers and current insights.
+    Returns the number of surveys whose counters had drifted; the caller commits.
+    """
+    def grouped(column, *criteria):
+        query = db.session.query(column, db.func.count()).filter(*criteria).group_by(column)
+        return dict(query.all())
+
+    started = grouped(SurveyResponse.survey_id)
+    completed = grouped(SurveyResponse.survey_id, SurveyResponse.completed_at.isnot(None))
+    answers = dict(
+        db.session.query(SurveyResponse.survey_id, db.func.count(Answer.id))
+        .join(Answer, Answer.response_id == SurveyResponse.id)
+        .group_by(SurveyResponse.survey_id)
+        .all()
+    )
+    # Only the current generation's insights are counted
+    insights = dict(
+        db.session.query(Survey.id, db.func.count(Insight.id))
+        .join(Insight, Insight.generation_id == Survey.current_generation_id)
+        .group_by(Survey.id)
+        .all()
+    )
+
+    surveys = Survey.query
+    if survey_id is not None:
+        surveys = surveys.filter_by(id=survey_id)
+
+    repaired = 0
+    for survey in surveys:
+        actual = {
+            'started_count': started.get(survey.id, 0),
+            'completed_count': completed.get(survey.id, 0),
+            'answer_count': answers.get(survey.id, 0),
+            'insight_count': insights.get(survey.id, 0),
+        }
+        if any(getattr(survey, name) != value for name, value in actual.items()):
+            for name, value in actual.items():
+                setattr(survey, name, value)
+            repaired += 1
+    return repaired
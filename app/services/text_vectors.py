@@ -0,0 +1,135 @@
+import re
+import zlib
+import numpy as np
+from app.constants import TEXT_FEATURE_DIM
+
+# First byte of every stored feature blob; bump when tokenization changes so old blobs are recomputed
+FEATURES_VERSION = 1
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+STOPWORDS = frozenset("""
+a about after all also am an and any are as at be because been but by can could did do does
+doing for from had has have having he her here him his how i i'm if in into is it it's its just
+me more most my of on or other our out so some than that that's the their them then there these
+they this those through to too very was we were what when where which while who why will with
+would you your yours really much many
+""".split())
+
+
+def tokenize(text):
+    """Lowercased word tokens with stopwords removed, plus adjacent-word bigrams"""
+    words = [word for word in _TOKEN_PATTERN.findall((text or '').lower()) if word not in STOPWORDS]
+    return words + [f'{first} {second}' for first, second in zip(words, words[1:])]
+
+
+def term_index(term):
+    """Stable hashed feature index of a term (crc32, unlike hash(), is the same in every process)"""
+    return zlib.crc32(term.encode('utf-8')) % TEXT_FEATURE_DIM
+
+
+def term_counts(terms):
+    """Hashed counts of a list of terms as (sorted feature indices, counts)"""
+    indices = np.fromiter((term_index(term) for term in terms), dtype=np.int64)
+    indices, counts = np.unique(indices, return_counts=True)
+    return indices.astype(np.uint16), counts.astype(np.uint16)
+
+
+def text_features(text):
+    """Hashed term counts of a text as (sorted feature indices, counts)"""
+    return term_counts(tokenize(text))
+
+
+def trajectory_features(qa_pairs):
+    """
+    Hashed term counts of a respondent's questions and answers so far. Each
+    question counts as one whole-text term, so respondents who were asked
+    the same questions match on them without their shared words dominating;
+    the latest answer's terms count double.
+    """
+    terms = []
+    for pair in qa_pairs:
+        terms += [f"question:{pair['question']}"] * 2
+        terms += tokenize(pair['answer'])
+    if qa_pairs:
+        terms += tokenize(qa_pairs[-1]['answer'])
+    return term_counts(terms)
+
+
+def encode_counts(indices, counts):
+    """Compact blob of hashed term counts: a version byte, then the indices and counts"""
+    return bytes([FEATURES_VERSION]) + indices.tobytes() + counts.tobytes()
+
+
+def encode_features(text):
+    """Compact blob of a text's hashed term counts, for Answer.text_features"""
+    return encode_counts(*text_features(text))
+
+
+def decode_features(blob):
+    """(indices, counts) from encode_features, or None for a missing or outdated blob"""
+    if not blob or blob[0] != FEATURES_VERSION:
+        return None
+    values = np.frombuffer(blob, dtype=np.uint16, offset=1)
+    half = len(values) // 2
+    return values[:half], values[half:]
+
+
+class SparseRows:
+    """
+    Rows of hashed features in CSR form: row i's features are
+    indices[indptr[i]:indptr[i + 1]] with the matching values
+    """
+
+    def __init__(self, feature_rows):
+        lengths = [len(indices) for indices, _ in feature_rows]
+        self.indptr = np.zeros(len(feature_rows) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=self.indptr[1:])
+        if feature_rows:
+            self.indices = np.concatenate([indices for indices, _ in feature_rows]).astype(np.int64)
+            self.values = np.concatenate([counts for _, counts in feature_rows]).astype(np.float32)
+        else:
+            self.indices = np.zeros(0, dtype=np.int64)
+            self.values = np.zeros(0, dtype=np.float32)
+        self.row_of_value = np.repeat(np.arange(len(feature_rows)), lengths)
+
+    def __len__(self):
+        return len(self.indptr) - 1
+
+    def tfidf(self):
+        """Sublinear TF-IDF weights over these rows, each row L2-normalized (in place)"""
+        document_frequency = np.bincount(self.indices, minlength=TEXT_FEATURE_DIM)
+        idf = np.log((1 + len(self)) / (1 + document_frequency)) + 1
+        self.values = (1 + np.log(self.values)) * idf[self.indices].astype(np.float32)
+        return self._normalize()
+
+    def unit(self):
+        """Sublinear term weights without IDF, each row L2-normalized (in place)"""
+        self.values = (1 + np.log(self.values)).astype(np.float32)
+        return self._normalize()
+
+    def _normalize(self):
+        norms = np.sqrt(np.bincount(self.row_of_value, weights=self.values ** 2, minlength=len(self)))
+        norms[norms == 0] = 1
+        self.values = (self.values / norms[self.row_of_value]).astype(np.float32)
+        return self
+
+    def dot(self, dense):
+        """rows x dense.T for dense vectors of shape (k, TEXT_FEATURE_DIM): a (len, k) array"""
+        products = dense[:, self.indices] * self.values
+        return np.stack([
+            np.bincount(self.row_of_value, weights=row_products, minlength=len(self)) for row_products in products
+        ], axis=1).astype(np.float32)
+
+    def sum_rows_by(self, labels, groups):
+        """Dense (groups, TEXT_FEATURE_DIM) sums of the rows carrying each label"""
+        sums = np.bincount(
+            labels[self.row_of_value] * TEXT_FEATURE_DIM + self.indices,
+            weights=self.values, minlength=groups * TEXT_FEATURE_DIM
+        )
+        return sums.reshape(groups, TEXT_FEATURE_DIM).astype(np.float32)
+
+    def dense_row(self, row):
+        vector = np.zeros(TEXT_FEATURE_DIM, dtype=np.float32)
+        start, end = self.indptr[row], self.indptr[row + 1]
+        vector[self.indices[start:end]] = self.values[start:end]
+        return vector
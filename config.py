@@ -5,6 +5,32 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///app.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     ANTHROPIC_API_KEY = os.environ.get('ANTHROPIC_API_KEY')
+
+    # Background worker threads per process (0 disables in-process workers)
+    JOB_WORKER_THREADS = int(os.environ.get('JOB_WORKER_THREADS', 2))
+
+    # SQLite: pragmas run on every connection (empty or 0 keeps SQLite's default)
+    SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 10000))
+
+    # Other backends (e.g. postgresql://): connection pool per worker process
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 20))
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 30))
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+
+    # Concurrent Claude requests per process (unset uses app.constants.LLM_MAX_CONCURRENCY)
+    LLM_MAX_CONCURRENCY = int(os.environ['LLM_MAX_CONCURRENCY']) if os.environ.get('LLM_MAX_CONCURRENCY') else None
+
+    # Logging: LOG_FORMAT is 'text' or 'json'
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+    LOG_FORMAT = os.environ.get('LOG_FORMAT', 'text')
+
+    # Requests slower than this many seconds are logged with their SQL (0 disables)
+    SLOW_REQUEST_SECONDS = float(os.environ.get('SLOW_REQUEST_SECONDS', 0))
+    # Bearer token required to read /metrics (unset leaves it open)
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
     
     # For external access via ngrok or production
     ENV = os.environ.get('FLASK_ENV') or 'development'
\ No newline at end of file
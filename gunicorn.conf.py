@@ -0,0 +1,53 @@
+"""
+Gunicorn serving profiles.
+
+    gunicorn -c gunicorn.conf.py 'app:create_app()'
+
+SERVING_MODE picks the worker class:
+
+- gevent (default): cooperative workers. A request waiting on Claude yields
+  to other requests, so one worker serves up to GEVENT_CONNECTIONS
+  respondents at once. Claude calls per process stay capped by the LLM
+  gateway's semaphore; raise LLM_MAX_CONCURRENCY to match the rate limit
+  you can afford. Requires `pip install gevent`.
+- gthread: GTHREAD_THREADS OS threads per worker; no extra dependencies.
+- sync: one request per worker, as with a bare `gunicorn app:app`.
+
+WEB_CONCURRENCY sets the number of worker processes.
+"""
+import multiprocessing
+import os
+
+SERVING_MODE = os.environ.get('SERVING_MODE', 'gevent')
+
+bind = os.environ.get('BIND', f"0.0.0.0:{os.environ.get('PORT', '5001')}")
+
+# Question streams and inline generation can hold a request for a while
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+graceful_timeout = 30
+keepalive = 5
+
+if SERVING_MODE == 'gevent':
+    try:
+        import gevent  # noqa: F401
+    except ImportError:
+        raise RuntimeError("SERVING_MODE=gevent needs the gevent package: pip install gevent")
+    worker_class = 'gevent'
+    # Waiting on I/O is cheap, so one process per core is enough
+    workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+    worker_connections = int(os.environ.get('GEVENT_CONNECTIONS', 1000))
+elif SERVING_MODE == 'gthread':
+    worker_class = 'gthread'
+    workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2))
+    threads = int(os.environ.get('GTHREAD_THREADS', 32))
+elif SERVING_MODE == 'sync':
+    worker_class = 'sync'
+    workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+else:
+    raise RuntimeError(f"Unknown SERVING_MODE {SERVING_MODE!r}: use gevent, gthread or sync")
+
+# The app must be imported after gevent patches the standard library, and
+# per-process state (Anthropic client, job workers) is built after the fork
+preload_app = False
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG')  # e.g. '-' for stdout
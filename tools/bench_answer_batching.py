@@ -0,0 +1,92 @@
+"""
+Compare per-answer and batched answer extraction: Claude requests, tokens and
+wall time over a sample corpus.
+
+Runs against whatever the LLM gateway is configured for, so point
+ANTHROPIC_BASE_URL at a local stand-in server to avoid spending API credits.
+
+    python tools/bench_answer_batching.py --answers 50 --batch-size 10
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+from app.services import llm_gateway, response_processor
+
+SAMPLE_ANSWERS = [
+    "no",
+    "not sure",
+    "Yes, I use it every day on my commute.",
+    "Too expensive for what it does. I'd pay maybe $5 a month.",
+    "The onboarding was confusing and I almost gave up after 10 minutes.",
+    "5 stars, love the new dashboard",
+    "I mostly use the mobile app, the desktop version feels slow.",
+    "Customer support took 3 days to answer my ticket.",
+    "It's fine. Nothing special compared to Notion or Trello.",
+    "We rolled it out to 40 people on our team and adoption has been great.",
+]
+
+
+def count_usage(totals):
+    """Wrap the gateway so every request adds to totals"""
+    create_message = llm_gateway.create_message
+
+    def counting_create_message(**kwargs):
+        completion = create_message(**kwargs)
+        totals['requests'] += 1
+        usage = getattr(completion, 'usage', None)
+        if usage is not None:
+            totals['input_tokens'] += usage.input_tokens or 0
+            totals['output_tokens'] += usage.output_tokens or 0
+        return completion
+
+    llm_gateway.create_message = counting_create_message
+    return create_message
+
+
+def run(label, func, answers):
+    totals = {'requests': 0, 'input_tokens': 0, 'output_tokens': 0}
+    original = count_usage(totals)
+    try:
+        started = time.perf_counter()
+        func(answers)
+        elapsed = time.perf_counter() - started
+    finally:
+        llm_gateway.create_message = original
+
+    print(f"{label:<12} requests={totals['requests']:<5} input_tokens={totals['input_tokens']:<8} "
+          f"output_tokens={totals['output_tokens']:<8} wall={elapsed:.2f}s "
+          f"({elapsed / len(answers) * 1000:.0f} ms/answer)")
+
+
+def per_answer(answers):
+    for _, text in answers:
+        response_processor.process_response(text)
+
+
+def batched(batch_size):
+    def run_batches(answers):
+        for start in range(0, len(answers), batch_size):
+            response_processor.process_responses_batch(answers[start:start + batch_size])
+    return run_batches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--answers', type=int, default=50, help='number of answers to process')
+    parser.add_argument('--batch-size', type=int, default=10, help='answers per batched request')
+    args = parser.parse_args()
+
+    load_dotenv()
+    answers = [(i, SAMPLE_ANSWERS[i % len(SAMPLE_ANSWERS)]) for i in range(args.answers)]
+
+    run('per-answer', per_answer, answers)
+    run(f'batch={args.batch_size}', batched(args.batch_size), answers)
+
+
+if __name__ == '__main__':
+    main()
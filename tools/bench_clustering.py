@@ -0,0 +1,125 @@
+"""
+Compare insight prompt sizes with and without local answer clustering.
+
+Builds a SQLite survey of synthetic respondents whose answers are drawn
+from a handful of themes, then reports the estimated input tokens of the
+raw insight data (every answer) against the clustered data, and how long
+vectorizing (first run) and clustering (features cached) take.
+
+    python tools/bench_clustering.py --respondents 20000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from app.models import db, User, Survey, Question, SurveyResponse, Answer
+from app.services.answer_clusters import cluster_survey_answers
+from app.services.data_access import completed_qa_data
+from app.services.prompt_builder import compact_qa_data, estimate_tokens, fit_items
+from config import Config
+
+THEMES = [
+    ['The pricing is too high for small teams', 'Too expensive once you add more seats',
+     'Cost went up again this year and the cheaper plan lacks basics'],
+    ['Support answered quickly and solved my issue', 'The support team is friendly and fast',
+     'Great customer support, they called me back within the hour'],
+    ['The mobile app crashes when I upload photos', 'App keeps freezing on my android phone',
+     'Mobile version is slow and logs me out'],
+    ['Reports are hard to export to excel', 'I need better reporting and csv exports',
+     'Dashboards are nice but exporting reports is painful'],
+    ['Onboarding was confusing, the setup wizard skipped steps', 'Took days to set up the integrations',
+     'Setup documentation is outdated and missing screenshots'],
+]
+FILLERS = ['', ' Honestly.', ' Overall it is fine otherwise.', ' Please fix this soon.', ' We rely on it daily.']
+
+
+def build_survey(respondents, answers_per_respondent):
+    rng = random.Random(3)
+    user = User(username='cluster-bench', email='cluster-bench@example.com', password_hash='-')
+    db.session.add(user)
+    db.session.flush()
+    survey = Survey(title='Clustering benchmark', main_question='What should we improve?', user_id=user.id)
+    db.session.add(survey)
+    db.session.flush()
+    opening = Question(survey_id=survey.id, text=survey.main_question, is_opening=True)
+    db.session.add(opening)
+    db.session.flush()
+
+    now = datetime.utcnow()
+    for first in range(0, respondents, 1000):
+        count = min(1000, respondents - first)
+        response_ids = [row.id for row in db.session.execute(
+            db.insert(SurveyResponse).returning(SurveyResponse.id),
+            [{'survey_id': survey.id, 'respondent_id': f'bench-{first + i}', 'completed_at': now}
+             for i in range(count)]
+        )]
+        question_ids = [row.id for row in db.session.execute(
+            db.insert(Question).returning(Question.id),
+            [{'survey_id': survey.id, 'text': f'Follow-up {i}: can you say more about that?'}
+             for i in range(count * (answers_per_respondent - 1))]
+        )]
+        answers = []
+        for i, response_id in enumerate(response_ids):
+            theme = rng.choice(THEMES)
+            for position in range(answers_per_respondent):
+                question_id = opening.id if position == 0 else question_ids[i * (answers_per_respondent - 1) + position - 1]
+                answers.append({'response_id': response_id, 'question_id': question_id,
+                                'text': rng.choice(theme) + rng.choice(FILLERS)})
+        db.session.execute(db.insert(Answer), answers)
+        db.session.commit()
+    survey.completed_count = respondents
+    survey.answer_count = respondents * answers_per_respondent
+    db.session.commit()
+    return survey.id
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--respondents', type=int, default=5000)
+    parser.add_argument('--answers-per-respondent', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        class BenchConfig(Config):
+            SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(workdir, 'clustering.db')}"
+            JOB_WORKER_THREADS = 0
+            LOG_LEVEL = 'WARNING'
+
+        app = create_app(BenchConfig)
+        with app.app_context():
+            db.create_all()
+            survey_id = build_survey(args.respondents, args.answers_per_respondent)
+
+            raw_tokens = estimate_tokens(json.dumps(compact_qa_data(completed_qa_data(survey_id))))
+
+            started = time.perf_counter()
+            cluster_survey_answers(survey_id)
+            first_run = time.perf_counter() - started
+
+            started = time.perf_counter()
+            groups = cluster_survey_answers(survey_id)
+            cached_run = time.perf_counter() - started
+            clustered_tokens = estimate_tokens(json.dumps(fit_items(groups)))
+
+    answers = args.respondents * args.answers_per_respondent
+    print(f"{args.respondents} respondents, {answers} answers")
+    print(f"raw insight data:       ~{raw_tokens} tokens")
+    print(f"clustered insight data: ~{clustered_tokens} tokens ({raw_tokens / clustered_tokens:.0f}x smaller)")
+    print(f"clustering: {first_run:.2f}s including vectorizing, {cached_run:.2f}s with cached features")
+    print()
+    for group in groups:
+        print(f"{group['question']} ({group['answers']} answers)")
+        for cluster in group['clusters']:
+            print(f"  {cluster['answers']:>6}  {', '.join(cluster['key_terms'][:4])}  | {cluster['quotes'][0]}")
+
+
+if __name__ == '__main__':
+    main()
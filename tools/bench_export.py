@@ -0,0 +1,177 @@
+"""
+Benchmark the streaming response export on a synthetic survey.
+
+Builds a SQLite database holding one survey with --answers answers (a
+million by default), then exports it once per format. Each export runs in
+its own process, so peak RSS reflects that export alone. The buffered
+baseline loads every row and builds the whole CSV in memory, as a naive
+export would.
+
+    python tools/bench_export.py --answers 1000000 --db /tmp/export_bench.db
+    python tools/bench_export.py --db /tmp/export_bench.db --reuse --formats csv parquet
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from app.models import db, User, Survey, Question, SurveyResponse, Answer
+from config import Config
+
+INSERT_CHUNK = 10000
+TOPICS = ['pricing', 'onboarding', 'support', 'performance', 'mobile app', 'reporting', 'integrations']
+SENTIMENTS = ['positive', 'negative', 'neutral']
+
+
+def make_app(database_url):
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = database_url
+        JOB_WORKER_THREADS = 0
+        LOG_LEVEL = 'WARNING'
+    return create_app(BenchConfig)
+
+
+def build_survey(answers, answers_per_response):
+    """Insert a survey whose respondents each answer answers_per_response questions"""
+    rng = random.Random(7)
+    user = User(username='export-bench', email='export-bench@example.com', password_hash='-')
+    db.session.add(user)
+    db.session.flush()
+    survey = Survey(title='Export benchmark', main_question='How do you use the product?', user_id=user.id)
+    db.session.add(survey)
+    db.session.flush()
+    opening = Question(survey_id=survey.id, text=survey.main_question, order=1, is_opening=True)
+    db.session.add(opening)
+    db.session.commit()
+
+    responses = answers // answers_per_response
+    started = datetime(2025, 1, 1)
+    next_question_id = opening.id + 1
+    next_answer_id = 1
+    for first in range(0, responses, INSERT_CHUNK // answers_per_response):
+        response_rows, question_rows, answer_rows = [], [], []
+        for response_id in range(first + 1, min(first + INSERT_CHUNK // answers_per_response, responses) + 1):
+            response_started = started + timedelta(seconds=response_id * 7)
+            response_rows.append({
+                'id': response_id, 'respondent_id': f'bench-{response_id}', 'survey_id': survey.id,
+                'started_at': response_started, 'completed_at': response_started + timedelta(minutes=4),
+            })
+            for position in range(answers_per_response):
+                if position == 0:
+                    question_id = opening.id
+                else:
+                    question_id = next_question_id
+                    next_question_id += 1
+                    question_rows.append({
+                        'id': question_id, 'survey_id': survey.id, 'order': position + 1, 'is_opening': False,
+                        'question_type': 'open_ended', 'text': f'What would make {rng.choice(TOPICS)} better for you?',
+                    })
+                topic = rng.choice(TOPICS)
+                answer_rows.append({
+                    'id': next_answer_id, 'response_id': response_id, 'question_id': question_id,
+                    'created_at': response_started + timedelta(seconds=30 * position),
+                    'text': f'Mostly {topic}; it works but could be faster and the docs are thin. ' * rng.randint(1, 3),
+                    'processed_data': json.dumps({
+                        'topics': [topic, rng.choice(TOPICS)], 'sentiment': rng.choice(SENTIMENTS),
+                        'entities': ['product'], 'quantitative_data': None,
+                    }),
+                })
+                next_answer_id += 1
+        db.session.execute(db.insert(SurveyResponse), response_rows)
+        if question_rows:
+            db.session.execute(db.insert(Question), question_rows)
+        db.session.execute(db.insert(Answer), answer_rows)
+        db.session.commit()
+        print(f'  {next_answer_id - 1} answers', file=sys.stderr, end='\r')
+    print(file=sys.stderr)
+    return survey.id
+
+
+def run_export(database_url, survey_id, export_format):
+    """Export into /dev/null in this process and print a JSON result line"""
+    from app.services import response_export
+    from app.services.data_access import iter_survey_answers
+
+    app = make_app(database_url)
+    with app.app_context():
+        baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        started = time.perf_counter()
+        written = 0
+        with open(os.devnull, 'wb') as sink:
+            if export_format == 'csv-buffered':
+                rows = iter_survey_answers(survey_id).all()
+                chunks = list(response_export._csv_chunks([rows]))
+                written = sum(len(chunk) for chunk in chunks)
+                sink.write(b''.join(chunks))
+            else:
+                for chunk in response_export.export_chunks(survey_id, export_format):
+                    sink.write(chunk)
+                    written += len(chunk)
+        duration = time.perf_counter() - started
+        answers = db.session.query(db.func.count(Answer.id)).join(SurveyResponse).filter(
+            SurveyResponse.survey_id == survey_id
+        ).scalar()
+    print(json.dumps({
+        'format': export_format,
+        'answers': answers,
+        'bytes': written,
+        'seconds': duration,
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'growth_mb': (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline_kb) / 1024,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--answers', type=int, default=1000000)
+    parser.add_argument('--answers-per-response', type=int, default=5)
+    parser.add_argument('--db', default='export_bench.db', help='SQLite file for the synthetic survey')
+    parser.add_argument('--reuse', action='store_true', help='export the survey already in --db')
+    parser.add_argument('--formats', nargs='+', default=['csv', 'jsonl', 'parquet', 'csv-buffered'])
+    parser.add_argument('--run-export', nargs=2, metavar=('SURVEY_ID', 'FORMAT'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    database_url = f'sqlite:///{os.path.abspath(args.db)}'
+    if args.run_export:
+        run_export(database_url, int(args.run_export[0]), args.run_export[1])
+        return
+
+    app = make_app(database_url)
+    with app.app_context():
+        if args.reuse:
+            survey_id = Survey.query.filter_by(title='Export benchmark').order_by(Survey.id.desc()).first().id
+        else:
+            db.drop_all()
+            db.create_all()
+            print(f'Building a {args.answers} answer survey...', file=sys.stderr)
+            survey_id = build_survey(args.answers, args.answers_per_response)
+        db.engine.dispose()
+
+    results = []
+    for export_format in args.formats:
+        print(f'Exporting {export_format}...', file=sys.stderr)
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--db', args.db, '--run-export', str(survey_id), export_format],
+            check=True, capture_output=True, text=True
+        ).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+
+    header = (f"{'format':<13} {'answers':>9} {'MB out':>8} {'secs':>7} {'answers/s':>10} "
+              f"{'peak RSS MB':>12} {'growth MB':>10}")
+    print(header)
+    print('-' * len(header))
+    for result in results:
+        print(f"{result['format']:<13} {result['answers']:>9} {result['bytes'] / 1e6:>8.1f} {result['seconds']:>7.1f} "
+              f"{result['answers'] / result['seconds']:>10.0f} {result['peak_rss_mb']:>12.0f} {result['growth_mb']:>10.0f}")
+
+
+if __name__ == '__main__':
+    main()
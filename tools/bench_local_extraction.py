@@ -0,0 +1,116 @@
+"""
+Measure how many answer extractions the local fast path keeps away from Claude.
+
+Runs app/services/local_extractor.py over a sample corpus of survey answers
+(cycled up to --answers) and reports the share handled locally at the
+configured LOCAL_EXTRACTION_MIN_CONFIDENCE, the Claude requests left with
+per-answer and batched extraction, local latency per answer, and how often
+the local sentiment matches the corpus's hand labels. Answers are extracted
+locally as they arrive, so only the uncertain ones are queued and batched.
+No Claude calls are made.
+
+    python tools/bench_local_extraction.py --answers 10000 --batch-size 10
+"""
+import argparse
+import math
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.constants import LOCAL_EXTRACTION_MIN_CONFIDENCE
+from app.services import local_extractor
+
+# (answer, hand-labelled sentiment)
+SAMPLE_ANSWERS = [
+    ("no", 'neutral'),
+    ("yes", 'neutral'),
+    ("not sure", 'neutral'),
+    ("maybe", 'neutral'),
+    ("Yes, I use it every day on my commute.", 'neutral'),
+    ("Too expensive for what it does. I'd pay maybe $5 a month.", 'negative'),
+    ("too expensive", 'negative'),
+    ("way too pricey", 'negative'),
+    ("The onboarding was confusing and I almost gave up after 10 minutes.", 'negative'),
+    ("5 stars, love the new dashboard", 'positive'),
+    ("2/5", 'negative'),
+    ("8 out of 10", 'positive'),
+    ("I mostly use the mobile app, the desktop version feels slow.", 'negative'),
+    ("Customer support took 3 days to answer my ticket.", 'negative'),
+    ("Support is fast and friendly", 'positive'),
+    ("It's fine. Nothing special compared to Notion or Trello.", 'neutral'),
+    ("We rolled it out to 40 people on our team and adoption has been great.", 'positive'),
+    ("not bad at all", 'positive'),
+    ("great", 'positive'),
+    ("love it", 'positive'),
+    ("it's ok", 'neutral'),
+    ("The app keeps crashing", 'negative'),
+    ("Exporting reports is painful", 'negative'),
+    ("easy to use", 'positive'),
+    ("Setup was easy and quick", 'positive'),
+    ("The API is great but the docs are outdated", 'neutral'),
+    ("Slack integration would be nice", 'neutral'),
+    ("About 20% of our time goes into manual exports", 'negative'),
+    ("We pay $300 per month for 12 seats", 'neutral'),
+    ("Honestly I think the way the product handles collaborative editing across distributed teams "
+     "could be rethought from first principles", 'neutral'),
+    ("My manager picked it, I just go along with whatever the team uses", 'neutral'),
+    ("It replaced three spreadsheets and a whiteboard for us, which our ops lead appreciates", 'positive'),
+    ("The search never finds what I'm looking for unless I type the exact title", 'negative'),
+    ("daily", 'neutral'),
+    ("weekly, mostly for planning", 'neutral'),
+    ("the reporting is useless", 'negative'),
+    ("nothing, it works", 'positive'),
+    ("Would love dark mode and keyboard shortcuts", 'neutral'),
+    ("Hard to say, we only started last week", 'neutral'),
+    ("Customer service helped me right away, very impressed", 'positive'),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--answers', type=int, default=10000)
+    parser.add_argument('--batch-size', type=int, default=10, help='answers per batched Claude request')
+    args = parser.parse_args()
+
+    corpus = [SAMPLE_ANSWERS[i % len(SAMPLE_ANSWERS)] for i in range(args.answers)]
+    texts = [text for text, _ in corpus]
+
+    started = time.perf_counter()
+    results = []
+    for start in range(0, len(texts), args.batch_size):
+        results.extend(local_extractor.extract(texts[start:start + args.batch_size]))
+    batched_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    local_extractor.extract(texts)
+    whole_seconds = time.perf_counter() - started
+
+    local = [result['confidence'] >= LOCAL_EXTRACTION_MIN_CONFIDENCE for result in results]
+    handled = sum(local)
+    # Answers are extracted locally on arrival, so only the uncertain ones are queued and batched
+    batched_before = math.ceil(len(texts) / args.batch_size)
+    batched_after = math.ceil((len(texts) - handled) / args.batch_size)
+    agree = sum(
+        1 for (_, label), result, is_local in zip(corpus, results, local)
+        if is_local and result['sentiment'] == label
+    )
+
+    print(f"{len(texts)} answers ({len(SAMPLE_ANSWERS)} distinct), min confidence {LOCAL_EXTRACTION_MIN_CONFIDENCE}")
+    print(f"handled locally:          {handled} ({handled / len(texts):.0%})")
+    print(f"Claude requests, single:  {len(texts)} -> {len(texts) - handled} "
+          f"({1 - (len(texts) - handled) / len(texts):.0%} fewer)")
+    print(f"Claude requests, batch={args.batch_size}: {batched_before} -> {batched_after} "
+          f"({1 - batched_after / batched_before:.0%} fewer)")
+    print(f"local latency:            {batched_seconds / len(texts) * 1e6:.0f} us/answer in batches of "
+          f"{args.batch_size}, {whole_seconds / len(texts) * 1e6:.0f} us/answer in one batch")
+    print(f"sentiment vs hand labels: {agree}/{handled} of the locally handled answers agree")
+    print()
+    for (text, label), result in zip(SAMPLE_ANSWERS, results):
+        route = 'local ' if result['confidence'] >= LOCAL_EXTRACTION_MIN_CONFIDENCE else 'claude'
+        print(f"  {route} {result['confidence']:.2f} {result['sentiment']:<8} ({label:<8}) {text[:60]}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+"""
+Measure how many follow-up questions the question bank serves without Claude.
+
+Simulated respondents each pick one of a few themes and give near-identical
+answers from it, answering MAX_QUESTIONS_PER_SURVEY questions through
+generate_next_question. Claude is tools/fake_anthropic.py with a fixed
+latency. Reports Claude requests, bank hit rate and time per follow-up,
+and the in-memory search time, with the bank on and off.
+
+    python tools/bench_question_bank.py --respondents 300 --llm-latency 300
+"""
+import argparse
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(TOOLS_DIR))
+
+from app import create_app
+from app.constants import MAX_QUESTIONS_PER_SURVEY
+from app.models import db, User, Survey, Question, SurveyResponse, Answer
+from app.services import llm_gateway, question_bank, question_generator
+from config import Config
+
+THEMES = [
+    ['Too expensive for a small team', 'It is too expensive for our small team', 'Too expensive, honestly'],
+    ['Support is fast and friendly', 'Support was fast and really friendly', 'Fast, friendly support'],
+    ['The mobile app keeps crashing', 'Mobile app crashes all the time', 'The app keeps crashing on mobile'],
+    ['Exporting reports is painful', 'Report exports are painful', 'Exporting reports is so painful'],
+]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def count_calls(func, totals, key):
+    """Wrap func so every call adds one to totals[key] and its duration to totals[key + '_seconds']"""
+    def counting(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            totals[key] += 1
+            totals[key + '_seconds'] += time.perf_counter() - started
+    return counting
+
+
+def run(respondents, enabled, workdir):
+    """Take every respondent through the survey; returns (totals, hit seconds, miss seconds)"""
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(workdir, f'bank-{enabled}.db')}"
+        JOB_WORKER_THREADS = 0
+        LOG_LEVEL = 'WARNING'
+
+    question_bank.QUESTION_BANK_ENABLED = enabled
+    question_bank._banks.clear()
+    totals = {'claude': 0, 'claude_seconds': 0.0, 'search': 0, 'search_seconds': 0.0}
+    create_message, best_match = llm_gateway.create_message, question_bank._DepthIndex.best_match
+    llm_gateway.create_message = count_calls(create_message, totals, 'claude')
+    question_bank._DepthIndex.best_match = count_calls(best_match, totals, 'search')
+    rng = random.Random(5)
+    app = create_app(BenchConfig)
+    hit_seconds, miss_seconds = [], []
+    with app.app_context():
+        db.create_all()
+        user = User(username='bank-bench', email='bank-bench@example.com', password_hash='-')
+        db.session.add(user)
+        db.session.flush()
+        survey = Survey(title='Question bank benchmark', main_question='What should we improve?', user_id=user.id)
+        db.session.add(survey)
+        db.session.flush()
+        db.session.add(Question(survey_id=survey.id, text='What do you think of the product so far?', is_opening=True))
+        db.session.commit()
+
+        for number in range(respondents):
+            theme = rng.choice(THEMES)
+            response = SurveyResponse(survey_id=survey.id, respondent_id=f'bench-{number}')
+            db.session.add(response)
+            db.session.commit()
+            question = question_generator.generate_next_question(survey.id, response.id)
+            for _ in range(MAX_QUESTIONS_PER_SURVEY):
+                db.session.add(Answer(text=rng.choice(theme), question_id=question.id, response_id=response.id))
+                db.session.commit()
+                calls = totals['claude']
+                started = time.perf_counter()
+                question = question_generator.generate_next_question(survey.id, response.id)
+                elapsed = time.perf_counter() - started
+                (hit_seconds if totals['claude'] == calls else miss_seconds).append(elapsed)
+    llm_gateway.create_message, question_bank._DepthIndex.best_match = create_message, best_match
+    return totals, hit_seconds, miss_seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--respondents', type=int, default=300)
+    parser.add_argument('--llm-latency', type=float, default=300, help='fake Claude latency in ms')
+    args = parser.parse_args()
+
+    port = free_port()
+    fake = subprocess.Popen(
+        [sys.executable, os.path.join(TOOLS_DIR, 'fake_anthropic.py'), '--port', str(port),
+         '--latency', str(args.llm_latency), '--jitter', '0', '--tokens-per-second', '0'],
+        stderr=subprocess.DEVNULL
+    )
+    os.environ['ANTHROPIC_BASE_URL'] = f'http://127.0.0.1:{port}'
+    os.environ.setdefault('ANTHROPIC_API_KEY', 'fake')
+    time.sleep(1)
+    results = []
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            for enabled in (False, True):
+                print(f"Running with the bank {'on' if enabled else 'off'}...", file=sys.stderr)
+                results.append((enabled,) + run(args.respondents, enabled, workdir))
+    finally:
+        fake.terminate()
+
+    follow_ups = args.respondents * MAX_QUESTIONS_PER_SURVEY
+    print(f"\n{args.respondents} respondents, {follow_ups} follow-up questions, Claude latency {args.llm_latency:.0f} ms\n")
+    header = (f"{'bank':<5} {'Claude calls':>13} {'hit rate':>9} {'hit median ms':>14} {'miss median ms':>15} "
+              f"{'search avg us':>14} {'total s':>8}")
+    print(header)
+    print('-' * len(header))
+    for enabled, totals, hits, misses in results:
+        hit_median = f'{statistics.median(hits) * 1000:.2f}' if hits else '-'
+        miss_median = f'{statistics.median(misses) * 1000:.0f}' if misses else '-'
+        search = f"{totals['search_seconds'] / totals['search'] * 1e6:.0f}" if totals['search'] else '-'
+        print(f"{'on' if enabled else 'off':<5} {totals['claude']:>13} {len(hits) / follow_ups:>9.0%} {hit_median:>14} "
+              f"{miss_median:>15} {search:>14} {sum(hits) + sum(misses):>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
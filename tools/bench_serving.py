@@ -0,0 +1,160 @@
+"""
+Compare respondents served per worker under each gunicorn serving mode.
+
+For every mode this starts gunicorn (gunicorn.conf.py, SERVING_MODE=<mode>)
+on a fresh SQLite database, pointed at tools/fake_anthropic.py with a fixed
+Claude latency, then runs the tools/loadtest.py respondents against it.
+
+    python tools/bench_serving.py --modes sync gthread gevent --workers 1 \\
+        --respondents 100 --concurrency 50 --llm-latency 1000
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from argparse import Namespace
+from concurrent.futures import ThreadPoolExecutor
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(TOOLS_DIR)
+PYTHONPATH = os.pathsep.join(filter(None, [ROOT_DIR, os.environ.get('PYTHONPATH')]))
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, TOOLS_DIR)
+
+import loadtest
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(url, timeout=1).read()
+            return
+        except Exception:
+            time.sleep(0.2)
+    raise RuntimeError(f'{url} did not come up within {timeout}s')
+
+
+def create_database(path):
+    """Build the schema with one owner and one survey; returns the survey id"""
+    code = (
+        "from app import create_app\n"
+        "from app.models import db, User, Survey\n"
+        "app = create_app()\n"
+        "with app.app_context():\n"
+        "    db.create_all()\n"
+        "    user = User(username='bench', email='bench@example.com', password_hash='-')\n"
+        "    db.session.add(user)\n"
+        "    db.session.flush()\n"
+        "    survey = Survey(title='Bench', main_question='What do you think of our product?', user_id=user.id)\n"
+        "    db.session.add(survey)\n"
+        "    db.session.commit()\n"
+        "    print(survey.id)\n"
+    )
+    env = dict(os.environ, DATABASE_URL=f'sqlite:///{path}', JOB_WORKER_THREADS='0', PYTHONPATH=PYTHONPATH)
+    output = subprocess.check_output([sys.executable, '-c', code], env=env, cwd=os.path.dirname(path))
+    return int(output.decode().strip().splitlines()[-1])
+
+
+def run_mode(mode, args, fake_url, workdir):
+    db_path = os.path.join(workdir, f'{mode}.db')
+    survey_id = create_database(db_path)
+    port = free_port()
+    env = dict(
+        os.environ,
+        SERVING_MODE=mode,
+        WEB_CONCURRENCY=str(args.workers),
+        BIND=f'127.0.0.1:{port}',
+        DATABASE_URL=f'sqlite:///{db_path}',
+        ANTHROPIC_BASE_URL=fake_url,
+        ANTHROPIC_API_KEY='fake',
+        PYTHONPATH=PYTHONPATH,
+        LOG_LEVEL='WARNING',
+    )
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', os.path.join(ROOT_DIR, 'gunicorn.conf.py'), 'app:create_app()'],
+        env=env, cwd=workdir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        base_url = f'http://127.0.0.1:{port}'
+        wait_for(base_url + '/')
+
+        load_args = Namespace(
+            base_url=base_url, survey=survey_id, max_answers=args.max_answers,
+            think_time=0, timeout=args.timeout
+        )
+        recorder = loadtest.Recorder()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            answered = list(executor.map(
+                lambda _: loadtest.run_respondent(load_args, recorder), range(args.respondents)
+            ))
+        duration = time.perf_counter() - started
+    finally:
+        server.terminate()
+        server.wait(30)
+
+    rows = {row['endpoint']: row for row in recorder.summary(duration)}
+    finished = sum(1 for count in answered if count >= args.max_answers)
+    return {
+        'mode': mode,
+        'duration': duration,
+        'respondents': finished,
+        'respondents_per_worker_second': finished / duration / args.workers,
+        'answers_per_second': sum(answered) / duration,
+        'errors': sum(row['errors'] for row in rows.values()),
+        'page_p95_ms': rows.get('GET /survey/<id>', {}).get('p95_ms', 0),
+        'submit_p95_ms': rows.get('POST /api/submit_answer', {}).get('p95_ms', 0),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--modes', nargs='+', default=['sync', 'gthread', 'gevent'])
+    parser.add_argument('--workers', type=int, default=1, help='gunicorn worker processes per mode')
+    parser.add_argument('--respondents', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=50, help='respondents active at once')
+    parser.add_argument('--max-answers', type=int, default=3, help='answers each respondent gives')
+    parser.add_argument('--llm-latency', type=float, default=1000, help='fake Claude latency in ms')
+    parser.add_argument('--timeout', type=float, default=120.0)
+    args = parser.parse_args()
+
+    fake_port = free_port()
+    fake = subprocess.Popen(
+        [sys.executable, os.path.join(TOOLS_DIR, 'fake_anthropic.py'), '--port', str(fake_port),
+         '--latency', str(args.llm_latency), '--jitter', '0', '--tokens-per-second', '0'],
+        stderr=subprocess.DEVNULL
+    )
+    results = []
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            for mode in args.modes:
+                print(f'Running {mode}...', file=sys.stderr)
+                results.append(run_mode(mode, args, f'http://127.0.0.1:{fake_port}', workdir))
+    finally:
+        fake.terminate()
+
+    print(f"\n{args.respondents} respondents x {args.max_answers} answers, {args.concurrency} concurrent, "
+          f"{args.workers} worker(s), Claude latency {args.llm_latency:.0f} ms\n")
+    header = (f"{'mode':<8} {'done':>5} {'errors':>7} {'secs':>7} {'resp/worker/s':>14} "
+              f"{'answers/s':>10} {'page p95 ms':>12} {'submit p95 ms':>14}")
+    print(header)
+    print('-' * len(header))
+    for result in results:
+        print(f"{result['mode']:<8} {result['respondents']:>5} {result['errors']:>7} {result['duration']:>7.1f} "
+              f"{result['respondents_per_worker_second']:>14.2f} {result['answers_per_second']:>10.1f} "
+              f"{result['page_p95_ms']:>12.0f} {result['submit_p95_ms']:>14.0f}")
+
+
+if __name__ == '__main__':
+    main()
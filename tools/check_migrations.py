@@ -0,0 +1,79 @@
+"""
+Check that the migrations run on a backend and end up matching the models.
+
+Builds the current schema in an empty database, stamps it at head,
+downgrades to the base revision, upgrades back to head and then compares the
+result against the models. Exits non-zero if any step fails or the schemas
+differ. Run it against each backend you deploy on:
+
+    python tools/check_migrations.py --database-url sqlite:////tmp/check.db
+    python tools/check_migrations.py --database-url postgresql://localhost/survey_check
+
+Every table in the target database is dropped first, so use a scratch one.
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from alembic.autogenerate import compare_metadata
+from alembic.migration import MigrationContext
+from flask_migrate import downgrade, stamp, upgrade
+from app import create_app
+from app.models import db
+from config import Config
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+
+
+def schema_differences():
+    """Differences between the live database and the models, ignoring alembic's own table"""
+    with db.engine.connect() as connection:
+        context = MigrationContext.configure(connection, opts={'compare_type': True})
+        return [diff for diff in compare_metadata(context, db.metadata)
+                if not (diff[0] == 'remove_table' and diff[1].name == 'alembic_version')]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--database-url', required=True, help='scratch database; all its tables are dropped')
+    args = parser.parse_args()
+
+    class CheckConfig(Config):
+        SQLALCHEMY_DATABASE_URI = args.database_url
+        JOB_WORKER_THREADS = 0
+
+    app = create_app(CheckConfig)
+    with app.app_context():
+        backend = db.engine.dialect.name
+        print(f"Checking migrations on {backend}")
+
+        db.drop_all()
+        with db.engine.begin() as connection:
+            connection.exec_driver_sql('DROP TABLE IF EXISTS alembic_version')
+        db.create_all()
+        stamp(MIGRATIONS_DIR, 'head')
+
+        # The first revision alters tables create_all made, so the chain is
+        # exercised top down and back rather than from an empty database
+        downgrade(MIGRATIONS_DIR, 'base')
+        print("  downgrade to base: ok")
+        upgrade(MIGRATIONS_DIR, 'head')
+        print("  upgrade to head: ok")
+
+        differences = schema_differences()
+        db.drop_all()
+        with db.engine.begin() as connection:
+            connection.exec_driver_sql('DROP TABLE IF EXISTS alembic_version')
+
+    if differences:
+        print(f"  schema after upgrade differs from the models ({len(differences)}):")
+        for difference in differences:
+            print(f"    {difference}")
+        sys.exit(1)
+    print("  schema matches the models")
+
+
+if __name__ == '__main__':
+    main()
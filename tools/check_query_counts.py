@@ -0,0 +1,172 @@
+"""
+Check that the hot request paths run a bounded number of SQL statements.
+
+Builds a SQLite survey with --respondents completed responses, points Claude
+at tools/fake_anthropic.py, then counts the statements behind take_survey,
+next-question generation and insight generation. Exits non-zero if any
+path fails or goes over its limit. The limits are fixed, so a path whose
+statement count grows per respondent (an N+1 query) fails once the survey
+is big enough; chunked loads only add a statement per chunk.
+
+    python tools/check_query_counts.py --respondents 200
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(TOOLS_DIR))
+
+from sqlalchemy import event
+from app import create_app
+from app.models import db, User, Survey, Question, SurveyResponse, Answer
+from app.services import survey_counters
+from app.services.analysis_service import generate_insights
+from app.services.question_generator import generate_next_question
+from config import Config
+
+# Path name -> most SQL statements it may run
+QUERY_LIMITS = {
+    'take_survey, pending question': 6,
+    'take_survey, new respondent': 20,
+    'next question': 15,
+    'generate_insights': 30,
+}
+ANSWERS = [
+    'Too expensive for a small team', 'Support is fast and friendly', 'The mobile app keeps crashing',
+    'Exporting reports is painful', 'Setup was easy and quick',
+]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def counting_statements(counts, name):
+    """Count the statements run on the app's engine inside the block into counts[name]"""
+    counts[name] = 0
+
+    def count(*args):
+        counts[name] += 1
+
+    event.listen(db.engine, 'before_cursor_execute', count)
+    try:
+        yield
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count)
+
+
+def build_survey(respondents, answers_per_respondent):
+    """A survey whose respondents have all finished, plus one halfway through; returns (survey, that response)"""
+    user = User(username='query-check', email='query-check@example.com', password_hash='-')
+    db.session.add(user)
+    db.session.flush()
+    survey = Survey(title='Query count check', main_question='What should we improve?', user_id=user.id)
+    db.session.add(survey)
+    db.session.flush()
+    questions = [Question(survey_id=survey.id, text=survey.main_question, is_opening=True)] + [
+        Question(survey_id=survey.id, text=f'Follow-up {i}: can you say more?', order=i + 2)
+        for i in range(answers_per_respondent - 1)
+    ]
+    db.session.add_all(questions)
+    db.session.flush()
+
+    for number in range(respondents + 1):
+        response = SurveyResponse(survey_id=survey.id, respondent_id=f'check-{number}')
+        db.session.add(response)
+        db.session.flush()
+        db.session.add_all(
+            Answer(text=ANSWERS[(number + i) % len(ANSWERS)], question_id=question.id, response_id=response.id)
+            for i, question in enumerate(questions)
+        )
+        if number < respondents:
+            response.completed_at = datetime.utcnow()
+    survey_counters.repair_counters(survey.id)
+    db.session.commit()
+    return survey, response
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--respondents', type=int, default=200)
+    parser.add_argument('--answers-per-respondent', type=int, default=4)
+    args = parser.parse_args()
+
+    port = free_port()
+    fake = subprocess.Popen(
+        [sys.executable, os.path.join(TOOLS_DIR, 'fake_anthropic.py'), '--port', str(port),
+         '--latency', '0', '--jitter', '0', '--tokens-per-second', '0'],
+        stderr=subprocess.DEVNULL
+    )
+    os.environ['ANTHROPIC_BASE_URL'] = f'http://127.0.0.1:{port}'
+    os.environ.setdefault('ANTHROPIC_API_KEY', 'fake')
+    time.sleep(1)
+
+    counts = {}
+    errors = []
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            class CountConfig(Config):
+                SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(workdir, 'counts.db')}"
+                JOB_WORKER_THREADS = 0
+                LOG_LEVEL = 'WARNING'
+
+            app = create_app(CountConfig)
+            with app.app_context():
+                db.create_all()
+                survey, response = build_survey(args.respondents, args.answers_per_respondent)
+                survey_id, response_id = survey.id, response.id
+                db.session.remove()
+
+            client = app.test_client()
+            with client.session_transaction() as session:
+                session['respondent_id'] = response.respondent_id
+            with app.app_context():
+                with counting_statements(counts, 'next question'):
+                    question = generate_next_question(survey_id, response_id)
+                if question is None:
+                    errors.append('next question: nothing generated')
+                    question = db.session.get(Question, 1)
+                db.session.get(SurveyResponse, response_id).pending_question_id = question.id
+                db.session.commit()
+                db.session.remove()
+
+            with app.app_context():
+                for name, page_client in (('take_survey, pending question', client),
+                                          ('take_survey, new respondent', app.test_client())):
+                    with counting_statements(counts, name):
+                        status = page_client.get(f'/survey/{survey_id}').status_code
+                    if status != 200:
+                        errors.append(f'{name}: HTTP {status}')
+                with counting_statements(counts, 'generate_insights'):
+                    if not generate_insights(survey_id):
+                        errors.append('generate_insights: no insights')
+                db.session.remove()
+    finally:
+        fake.terminate()
+
+    failures = len(errors)
+    for error in errors:
+        print(f"FAIL {error}")
+    print(f"{args.respondents} completed respondents, {args.answers_per_respondent} answers each")
+    for name, limit in QUERY_LIMITS.items():
+        ok = counts[name] <= limit
+        failures += not ok
+        print(f"{'ok  ' if ok else 'FAIL'} {name}: {counts[name]} statements (limit {limit})")
+
+    if failures:
+        print(f"{failures} path(s) failed or over their statement limit")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
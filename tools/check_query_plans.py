@@ -0,0 +1,78 @@
+"""
+Check that the hot lookup paths are served by indexes.
+
+Builds the schema in an in-memory SQLite database, runs EXPLAIN QUERY PLAN on
+the queries behind take_survey, question generation, insight generation and
+the dashboard, and exits non-zero if any of them falls back to a table scan.
+
+    python tools/check_query_plans.py
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from app import create_app
+from app.models import db, Survey, Question, SurveyResponse, Answer, Insight
+from config import Config
+
+
+class PlanConfig(Config):
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    JOB_WORKER_THREADS = 0
+
+
+def hot_queries():
+    """
+    (name, query, index the plan must use) for each hot path. SQLite backs
+    unique constraints with an unnamed autoindex, so those only require that
+    some index is searched.
+    """
+    return [
+        ('take_survey response lookup',
+         SurveyResponse.query.filter_by(survey_id=1, respondent_id='r'),
+         None),
+        ('completed responses',
+         SurveyResponse.query.filter(SurveyResponse.survey_id == 1, SurveyResponse.completed_at.isnot(None)),
+         'ix_survey_response_survey_completed'),
+        ('response answers',
+         Answer.query.filter_by(response_id=1).order_by(Answer.id),
+         'ix_answer_response_id'),
+        ('answers per question',
+         Answer.query.filter_by(question_id=1),
+         'ix_answer_question_id'),
+        ('useful insights',
+         Insight.query.filter_by(survey_id=1, useful=True),
+         'ix_insight_survey_useful'),
+        ('latest insight',
+         Insight.query.filter_by(survey_id=1).order_by(Insight.created_at.desc()),
+         'ix_insight_survey_created'),
+        ('opening questions',
+         Question.query.filter_by(survey_id=1, is_opening=True),
+         'ix_question_survey_opening'),
+        ('dashboard surveys',
+         Survey.query.filter_by(user_id=1),
+         'ix_survey_user_id'),
+    ]
+
+
+def main():
+    app = create_app(PlanConfig)
+    failures = 0
+    with app.app_context():
+        db.create_all()
+        for name, query, index in hot_queries():
+            sql = str(query.statement.compile(db.engine, compile_kwargs={'literal_binds': True}))
+            plan = ' | '.join(row[-1] for row in db.session.execute(text(f'EXPLAIN QUERY PLAN {sql}')))
+            ok = 'SCAN ' not in plan and (index in plan if index else 'USING' in plan)
+            failures += not ok
+            print(f"{'ok  ' if ok else 'FAIL'} {name}: {plan}")
+
+    if failures:
+        print(f"{failures} hot path(s) not using their index")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
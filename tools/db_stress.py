@@ -0,0 +1,177 @@
+"""
+Measure answer-submission write throughput with many concurrent writers.
+
+Each writer process builds the app with a database profile and its threads
+post answers to /api/submit_answer through the Flask test client, so every
+write goes through the real route: the answer insert, the survey counter
+update and the job queue inserts, in the same transactions as production.
+Several processes stand in for several gunicorn workers sharing a database.
+
+    python tools/db_stress.py --processes 4 --threads 4 --seconds 15
+    python tools/db_stress.py --profiles postgres --postgres-url postgresql://localhost/survey_stress
+
+Profiles:
+    sqlite-default  SQLite with its default rollback journal, fsync and 5s lock wait
+    sqlite-wal      SQLite with this app's defaults (WAL, synchronous=NORMAL, busy_timeout)
+    postgres        --postgres-url with the app's connection pool settings
+
+The tables in the target database are dropped and recreated, so point
+--postgres-url at a scratch database.
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(TOOLS_DIR))
+sys.path.insert(0, TOOLS_DIR)
+
+from loadtest import percentile
+
+PROFILES = {
+    'sqlite-default': {'SQLITE_JOURNAL_MODE': '', 'SQLITE_SYNCHRONOUS': '', 'SQLITE_BUSY_TIMEOUT_MS': 0},
+    'sqlite-wal': {},
+    'postgres': {},
+}
+
+
+def make_app(database_url, overrides):
+    from app import create_app
+    from config import Config
+
+    settings = dict(overrides, SQLALCHEMY_DATABASE_URI=database_url, JOB_WORKER_THREADS=0, LOG_LEVEL='CRITICAL')
+    return create_app(type('StressConfig', (Config,), settings))
+
+
+def prepare_database(database_url, overrides, writers):
+    """Fresh schema with one survey, one question and a response per writer thread"""
+    from app.models import db, User, Survey, Question, SurveyResponse
+
+    app = make_app(database_url, overrides)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        user = User(username='stress', email='stress@example.com', password_hash='-')
+        db.session.add(user)
+        db.session.flush()
+        survey = Survey(title='Stress', main_question='How was it?', user_id=user.id)
+        db.session.add(survey)
+        db.session.flush()
+        question = Question(survey_id=survey.id, text='How was it?')
+        db.session.add(question)
+        db.session.flush()
+        responses = [SurveyResponse(survey_id=survey.id, respondent_id=f'stress-{i}') for i in range(writers)]
+        db.session.add_all(responses)
+        db.session.commit()
+        plan = (question.id, [response.id for response in responses])
+        db.engine.dispose()
+    return plan
+
+
+def writer_process(database_url, overrides, question_id, response_ids, seconds, start_at, results):
+    app = make_app(database_url, overrides)
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def write_loop(response_id):
+        client = app.test_client()
+        while time.time() < start_at:
+            time.sleep(0.005)
+        deadline = start_at + seconds
+        while time.time() < deadline:
+            started = time.perf_counter()
+            try:
+                status = client.post('/api/submit_answer', json={
+                    'question_id': question_id, 'response_id': response_id, 'answer': 'Fine, thanks.'
+                }).status_code
+            except Exception:
+                status = 'exception'
+            elapsed = time.perf_counter() - started
+            with lock:
+                if status == 200:
+                    latencies.append(elapsed)
+                else:
+                    errors.append(status)
+
+    threads = [threading.Thread(target=write_loop, args=(response_id,)) for response_id in response_ids]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    results.put((latencies, len(errors)))
+
+
+def run_profile(name, database_url, args):
+    overrides = PROFILES[name]
+    writers = args.processes * args.threads
+    question_id, response_ids = prepare_database(database_url, overrides, writers)
+
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    start_at = time.time() + args.warmup
+    processes = [
+        context.Process(target=writer_process, args=(
+            database_url, overrides, question_id,
+            response_ids[i * args.threads:(i + 1) * args.threads], args.seconds, start_at, results
+        ))
+        for i in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    collected = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    latencies = sorted(latency for process_latencies, _ in collected for latency in process_latencies)
+    errors = sum(process_errors for _, process_errors in collected)
+    return {
+        'profile': name,
+        'commits': len(latencies),
+        'errors': errors,
+        'per_second': len(latencies) / args.seconds,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--profiles', nargs='+', choices=list(PROFILES), default=['sqlite-default', 'sqlite-wal'])
+    parser.add_argument('--processes', type=int, default=4, help='writer processes, like gunicorn workers')
+    parser.add_argument('--threads', type=int, default=4, help='writer threads per process')
+    parser.add_argument('--seconds', type=float, default=10.0)
+    parser.add_argument('--warmup', type=float, default=3.0, help='seconds allowed for the writers to start')
+    parser.add_argument('--postgres-url', help='scratch database for the postgres profile')
+    args = parser.parse_args()
+
+    if 'postgres' in args.profiles and not args.postgres_url:
+        parser.error('the postgres profile needs --postgres-url')
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for name in args.profiles:
+            print(f'Running {name}...', file=sys.stderr)
+            if name == 'postgres':
+                database_url = args.postgres_url
+            else:
+                database_url = f"sqlite:///{os.path.join(workdir, f'{name}.db')}"
+            results.append(run_profile(name, database_url, args))
+
+    print(f"\n{args.processes} process(es) x {args.threads} thread(s) submitting answers for {args.seconds:.0f}s\n")
+    header = (f"{'profile':<16} {'commits':>8} {'errors':>7} {'answers/s':>10} "
+              f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    print(header)
+    print('-' * len(header))
+    for result in results:
+        print(f"{result['profile']:<16} {result['commits']:>8} {result['errors']:>7} {result['per_second']:>10.1f} "
+              f"{result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} {result['p99_ms']:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
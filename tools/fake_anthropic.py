@@ -0,0 +1,281 @@
+"""
+Local stand-in for the subset of the Anthropic Messages API the app uses, so
+load tests and benchmarks don't spend API credits.
+
+Implements POST /v1/messages, streaming included, with plausible outputs for
+each of the app's prompts: follow-up questions, answer extraction (single and
+batched), shard summaries and insight arrays. Usage is echoed back with
+input/output token estimates and simulated prompt caching: the first request
+with a given cache_control prefix reports cache_creation_input_tokens, later
+ones report cache_read_input_tokens.
+
+    python tools/fake_anthropic.py --port 8765 --latency 800 --jitter 400 --error-rate 0.02
+    ANTHROPIC_BASE_URL=http://127.0.0.1:8765 ANTHROPIC_API_KEY=fake python app.py
+
+Canned outputs can be supplied with --responses rules.json, a list of
+{"contains": "...", "text": "..."} rules matched in order against the prompt.
+The text may use {n} (request number) and {main_question}.
+"""
+import argparse
+import hashlib
+import json
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ERROR_TYPES = {
+    429: 'rate_limit_error',
+    500: 'api_error',
+    529: 'overloaded_error',
+}
+
+
+class FakeState:
+    """Settings plus the counters shared by every request handler thread"""
+
+    def __init__(self, args):
+        self.args = args
+        self.rules = []
+        if args.responses:
+            with open(args.responses) as f:
+                self.rules = json.load(f)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.cached_prefixes = set()
+
+    def next_request_number(self):
+        with self.lock:
+            self.requests += 1
+            return self.requests
+
+    def cache_usage(self, request):
+        """(cache_creation_input_tokens, cache_read_input_tokens) for the request's cached prefix"""
+        system = request.get('system')
+        if not isinstance(system, list):
+            return 0, 0
+        prefix = []
+        for block in system:
+            prefix.append(block.get('text', ''))
+            if block.get('cache_control'):
+                break
+        else:
+            return 0, 0
+
+        tokens = estimate_tokens(''.join(prefix))
+        key = hashlib.sha256(json.dumps([request.get('model'), prefix]).encode()).hexdigest()
+        with self.lock:
+            if key in self.cached_prefixes:
+                return 0, tokens
+            self.cached_prefixes.add(key)
+        return tokens, 0
+
+    def latency(self):
+        """Seconds to wait before responding, drawn from the configured distribution"""
+        args = self.args
+        if args.distribution == 'lognormal' and args.latency > 0:
+            # --jitter is the standard deviation, in ms, around a --latency median
+            sigma = max(args.jitter, 1) / args.latency
+            delay = random.lognormvariate(0, sigma) * args.latency
+        else:
+            delay = args.latency + random.uniform(-args.jitter, args.jitter)
+        return max(delay, 0) / 1000
+
+
+def estimate_tokens(text):
+    return len(text) // 4 + 1
+
+
+def prompt_text(request):
+    """System and message text of a request, flattened for matching"""
+    parts = []
+    system = request.get('system')
+    if isinstance(system, str):
+        parts.append(system)
+    elif isinstance(system, list):
+        parts.extend(block.get('text', '') for block in system)
+    for message in request.get('messages', []):
+        content = message.get('content')
+        if isinstance(content, str):
+            parts.append(content)
+        else:
+            parts.extend(block.get('text', '') for block in content or [])
+    return '\n'.join(parts)
+
+
+def generate_text(state, request, n):
+    """Pick an output for the prompt: a matching --responses rule, else a built-in template"""
+    prompt = prompt_text(request)
+    match = re.search(r'main survey question: "(.*?)"|MAIN QUESTION: "(.*?)"', prompt)
+    main_question = next((group for group in match.groups() if group), '') if match else ''
+
+    for rule in state.rules:
+        if rule.get('contains', '') in prompt:
+            return rule['text'].format(n=n, main_question=main_question)
+
+    if 'Survey responses: ' in prompt:
+        # Batched extraction: one result per response id
+        try:
+            items = json.loads(prompt.split('Survey responses: ', 1)[1].strip())
+        except ValueError:
+            items = []
+        return json.dumps({
+            str(item['id']): extraction(item.get('response', '')) for item in items
+        })
+    if 'Extract key information' in prompt:
+        return json.dumps(extraction(prompt.rsplit('Survey response:', 1)[-1]))
+    if 'JSON array' in prompt:
+        return json.dumps([
+            {
+                "insight_statement": f"Respondents repeatedly raise theme {i + 1} about {main_question or 'the topic'}.",
+                "confidence_level": random.randint(50, 95),
+                "supporting_evidence": f'Several respondents said things like "example quote {i + 1}".',
+                "insight_type": random.choice(['trend', 'pattern', 'recommendation', 'concern', 'opportunity']),
+                "tags": ["fake", f"theme-{i + 1}"]
+            }
+            for i in range(3)
+        ])
+    if 'Summarize this subset' in prompt:
+        return f"Fake shard summary #{n}: most respondents are broadly positive; a minority report friction."
+    return f"Fake question #{n}: what is the most important thing you'd change about {main_question or 'this'}?"
+
+
+def extraction(text):
+    words = re.findall(r'[a-zA-Z]{5,}', text)
+    return {
+        "topics": sorted(set(word.lower() for word in words))[:3],
+        "sentiment": random.choice(['positive', 'negative', 'neutral']),
+        "entities": [],
+        "quantitative_data": re.findall(r'\d+', text)[:3]
+    }
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    state = None
+
+    def log_message(self, format, *args):
+        if self.state.args.verbose:
+            super().log_message(format, *args)
+
+    def do_POST(self):
+        if self.path.split('?')[0] != '/v1/messages':
+            return self._send_error(404, 'not_found_error', f'Unknown path {self.path}')
+
+        length = int(self.headers.get('Content-Length', 0))
+        try:
+            request = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            return self._send_error(400, 'invalid_request_error', 'Body is not JSON')
+
+        state = self.state
+        n = state.next_request_number()
+        time.sleep(state.latency())
+
+        if random.random() < state.args.error_rate:
+            status = random.choice(state.args.error_status)
+            return self._send_error(status, ERROR_TYPES.get(status, 'api_error'), 'Injected failure')
+
+        text = generate_text(state, request, n)
+        cache_creation, cache_read = state.cache_usage(request)
+        usage = {
+            'input_tokens': max(estimate_tokens(prompt_text(request)) - cache_creation - cache_read, 1),
+            'output_tokens': estimate_tokens(text),
+            'cache_creation_input_tokens': cache_creation,
+            'cache_read_input_tokens': cache_read,
+        }
+        message = {
+            'id': f'msg_fake_{uuid.uuid4().hex[:24]}',
+            'type': 'message',
+            'role': 'assistant',
+            'model': request.get('model', 'fake'),
+            'content': [{'type': 'text', 'text': text}],
+            'stop_reason': 'end_turn',
+            'stop_sequence': None,
+            'usage': usage,
+        }
+
+        if request.get('stream'):
+            self._stream(message)
+        else:
+            self._send_json(200, message)
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_error(self, status, error_type, message):
+        self._send_json(status, {'type': 'error', 'error': {'type': error_type, 'message': message}})
+
+    def _stream(self, message):
+        """Send the message as Messages API server-sent events, paced by --tokens-per-second"""
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+
+        def event(name, data):
+            self.wfile.write(f'event: {name}\ndata: {json.dumps(data)}\n\n'.encode())
+            self.wfile.flush()
+
+        text = message['content'][0]['text']
+        usage = message['usage']
+        event('message_start', {'type': 'message_start', 'message': dict(
+            message, content=[], stop_reason=None, usage=dict(usage, output_tokens=1)
+        )})
+        event('content_block_start', {'type': 'content_block_start', 'index': 0,
+                                      'content_block': {'type': 'text', 'text': ''}})
+        pause = 1 / self.state.args.tokens_per_second if self.state.args.tokens_per_second else 0
+        for chunk in re.findall(r'\S+\s*', text) or [text]:
+            event('content_block_delta', {'type': 'content_block_delta', 'index': 0,
+                                          'delta': {'type': 'text_delta', 'text': chunk}})
+            time.sleep(pause)
+        event('content_block_stop', {'type': 'content_block_stop', 'index': 0})
+        event('message_delta', {'type': 'message_delta',
+                                'delta': {'stop_reason': 'end_turn', 'stop_sequence': None},
+                                'usage': {'output_tokens': usage['output_tokens']}})
+        event('message_stop', {'type': 'message_stop'})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=500, help='median response latency in ms')
+    parser.add_argument('--jitter', type=float, default=200,
+                        help='ms of spread: +/- range for uniform, standard deviation for lognormal')
+    parser.add_argument('--distribution', choices=['uniform', 'lognormal'], default='uniform')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of requests that fail')
+    parser.add_argument('--error-status', type=int, nargs='+', default=[529, 429, 500],
+                        help='status codes to fail with, picked at random')
+    parser.add_argument('--tokens-per-second', type=float, default=50,
+                        help='pace of streamed chunks (0 streams instantly)')
+    parser.add_argument('--responses', help='JSON file of {"contains", "text"} rules')
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--verbose', action='store_true', help='log every request')
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    Handler.state = FakeState(args)
+    server = ThreadingHTTPServer((args.host, args.port), Handler)
+    server.daemon_threads = True
+    print(f'Fake Anthropic API listening on http://{args.host}:{args.port}', file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,232 @@
+"""
+Drive a running app with many concurrent simulated respondents and report
+p50/p95/p99 latency, throughput and error rate per endpoint.
+
+Each respondent walks a survey the way the browser does: load /survey/<id>
+(following the question stream when the page streams its question), submit an
+answer to /api/submit_answer, reload, and so on until the survey completes.
+With an owner's credentials, viewer threads also poll /insights/<id>.
+
+Start the app against tools/fake_anthropic.py so no API credits are spent:
+
+    python tools/fake_anthropic.py --latency 800 --jitter 400 &
+    ANTHROPIC_BASE_URL=http://127.0.0.1:8765 ANTHROPIC_API_KEY=fake gunicorn -w 4 -b 127.0.0.1:5001 'app:create_app()' &
+    python tools/loadtest.py --base-url http://127.0.0.1:5001 --survey 1 \\
+        --respondents 200 --concurrency 50 --email owner@example.com --password secret
+"""
+import argparse
+import http.cookiejar
+import json
+import random
+import re
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+SAMPLE_ANSWERS = [
+    "Yes, I use it every day on my commute.",
+    "Too expensive for what it does. I'd pay maybe $5 a month.",
+    "The onboarding was confusing and I almost gave up after 10 minutes.",
+    "I mostly use the mobile app, the desktop version feels slow.",
+    "Customer support took 3 days to answer my ticket.",
+    "It's fine. Nothing special compared to the alternatives.",
+    "not sure",
+]
+
+
+class Recorder:
+    """Latency samples and error counts per endpoint, shared across threads"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = {}
+        self.errors = {}
+
+    def add(self, endpoint, seconds, ok):
+        with self.lock:
+            self.samples.setdefault(endpoint, []).append(seconds)
+            if not ok:
+                self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+    def summary(self, duration):
+        rows = []
+        with self.lock:
+            for endpoint, samples in sorted(self.samples.items()):
+                samples = sorted(samples)
+                errors = self.errors.get(endpoint, 0)
+                rows.append({
+                    'endpoint': endpoint,
+                    'requests': len(samples),
+                    'errors': errors,
+                    'error_rate': errors / len(samples),
+                    'rps': len(samples) / duration if duration else 0.0,
+                    'p50_ms': percentile(samples, 50) * 1000,
+                    'p95_ms': percentile(samples, 95) * 1000,
+                    'p99_ms': percentile(samples, 99) * 1000,
+                })
+        return rows
+
+
+def percentile(sorted_samples, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_samples:
+        return 0.0
+    rank = max(int(round(pct / 100 * len(sorted_samples) + 0.5)) - 1, 0)
+    return sorted_samples[min(rank, len(sorted_samples) - 1)]
+
+
+class Client:
+    """One browser: its own cookie jar, with every request timed under an endpoint label"""
+
+    def __init__(self, base_url, recorder, timeout):
+        self.base_url = base_url.rstrip('/')
+        self.recorder = recorder
+        self.timeout = timeout
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar())
+        )
+
+    def request(self, endpoint, path, data=None, json_body=None):
+        """Return (status, body text); status is None if the request never completed"""
+        headers = {}
+        if json_body is not None:
+            data = json.dumps(json_body).encode()
+            headers['Content-Type'] = 'application/json'
+        elif data is not None:
+            data = urllib.parse.urlencode(data).encode()
+        request = urllib.request.Request(self.base_url + path, data=data, headers=headers)
+
+        started = time.perf_counter()
+        status, body = None, ''
+        try:
+            with self.opener.open(request, timeout=self.timeout) as response:
+                status = response.status
+                body = response.read().decode('utf-8', 'replace')
+        except urllib.error.HTTPError as e:
+            status = e.code
+        except Exception as e:
+            print(f"{endpoint}: {e}", file=sys.stderr)
+        self.recorder.add(endpoint, time.perf_counter() - started, status is not None and status < 400)
+        return status, body
+
+
+def sse_events(body):
+    """(event, data) pairs from a complete text/event-stream body"""
+    for block in body.split('\n\n'):
+        event = re.search(r'^event: (.*)$', block, re.M)
+        data = re.search(r'^data: (.*)$', block, re.M)
+        if event and data:
+            yield event.group(1), json.loads(data.group(1))
+
+
+def run_respondent(args, recorder):
+    """Answer the survey until it completes (or --max-answers); returns answers submitted"""
+    client = Client(args.base_url, recorder, args.timeout)
+    survey_path = f'/survey/{args.survey}'
+    answered = 0
+
+    while answered < args.max_answers:
+        status, page = client.request('GET /survey/<id>', survey_path)
+        if status != 200 or 'answerForm' not in page:
+            break
+
+        question_id = re.search(r'let questionId = (\w+);', page).group(1)
+        response_id = int(re.search(r'response_id: (\d+)', page).group(1))
+
+        if question_id == 'null':
+            stream_url = re.search(r"new EventSource\('([^']+)'\)", page).group(1)
+            status, body = client.request('GET /survey/<id>/question_stream', stream_url)
+            question_id = None
+            for event, data in sse_events(body):
+                if event == 'question':
+                    question_id = data['id']
+            if question_id is None:
+                # Completed, or the stream failed; the browser reloads either way
+                continue
+        else:
+            question_id = int(question_id)
+
+        if args.think_time:
+            time.sleep(random.uniform(0, args.think_time))
+
+        status, _ = client.request('POST /api/submit_answer', '/api/submit_answer', json_body={
+            'question_id': question_id,
+            'answer': random.choice(SAMPLE_ANSWERS),
+            'response_id': response_id,
+        })
+        if status != 200:
+            break
+        answered += 1
+    return answered
+
+
+def run_viewer(args, recorder, stop):
+    """Log in as the survey owner and poll the insights page until stopped"""
+    client = Client(args.base_url, recorder, args.timeout)
+    client.request('POST /login', '/login', data={'email': args.email, 'password': args.password})
+    while not stop.is_set():
+        client.request('GET /insights/<id>', f'/insights/{args.survey}')
+        stop.wait(args.insights_interval)
+
+
+def print_report(rows, duration, answers):
+    print(f"\n{answers} answers submitted in {duration:.1f}s ({answers / duration:.1f}/s)\n")
+    header = f"{'endpoint':<36} {'reqs':>6} {'err%':>6} {'rps':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+    print(header)
+    print('-' * len(header))
+    for row in rows:
+        print(f"{row['endpoint']:<36} {row['requests']:>6} {row['error_rate'] * 100:>5.1f}% {row['rps']:>7.1f} "
+              f"{row['p50_ms']:>8.0f} {row['p95_ms']:>8.0f} {row['p99_ms']:>8.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--base-url', default='http://127.0.0.1:5001')
+    parser.add_argument('--survey', type=int, required=True, help='id of the survey to answer')
+    parser.add_argument('--respondents', type=int, default=50, help='simulated respondents in total')
+    parser.add_argument('--concurrency', type=int, default=10, help='respondents active at once')
+    parser.add_argument('--max-answers', type=int, default=20, help='answers per respondent at most')
+    parser.add_argument('--think-time', type=float, default=0.0,
+                        help='max seconds a respondent pauses before answering')
+    parser.add_argument('--timeout', type=float, default=120.0, help='per-request timeout in seconds')
+    parser.add_argument('--email', help='survey owner login, enables insight viewers')
+    parser.add_argument('--password')
+    parser.add_argument('--viewers', type=int, default=2, help='threads polling /insights/<id>')
+    parser.add_argument('--insights-interval', type=float, default=2.0, help='seconds between polls')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args()
+
+    recorder = Recorder()
+    stop = threading.Event()
+    viewers = []
+    if args.email:
+        for _ in range(args.viewers):
+            thread = threading.Thread(target=run_viewer, args=(args, recorder, stop), daemon=True)
+            thread.start()
+            viewers.append(thread)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        answers = sum(executor.map(lambda _: run_respondent(args, recorder), range(args.respondents)))
+    duration = time.perf_counter() - started
+
+    stop.set()
+    for thread in viewers:
+        thread.join(args.timeout)
+
+    rows = recorder.summary(duration)
+    if args.json:
+        print(json.dumps({'duration_seconds': duration, 'answers': answers, 'endpoints': rows}, indent=2))
+    else:
+        print_report(rows, duration, answers)
+
+    total_errors = sum(row['errors'] for row in rows)
+    sys.exit(1 if total_errors else 0)
+
+
+if __name__ == '__main__':
+    main()